@@ -1,10 +1,30 @@
 import streamlit as st
 from pathlib import Path
-import fitz  # PDF → 이미지 변환용
-
-from utils.extract_pdf import extract_text_from_pdf
-from utils.chunker import split_pages_to_chunks
-from utils.chroma_db import add_chunks, query_similar
+import functools
+import time
+import uuid
+
+from utils import blob_store
+from utils.extract_pdf import PAGES_CACHE_PARAMS, extract_text_from_pdf
+from utils.chroma_db import query_similar
+from utils.artifact_cache import get_artifact_cache
+from utils.embedder import max_chunk_tokens
+from utils.page_images import get_page_image, neighbor_pages, prefetch_page_images
+from utils.study_pack import load_study_pack
+from utils.llm_gpt import answer_cache_stats, answer_query
+from utils.question_bank import draw_or_generate, seed_questions
+from utils.llm_resilience import latency_metrics
+from utils.llm_scheduler import get_scheduler
+from utils.context_cache import get_context_cache
+from utils.rerank import rerank_stats
+from utils.snapshot import bootstrap_from_env
+from utils.metrics import latency_summary, observe
+from utils.ingest import (
+    deck_key,
+    ingest_document,
+    get_cached_page_summaries,
+    store_page_summary,
+)
 
 # Gemini LLM
 from utils.llm_gemini import (
@@ -12,6 +32,7 @@ from utils.llm_gemini import (
     generate_page_summaries,   # (원래꺼 써도 되고, 나중에 안쓰면 지워도 됨)
     generate_page_questions,
     generate_single_page_summary,
+    question_parse_stats,
 )
 
 # -------------------------------------------------------------------
@@ -19,14 +40,14 @@ from utils.llm_gemini import (
 # -------------------------------------------------------------------
 st.set_page_config(page_title="Study-Mate", page_icon="📚", layout="wide")
 
+# 전체 실행(위젯이 fragment 밖에 있거나 파일/PDF를 바꾼 경우) 시간 측정 시작
+_run_started = time.perf_counter()
+
 st.title("📚 Study-Mate")
 st.write("PDF 강의자료 기반으로 요약 · 페이지별 요약 · 문제 생성 · 채점 기능을 제공합니다!")
 
-# -------------------------------------------------------------------
-# 업로드 저장 디렉토리
-# -------------------------------------------------------------------
-UPLOAD_DIR = Path("data/uploaded")
-UPLOAD_DIR.mkdir(parents=True, exist_ok=True)
+# 새 노드: 벡터DB가 비어 있고 STUDY_MATE_SNAPSHOT이 있으면 스냅샷으로 채운다 (프로세스당 한 번)
+bootstrap_from_env()
 
 # -------------------------------------------------------------------
 # Session State 초기화 (학습 진도/로그 + 요약/문제 상태)
@@ -46,34 +67,409 @@ if "current_pdf_name" not in st.session_state:
 # 요약/문제 관련 상태
 for key in [
     "whole_summary_output",
-    "single_page_summary",
     "question_list",
     "page_summary_output",
     "question_markdown",
     "question_answers",
+    "qa_answer",
 ]:
     if key not in st.session_state:
-        st.session_state[key] = "" if key == "single_page_summary" else None
+        st.session_state[key] = None
 
-# -------------------------------------------------------------------
-# 유틸 함수: PDF → 이미지
-# -------------------------------------------------------------------
-def load_page_images(pdf_path: str, max_pages: int = 8):
+# RAG 청크 사이에 겹치게 둘 토큰 수 (청크 길이는 임베딩 모델 최대 길이)
+CHUNK_OVERLAP_TOKENS = 32
+
+# 탭3 문제 출제 페이지 기본 선택 수 (문제 생성 LLM 호출 한 번에 들어가는 페이지 수와 같게)
+QUIZ_DEFAULT_PAGES = 8
+
+# 탭2 썸네일 줄: 한 번에 보여줄 페이지 수 / 썸네일 렌더링 너비(px)
+THUMB_STRIP_SIZE = 8
+THUMB_WIDTH_PX = 160
+
+
+def _goto_page(page_no: int) -> None:
+    """썸네일/이동 버튼 콜백 (위젯 값은 다음 실행 전에 바꿔야 하므로 on_click에서)."""
+    st.session_state.page_index = page_no
+
+
+def _timed(name: str):
+    """실행 시간을 app.rerun.<name> 지연 시간으로 기록하는 데코레이터 (사이드바 ⚙️에 표시)."""
+    def decorator(fn):
+        @functools.wraps(fn)
+        def wrapper(*args, **kwargs):
+            t0 = time.perf_counter()
+            try:
+                return fn(*args, **kwargs)
+            finally:
+                observe(f"app.rerun.{name}", time.perf_counter() - t0)
+        return wrapper
+    return decorator
+
+
+# ===================================================================
+# ⚙️ 파이프라인 단계 (결과를 캐시해서, 위젯을 누를 때마다 다시 실행하지 않는다)
+# ===================================================================
+def _store_upload(uploaded) -> str:
+    """
+    업로드 파일을 내용 해시(SHA-256) 기준 blob 저장소에 넣고 해시를 반환한다.
+    세션마다 파일당 한 번만 해시를 계산하고, 같은 내용의 파일은 한 번만 디스크에 쓴다.
+    이름 매핑은 세션(uploader_id)별이라 다른 학생이 같은 이름으로 올려도 덮어쓰지 않는다.
+    같은 세션에서 같은 자료의 수정본("강의_07 (2).pdf")을 올리면 이전 버전의 해시를 기억해 두고 (증분 적재)
+    이전 버전의 이름 매핑은 놓아준다 → 아무도 안 가리키면 적재 후 이전 버전의 벡터를 지운다.
+    """
+    stored = st.session_state.setdefault("stored_uploads", {})
+    if uploaded.file_id not in stored:
+        if "uploader_id" not in st.session_state:
+            st.session_state.uploader_id = uuid.uuid4().hex
+        owner = st.session_state.uploader_id
+        doc_hash = blob_store.put(uploaded.getbuffer(), uploaded.name, owner=owner)
+        latest = st.session_state.setdefault("deck_versions", {})      # deck_key → (마지막 해시, 파일 이름)
+        previous = st.session_state.setdefault("previous_versions", {})  # 해시 → 이전 버전 해시
+        prev_hash, prev_name = latest.get(deck_key(uploaded.name), (None, None))
+        if prev_hash and prev_hash != doc_hash:
+            previous.setdefault(doc_hash, prev_hash)
+            if prev_name != uploaded.name:
+                blob_store.release(prev_name, owner=owner)
+            # 이전 버전 파일을 다시 고르면 새로 저장하도록 세션 캐시에서도 뺀다
+            for file_id in [f for f, h in stored.items() if h == prev_hash]:
+                del stored[file_id]
+        latest[deck_key(uploaded.name)] = (doc_hash, uploaded.name)
+        stored[uploaded.file_id] = doc_hash
+    return stored[uploaded.file_id]
+
+
+def _ingest(doc_hash: str, source_name: str, pages: list) -> dict:
     """
-    PDF 파일에서 앞쪽 max_pages개의 페이지를 PNG 이미지(bytes)로 뽑아오는 함수
+    RAG용 청크 생성 + 적재 (이전 버전과 비교해서 바뀐 페이지만 임베딩).
+    매 실행마다 부르지만, 이미 적재된 문서는 적재 기록 + 벡터 존재 확인만 하고 끝난다.
+    (결과를 프로세스에 캐시하면 gc / compact / 스냅샷 가져오기로 벡터가 지워져도 다시 적재하지 않는다)
     """
-    doc = fitz.open(pdf_path)
-    images = []
-    try:
-        for i in range(min(max_pages, len(doc))):
-            page = doc.load_page(i)
-            # 배율 2배로 조금 더 선명하게
-            pix = page.get_pixmap(matrix=fitz.Matrix(2, 2))
-            img_bytes = pix.tobytes("png")
-            images.append(img_bytes)
-    finally:
-        doc.close()
-    return images
+    return ingest_document(
+        pages,
+        source_name=source_name,
+        doc_hash=doc_hash,
+        previous_doc_hash=st.session_state.get("previous_versions", {}).get(doc_hash),
+        # 임베딩 모델 최대 입력 길이(토큰)에 맞춰 문장 단위로 자른다 → 잘려 나가는 부분 없음
+        chunk_size=max_chunk_tokens(),
+        overlap=CHUNK_OVERLAP_TOKENS,
+        chunk_mode="tokens",
+    )
+
+
+# ===================================================================
+# 🧩 fragment: 위젯을 누르면 이 부분만 다시 실행된다
+#   (파일 저장 / 텍스트 추출 / 벡터DB 적재 / 사이드바는 다시 실행하지 않음)
+# ===================================================================
+@st.fragment
+@_timed("whole_summary")
+def whole_summary_section(doc_hash: str, pages: list, study_pack) -> None:
+    """탭1: 전체 요약 생성 버튼 + 결과 + 미리 만든 학습 팩."""
+    if st.button("👉 전체 강의 요약 생성하기"):
+        with st.spinner("전체 요약 생성 중..."):
+            try:
+                # 다른 세션에서 이미 만든 요약이 있으면 그대로 사용
+                st.session_state.whole_summary_output = get_artifact_cache().get_or_compute(
+                    doc_hash,
+                    "whole_summary",
+                    lambda: (study_pack or {}).get("whole_summary")
+                    or generate_whole_summary(pages),
+                )
+            except RuntimeError as e:
+                st.error("❌ 오류 발생")
+                st.code(repr(e))
+
+    if st.session_state.whole_summary_output:
+        st.markdown("📘 전체 요약 결과")
+        st.markdown(
+            f"""
+            <div class="ipad-note">
+                {st.session_state.whole_summary_output}
+            </div>
+            """,
+            unsafe_allow_html=True
+        )
+
+    if study_pack and study_pack.get("study_pack_md"):
+        with st.expander("📦 미리 생성된 학습 팩 보기 (요약 + 페이지별 연습문제)"):
+            st.markdown(study_pack["study_pack_md"])
+
+
+@st.fragment
+@_timed("page_viewer")
+def page_viewer_section(doc_hash: str, save_path: Path, pages: list) -> None:
+    """탭2: 페이지 선택 / 썸네일 줄 / 미리보기 / 페이지 요약."""
+    total_pages = len(pages)
+    page_num = st.number_input(
+        f"요약할 페이지 선택 (1~{total_pages}페이지)",
+        min_value=1,
+        max_value=total_pages,
+        value=1,
+        step=1,
+        key="page_index",   # 👉 사이드바 진도와 연결되는 key
+    )
+
+    # 썸네일 줄: 현재 페이지가 속한 THUMB_STRIP_SIZE장만 그린다.
+    # (페이지가 수백 장이어도 화면에 보이는 묶음만 렌더링 / 요약 조회)
+    strip_start = ((page_num - 1) // THUMB_STRIP_SIZE) * THUMB_STRIP_SIZE + 1
+    strip_pages = list(range(strip_start, min(strip_start + THUMB_STRIP_SIZE, total_pages + 1)))
+    visible_summaries = get_cached_page_summaries({p: pages[p - 1] for p in strip_pages})
+
+    nav_prev, *thumb_cols, nav_next = st.columns([0.5] + [1] * THUMB_STRIP_SIZE + [0.5])
+    with nav_prev:
+        st.button(
+            "◀", key="thumb_prev", disabled=strip_start == 1,
+            on_click=_goto_page, args=(max(1, strip_start - THUMB_STRIP_SIZE),),
+        )
+    for col, p in zip(thumb_cols, strip_pages):
+        with col:
+            try:
+                st.image(get_page_image(doc_hash, save_path, p, THUMB_WIDTH_PX), use_container_width=True)
+            except (RuntimeError, ValueError, IndexError):
+                pass
+            st.button(
+                f"{'✅ ' if p in visible_summaries else ''}{p}",
+                key=f"thumb_{p}",
+                on_click=_goto_page, args=(p,),
+                type="primary" if p == page_num else "secondary",
+                use_container_width=True,
+            )
+    next_strip = strip_start + THUMB_STRIP_SIZE
+    with nav_next:
+        st.button(
+            "▶", key="thumb_next", disabled=next_strip > total_pages,
+            on_click=_goto_page, args=(min(next_strip, total_pages),),
+        )
+    # 다음 묶음 썸네일은 미리 그려 둔다.
+    prefetch_page_images(
+        doc_hash, save_path,
+        range(next_strip, min(next_strip + THUMB_STRIP_SIZE, total_pages + 1)),
+        THUMB_WIDTH_PX,
+    )
+
+    # 2열 레이아웃: 왼쪽 이미지, 오른쪽 요약 카드
+    col_img, col_text = st.columns([1, 1.1], gap="large")
+
+    with col_img:
+        st.markdown(f"📘 페이지 {page_num} 미리보기")
+        try:
+            st.image(get_page_image(doc_hash, save_path, page_num), use_container_width=True)
+        except (RuntimeError, ValueError, IndexError):  # 손상된 페이지 등
+            st.info("이미지 정보가 없습니다.")
+        # 앞뒤 페이지는 미리 그려 두어 넘길 때 기다리지 않게 한다.
+        prefetch_page_images(
+            doc_hash, save_path, neighbor_pages(page_num, total_pages)
+        )
+
+    with col_text:
+        st.markdown(f"📘 페이지 {page_num} 학습용 요약")
+
+        if st.button("👉 이 페이지 요약 생성하기", key=f"summary_page_{page_num}"):
+            with st.spinner("해당 페이지를 요약하는 중입니다..."):
+                try:
+                    page_text = pages[page_num - 1]
+                    # 내용이 같은 페이지를 이미 요약했다면(visible_summaries) 재사용
+                    summary = visible_summaries.get(page_num)
+                    if summary is None:
+                        summary = generate_single_page_summary(
+                            page_text,
+                            page_number=page_num,
+                        )
+                        store_page_summary(page_text, page_num, summary)
+                        visible_summaries[page_num] = summary
+                except RuntimeError as e:
+                    st.error("❌ 페이지 요약 중 오류 발생")
+                    st.code(repr(e))
+
+        # 이 페이지 요약이 이미 있으면(학습 팩 / 이전 요약) 버튼 없이 바로 보여준다.
+        summary_text = visible_summaries.get(page_num, "")
+
+        if summary_text:
+            clean = summary_text
+            clean = clean.replace("### 📘 페이지", "📘 페이지")
+            clean = clean.replace("###", "")
+            clean = clean.replace("-**", "")
+            clean = clean.replace("**-", "")
+            clean = clean.replace("**[개념]**", "📘 개념")
+            clean = clean.replace("**[설명]**", "📝 설명")
+            clean = clean.replace("**[예시/절차]**", "🔍 예시/절차")
+            clean = clean.replace("**[시험 포인트]**", "📌 시험 포인트")
+            clean = clean.replace("- 📘 개념 ", "📘 개념<br>")
+            clean = clean.replace("- 📝 설명 ", "<br><br>📝 설명<br>")
+            clean = clean.replace("- 🔍 예시/절차 ", "<br><br>🔍 예시/절차<br>")
+            clean = clean.replace("- 📌 시험 포인트 ", "<br><br>📌 시험 포인트<br>")
+            clean = clean.replace("**", "")
+            html_text = clean.replace("\n", "<br>")
+
+            st.markdown(
+                """
+                <style>
+                    .ipad-note {{
+                        background-color: #FAF9F7;
+                        color: #1A1A1A;
+                        padding: 28px 30px;
+                        border-radius: 22px;
+                        border: 1px solid #E5E0D8;
+                        width: 100%;
+                        box-shadow:
+                            0px 4px 14px rgba(0,0,0,0.06),
+                            0px 12px 32px rgba(0,0,0,0.08);
+                        line-height: 1.95;
+                        font-size: 1.05rem;
+                        font-weight: 600;
+                        letter-spacing: -0.15px;
+                    }}
+                </style>
+
+                <div class="ipad-note">
+                    {}
+                </div>
+                """.format(html_text),
+                unsafe_allow_html=True,
+            )
+        else:
+            st.info("오른쪽 위 버튼을 눌러 이 페이지 요약을 생성해 보세요.")
+
+
+@st.fragment
+@_timed("quiz")
+def quiz_section(doc_hash: str, pages: list, current_pdf_name: str) -> None:
+    """탭3: 문제 생성 → 답 고르기 → 채점 (답을 고르거나 채점해도 이 부분만 다시 실행)."""
+    total_pages = len(pages)
+    page_numbers = list(range(1, total_pages + 1))
+
+    # 기본 선택은 지금 보고 있는 페이지부터 QUIZ_DEFAULT_PAGES장 (전체를 고르면 86페이지 덱에서 LLM 11회)
+    current_page = max(1, min(st.session_state.get("page_index", 1), total_pages))
+    default_pages = page_numbers[current_page - 1:current_page - 1 + QUIZ_DEFAULT_PAGES]
+
+    selected_pages = st.multiselect(
+        "문제 출제를 원하는 페이지를 선택하세요 (여러 개 선택 가능)",
+        options=page_numbers,
+        default=default_pages,
+    )
+
+    num_questions = st.number_input(
+        "페이지당 생성할 문제 개수",
+        min_value=1,
+        max_value=5,
+        value=2,
+        step=1,
+    )
+
+    difficulty = st.selectbox(
+        "난이도 선택",
+        ["easy", "medium", "hard"],
+        index=1,
+    )
+
+    if "question_list" not in st.session_state or st.session_state.question_list is None:
+        st.session_state.question_list = []
+
+    if st.button("👉 문제 생성하기"):
+        if not selected_pages:
+            st.warning("먼저 문제를 출제할 페이지를 한 개 이상 선택하세요.")
+        else:
+            with st.spinner("문제 생성 중..."):
+                try:
+                    # 문제 은행에서 먼저 꺼내고, 모자란 페이지만 LLM으로 생성
+                    questions = draw_or_generate(
+                        doc_hash,
+                        selected_pages=selected_pages,
+                        num_questions=num_questions,
+                        difficulty=difficulty,
+                        generate=lambda group, n: generate_page_questions(
+                            pages=pages,
+                            selected_pages=group,
+                            num_questions=n,
+                            difficulty=difficulty,
+                        ),
+                    )
+                    st.session_state.question_list = questions
+                except RuntimeError as e:
+                    st.error("❌ 문제 생성 중 오류 발생")
+                    st.code(repr(e))
+
+    questions = st.session_state.question_list or []
+
+    if questions:
+        st.markdown("📝 생성된 문제")
+
+        for q in questions:
+            qid = q.get("id", "Q")
+            page_no = q.get("page", "?")
+            question_text = q.get("question", "")
+            choices = q.get("choices", {})
+            correct_idx = str(q.get("answer", ""))
+
+            st.markdown(f"**[{qid}] (페이지 {page_no})** {question_text}")
+
+            for num, text in choices.items():
+                st.markdown(f"{num}) {text}")
+
+            st.radio(
+                "정답 선택",
+                options=["1", "2", "3", "4"],
+                key=f"answer_{qid}",
+                horizontal=True,
+                label_visibility="collapsed",
+            )
+
+            st.markdown("---")
+
+        if st.button("채점하기"):
+            correct_count = 0
+            st.markdown("📊 채점 결과")
+
+            for q in questions:
+                qid = q.get("id", "Q")
+                correct = str(q.get("answer", ""))
+                user = st.session_state.get(f"answer_{qid}", None)
+
+                if user == correct:
+                    st.success(f"{qid}: 정답! ✔ (선택: {user}, 정답: {correct})")
+                    correct_count += 1
+                else:
+                    st.error(f"{qid}: 오답 ❌ (선택: {user}, 정답: {correct})")
+
+                explain = q.get("explain", "")
+                if explain:
+                    st.caption(f"해설: {explain}")
+
+            st.markdown(f"## ✅ 총 점수: **{correct_count} / {len(questions)}**")
+
+            if current_pdf_name is not None:
+                progress_dict = st.session_state.study_progress
+                progress_dict[current_pdf_name] = {
+                    "completed": True,
+                    "correct": correct_count,
+                    "total": len(questions),
+                }
+                st.session_state.study_progress = progress_dict
+
+                st.success(
+                    f"📌 '{current_pdf_name}' 학습 완료로 기록되었습니다! "
+                    "사이드바 진도율과 학습 로그는 다음 화면 갱신 때 반영돼요."
+                )
+    else:
+        st.info("먼저 문제를 생성해 주세요.")
+
+
+@st.fragment
+@_timed("qa")
+def qa_section(doc_hash: str) -> None:
+    """탭4: 강의자료에 대한 추가 질문 → 관련 문단 검색 → 답변 + 요약 + 문제."""
+    user_query = st.text_input(
+        "강의 내용에 대해 궁금한 점을 입력하세요",
+        key="qa_query",
+        placeholder="예: 경사하강법에서 학습률이 너무 크면 어떻게 되나요?",
+    )
+    if st.button("👉 질문하기") and user_query.strip():
+        with st.spinner("관련 내용을 찾아 답변 생성 중..."):
+            # 비슷한 질문으로 같은 문단이 검색되면 이전 답변을 그대로 쓴다 (GPT 호출 없음)
+            st.session_state.qa_answer = answer_query(user_query.strip(), doc_hash=doc_hash)
+
+    if st.session_state.qa_answer:
+        st.markdown(st.session_state.qa_answer)
+
 
 # 과목명 입력
 course_name = st.text_input(
@@ -125,27 +521,53 @@ if uploaded_files:
     if st.session_state.current_pdf_name != current_pdf_name:
         st.session_state.current_pdf_name = current_pdf_name
         st.session_state.whole_summary_output = None
-        st.session_state.single_page_summary = ""
         st.session_state.question_list = []
+        st.session_state.qa_answer = None
 
-    # 2) 파일 저장
-    save_path = UPLOAD_DIR / current_pdf_name
-    with open(save_path, "wb") as f:
-        f.write(current_pdf.getbuffer())
+    # 2) 파일 저장 (내용 해시 기준 — 벡터DB 중복 저장 방지 / 모든 캐시의 키)
+    doc_hash = _store_upload(current_pdf)
+    save_path = blob_store.blob_path(doc_hash)
     st.success(f"업로드 완료: {current_pdf_name}")
 
+    # 모든 세션이 공유하는 문서 해시 기준 캐시
+    # (같은 PDF를 여러 명이 열어도 추출/렌더링/요약은 한 번만)
+    artifacts = get_artifact_cache()
+
     # 3) PDF 텍스트 추출
     with st.spinner("PDF에서 텍스트 추출 중..."):
-        pages = extract_text_from_pdf(save_path)
+        # 반복 머리글/바닥글 제거 여부가 바뀌면 다시 추출한다
+        pages = artifacts.get_or_compute(
+            doc_hash,
+            "pages",
+            lambda: extract_text_from_pdf(save_path),
+            params=PAGES_CACHE_PARAMS,
+        )
+
+    # 3-1) 페이지 이미지는 탭2에서 보는 페이지만 그때그때 렌더링한다.
+    #      첫 페이지들은 지금 백그라운드에서 미리 그려 둔다.
+    prefetch_page_images(doc_hash, save_path, range(1, min(3, len(pages)) + 1))
 
-    # 3-1) 페이지 이미지 추출 (앞 8페이지까지)
-    with st.spinner("페이지 이미지를 불러오는 중입니다..."):
-        page_images = load_page_images(str(save_path), max_pages=8)
+    # 3-2) 배치 작업으로 미리 만들어 둔 학습 팩 (없으면 None)
+    study_pack = artifacts.get_or_compute(
+        doc_hash, "study_pack", lambda: load_study_pack(doc_hash)
+    )
 
-    # 4) RAG용 청크 생성
+    # 3-3) 학습 팩 문제는 문제 은행에 넣어 둔다.
+    #      넣은 기록은 문제 은행(SQLite)에 (문서, 난이도, 페이지)별로 남고, 세션마다 문서당 한 번만 확인한다.
+    seeded = st.session_state.setdefault("seeded_docs", set())
+    if study_pack and doc_hash not in seeded:
+        seed_questions(doc_hash, study_pack.get("questions", {}))
+        seeded.add(doc_hash)
+
+    # 4) RAG용 청크 생성 (이전 버전과 비교해서 바뀐 페이지만 임베딩)
     with st.spinner("벡터DB 저장 준비 중..."):
-        chunks = split_pages_to_chunks(pages, chunk_size=300, overlap=80)
-        add_chunks(chunks, source_name=current_pdf_name)
+        ingest_report = _ingest(doc_hash, current_pdf_name, pages)
+    if not ingest_report["skipped"] and ingest_report["previous_source"]:
+        st.caption(
+            f"이전 버전({ingest_report['previous_source']})과 비교해 "
+            f"변경된 {len(ingest_report['pages_embedded'])}개 페이지만 새로 임베딩했습니다. "
+            f"(재사용 {ingest_report['pages_reused']}페이지)"
+        )
 
     # ===================================================================
     # 📚 사이드바: 과목명 + 자동 진도 + 전체 학습 로그
@@ -210,12 +632,55 @@ if uploaded_files:
         else:
             st.info("아직 학습 기록이 없습니다. 문제를 풀고 채점하면 여기에 기록돼요.")
 
+        # 5) LLM 응답 시간 (provider별 p50/p95/p99 + circuit 상태)
+        with st.expander("⚙️ LLM 응답 시간"):
+            for provider, m in latency_metrics().items():
+                if not m["count"]:
+                    continue
+                st.caption(
+                    f"{provider}: p50 {m['p50']:.1f}s · p95 {m['p95']:.1f}s · "
+                    f"p99 {m['p99']:.1f}s (n={m['count']}, {m['circuit']})"
+                )
+            q = get_scheduler().stats()
+            st.caption(
+                f"대기열 {q['queue_depth']}건 (진행 중 {q['inflight']}건) · "
+                f"대기 p50 {q['wait_p50']:.1f}s · p95 {q['wait_p95']:.1f}s · "
+                f"중복 요청 합침 {q['coalesced']}건"
+            )
+            ctx = get_context_cache().stats()
+            st.caption(
+                f"문맥 캐시 {ctx['live']}개 · 생성 {ctx.get('creates', 0)} / 재사용 {ctx.get('hits', 0)}"
+            )
+            qa = answer_cache_stats()
+            if qa["hits"] or qa["misses"]:
+                st.caption(f"추가 질문 답변 캐시 {qa['entries']}개 · 재사용 {qa['hits']} / 새로 생성 {qa['misses']}")
+            rr = rerank_stats()
+            if rr["queries"]:
+                st.caption(
+                    f"검색 문맥 {rr['queries']}회 · 중복 문단 제거로 토큰 {rr['saved_rate']:.0%} 절감 "
+                    f"({rr['tokens_raw']:,} → {rr['tokens_sent']:,})"
+                )
+            full = latency_summary("app.rerun.full")
+            quiz = latency_summary("app.rerun.quiz")
+            viewer = latency_summary("app.rerun.page_viewer")
+            if full["count"]:
+                st.caption(
+                    f"화면 갱신 p50: 전체 {full['p50'] * 1000:.0f}ms · "
+                    f"문제 풀이 {quiz['p50'] * 1000:.0f}ms · 페이지 보기 {viewer['p50'] * 1000:.0f}ms"
+                )
+            qp = question_parse_stats()
+            if qp["calls"]:
+                st.caption(
+                    f"문제 생성 {qp['calls']}회 · JSON 파싱 실패 {qp['parse_failure_rate']:.0%} "
+                    f"(전부 버림 {qp['empty_rate']:.0%}) · 버려진 토큰 {qp['wasted_token_rate']:.0%}"
+                )
+
 
     # ==============================================================  
-    # 🚀 3개의 탭 UI
+    # 🚀 4개의 탭 UI
     # ==============================================================  
-    tab1, tab2, tab3 = st.tabs(
-        ["📘 전체 강의 요약", "📄 페이지별 자세한 요약", "📝 연습 문제 생성"]
+    tab1, tab2, tab3, tab4 = st.tabs(
+        ["📘 전체 강의 요약", "📄 페이지별 자세한 요약", "📝 연습 문제 생성", "💬 추가 질문"]
     )
 
     # ===================================================================
@@ -248,223 +713,27 @@ if uploaded_files:
             unsafe_allow_html=True
         )
 
-        if st.button("👉 전체 강의 요약 생성하기"):
-            with st.spinner("전체 요약 생성 중..."):
-                try:
-                    st.session_state.whole_summary_output = generate_whole_summary(pages)
-                except RuntimeError as e:
-                    st.error("❌ 오류 발생")
-                    st.code(repr(e))
-
-        if st.session_state.whole_summary_output:
-            st.markdown("📘 전체 요약 결과")
-            st.markdown(
-                f"""
-                <div class="ipad-note">
-                    {st.session_state.whole_summary_output}
-                </div>
-                """,
-                unsafe_allow_html=True
-            )
+        whole_summary_section(doc_hash, pages, study_pack)
 
     # ===================================================================
     # 📄 탭2: 페이지별 상세 요약 + 이미지
     # ===================================================================
     with tab2:
         st.subheader("📄 페이지별 상세 요약 (이미지 + 텍스트)")
-
-        max_page_for_summary = min(8, len(pages))
-        page_num = st.number_input(
-            "요약할 페이지 선택 (1~8페이지까지만 지원)",
-            min_value=1,
-            max_value=max_page_for_summary,
-            value=1,
-            step=1,
-            key="page_index",   # 👉 사이드바 진도와 연결되는 key
-        )
-
-        # 2열 레이아웃: 왼쪽 이미지, 오른쪽 요약 카드
-        col_img, col_text = st.columns([1, 1.1], gap="large")
-
-        with col_img:
-            st.markdown(f"📘 페이지 {page_num} 미리보기")
-            if len(page_images) >= page_num:
-                st.image(page_images[page_num - 1], use_container_width=True)
-            else:
-                st.info("이미지 정보가 없습니다.")
-
-        with col_text:
-            st.markdown(f"📘 페이지 {page_num} 학습용 요약")
-
-            if st.button("👉 이 페이지 요약 생성하기", key=f"summary_page_{page_num}"):
-                with st.spinner("해당 페이지를 요약하는 중입니다..."):
-                    try:
-                        summary = generate_single_page_summary(
-                            pages[page_num - 1],
-                            page_number=page_num,
-                        )
-                        st.session_state.single_page_summary = summary
-                    except RuntimeError as e:
-                        st.error("❌ 페이지 요약 중 오류 발생")
-                        st.code(repr(e))
-
-            summary_text = st.session_state.get("single_page_summary", "")
-
-            if summary_text:
-                clean = summary_text
-                clean = clean.replace("### 📘 페이지", "📘 페이지")
-                clean = clean.replace("###", "")
-                clean = clean.replace("-**", "")
-                clean = clean.replace("**-", "")
-                clean = clean.replace("**[개념]**", "📘 개념")
-                clean = clean.replace("**[설명]**", "📝 설명")
-                clean = clean.replace("**[예시/절차]**", "🔍 예시/절차")
-                clean = clean.replace("**[시험 포인트]**", "📌 시험 포인트")
-                clean = clean.replace("- 📘 개념 ", "📘 개념<br>")
-                clean = clean.replace("- 📝 설명 ", "<br><br>📝 설명<br>")
-                clean = clean.replace("- 🔍 예시/절차 ", "<br><br>🔍 예시/절차<br>")
-                clean = clean.replace("- 📌 시험 포인트 ", "<br><br>📌 시험 포인트<br>")
-                clean = clean.replace("**", "")
-                html_text = clean.replace("\n", "<br>")
-
-                st.markdown(
-                    """
-                    <style>
-                        .ipad-note {{
-                            background-color: #FAF9F7;
-                            color: #1A1A1A;
-                            padding: 28px 30px;
-                            border-radius: 22px;
-                            border: 1px solid #E5E0D8;
-                            width: 100%;
-                            box-shadow:
-                                0px 4px 14px rgba(0,0,0,0.06),
-                                0px 12px 32px rgba(0,0,0,0.08);
-                            line-height: 1.95;
-                            font-size: 1.05rem;
-                            font-weight: 600;
-                            letter-spacing: -0.15px;
-                        }}
-                    </style>
-
-                    <div class="ipad-note">
-                        {}
-                    </div>
-                    """.format(html_text),
-                    unsafe_allow_html=True,
-                )
-            else:
-                st.info("오른쪽 위 버튼을 눌러 이 페이지 요약을 생성해 보세요.")
+        page_viewer_section(doc_hash, save_path, pages)
 
     # ===================================================================
     # 📝 탭3: 문제 생성 + 자동 채점
     # ===================================================================
     with tab3:
         st.subheader("📝 페이지별 문제 생성")
+        quiz_section(doc_hash, pages, current_pdf_name)
 
-        total_pages = len(pages)
-        page_numbers = list(range(1, total_pages + 1))
-
-        selected_pages = st.multiselect(
-            "문제 출제를 원하는 페이지를 선택하세요 (여러 개 선택 가능)",
-            options=page_numbers,
-            default=page_numbers,
-        )
-
-        num_questions = st.number_input(
-            "페이지당 생성할 문제 개수",
-            min_value=1,
-            max_value=5,
-            value=2,
-            step=1,
-        )
-
-        difficulty = st.selectbox(
-            "난이도 선택",
-            ["easy", "medium", "hard"],
-            index=1,
-        )
-
-        if "question_list" not in st.session_state or st.session_state.question_list is None:
-            st.session_state.question_list = []
-
-        if st.button("👉 문제 생성하기"):
-            if not selected_pages:
-                st.warning("먼저 문제를 출제할 페이지를 한 개 이상 선택하세요.")
-            else:
-                with st.spinner("문제 생성 중..."):
-                    try:
-                        questions = generate_page_questions(
-                            pages=pages,
-                            selected_pages=selected_pages,
-                            num_questions=num_questions,
-                            difficulty=difficulty,
-                        )
-                        st.session_state.question_list = questions
-                    except RuntimeError as e:
-                        st.error("❌ 문제 생성 중 오류 발생")
-                        st.code(repr(e))
-
-        questions = st.session_state.question_list or []
-
-        if questions:
-            st.markdown("📝 생성된 문제")
-
-            for q in questions:
-                qid = q.get("id", "Q")
-                page_no = q.get("page", "?")
-                question_text = q.get("question", "")
-                choices = q.get("choices", {})
-                correct_idx = str(q.get("answer", ""))
-
-                st.markdown(f"**[{qid}] (페이지 {page_no})** {question_text}")
-
-                for num, text in choices.items():
-                    st.markdown(f"{num}) {text}")
-
-                st.radio(
-                    "정답 선택",
-                    options=["1", "2", "3", "4"],
-                    key=f"answer_{qid}",
-                    horizontal=True,
-                    label_visibility="collapsed",
-                )
+    # ===================================================================
+    # 💬 탭4: 추가 질문 (이 PDF에서 검색 → 답변 + 요약 + 문제)
+    # ===================================================================
+    with tab4:
+        st.subheader("💬 강의 내용 추가 질문")
+        qa_section(doc_hash)
 
-                st.markdown("---")
-
-            if st.button("채점하기"):
-                correct_count = 0
-                st.markdown("📊 채점 결과")
-
-                for q in questions:
-                    qid = q.get("id", "Q")
-                    correct = str(q.get("answer", ""))
-                    user = st.session_state.get(f"answer_{qid}", None)
-
-                    if user == correct:
-                        st.success(f"{qid}: 정답! ✔ (선택: {user}, 정답: {correct})")
-                        correct_count += 1
-                    else:
-                        st.error(f"{qid}: 오답 ❌ (선택: {user}, 정답: {correct})")
-
-                    explain = q.get("explain", "")
-                    if explain:
-                        st.caption(f"해설: {explain}")
-
-                st.markdown(f"## ✅ 총 점수: **{correct_count} / {len(questions)}**")
-
-                if current_pdf_name is not None:
-                    progress_dict = st.session_state.study_progress
-                    progress_dict[current_pdf_name] = {
-                        "completed": True,
-                        "correct": correct_count,
-                        "total": len(questions),
-                    }
-                    st.session_state.study_progress = progress_dict
-
-                    st.success(
-                        f"📌 '{current_pdf_name}' 학습 완료로 기록되었습니다! "
-                        "사이드바에서 전체 진도율과 학습 로그를 확인할 수 있어요."
-                    )
-        else:
-            st.info("먼저 문제를 생성해 주세요.")
+    observe("app.rerun.full", time.perf_counter() - _run_started)
@@ -0,0 +1,108 @@
+# scripts/bench_app_reruns.py
+"""
+위젯 한 번 누를 때(답 선택 / 페이지 이동 / 채점) 서버가 다시 하는 파이프라인 작업 시간 비교.
+
+    python -m scripts.bench_app_reruns                     # data/uploaded/*.pdf 전체
+    python -m scripts.bench_app_reruns --repeat 50
+
+비교
+- before         : 예전 app.py — 위젯마다 스크립트 전체를 다시 실행
+                   (파일 쓰기 + SHA-256 + 추출/학습 팩 캐시 조회 + ingest_document 확인)
+- after (full)   : 지금 app.py의 전체 실행 — 해시 / 파일 쓰기는 세션 캐시,
+                   캐시 조회 + 적재 확인(적재 기록 + 벡터 하나 조회)만 남는다
+- after (fragment): 탭 안 위젯 — 해당 fragment만 다시 실행하므로 파이프라인 작업 없음
+
+Streamlit AppTest는 file_uploader를 조작할 수 없어서, app.py와 같은 단계를 직접 호출해 잰다.
+앱 실행 중 실제 값은 사이드바 "⚙️ LLM 응답 시간"의 화면 갱신 p50에서 볼 수 있다.
+"""
+
+import argparse
+import hashlib
+import statistics
+import tempfile
+import time
+from pathlib import Path
+
+from utils.artifact_cache import get_artifact_cache
+from utils.embedder import max_chunk_tokens
+from utils.extract_pdf import PAGES_CACHE_PARAMS, extract_text_from_pdf
+from utils.ingest import ingest_document
+from utils.study_pack import load_study_pack
+
+CHUNK_OVERLAP_TOKENS = 32  # app.py와 같은 값
+
+
+def _pct(values, p):
+    values = sorted(values)
+    return values[min(len(values) - 1, int(round(p / 100 * (len(values) - 1))))]
+
+
+def _cached_lookups(doc_hash: str, save_path: Path) -> list:
+    artifacts = get_artifact_cache()
+    pages = artifacts.get_or_compute(
+        doc_hash, "pages", lambda: extract_text_from_pdf(save_path), params=PAGES_CACHE_PARAMS
+    )
+    artifacts.get_or_compute(doc_hash, "study_pack", lambda: load_study_pack(doc_hash))
+    return pages
+
+
+def before(data: bytes, name: str, upload_dir: Path) -> None:
+    save_path = upload_dir / name
+    with open(save_path, "wb") as f:
+        f.write(data)
+    doc_hash = hashlib.sha256(data).hexdigest()
+    pages = _cached_lookups(doc_hash, save_path)
+    ingest_document(
+        pages, source_name=name, doc_hash=doc_hash,
+        chunk_size=max_chunk_tokens(), overlap=CHUNK_OVERLAP_TOKENS, chunk_mode="tokens",
+    )
+
+
+def after_full(doc_hash: str, name: str, save_path: Path) -> None:
+    pages = _cached_lookups(doc_hash, save_path)
+    report = ingest_document(
+        pages, source_name=name, doc_hash=doc_hash,
+        chunk_size=max_chunk_tokens(), overlap=CHUNK_OVERLAP_TOKENS, chunk_mode="tokens",
+    )
+    assert report["skipped"], "이미 적재한 문서는 다시 적재하지 않아야 한다"
+
+
+def main() -> None:
+    parser = argparse.ArgumentParser(description="위젯 한 번당 파이프라인 재실행 시간 비교")
+    parser.add_argument("--dir", default="data/uploaded")
+    parser.add_argument("--repeat", type=int, default=20)
+    args = parser.parse_args()
+
+    pdfs = sorted(Path(args.dir).glob("*.pdf"))
+    if not pdfs:
+        print(f"{args.dir} 에 PDF가 없습니다.")
+        return
+
+    with tempfile.TemporaryDirectory() as tmp:
+        upload_dir = Path(tmp)
+        for pdf in pdfs:
+            data = pdf.read_bytes()
+            before(data, pdf.name, upload_dir)  # 첫 적재 / 추출은 측정에서 뺀다
+            doc_hash = hashlib.sha256(data).hexdigest()
+            save_path = upload_dir / pdf.name
+
+            results = {"before": [], "after (full)": []}
+            for _ in range(args.repeat):
+                t0 = time.perf_counter()
+                before(data, pdf.name, upload_dir)
+                results["before"].append(time.perf_counter() - t0)
+                t0 = time.perf_counter()
+                after_full(doc_hash, pdf.name, save_path)
+                results["after (full)"].append(time.perf_counter() - t0)
+
+            print(f"\n{pdf.name} ({len(data) / 1024:.0f} KB)")
+            for name, samples in results.items():
+                print(
+                    f"  {name:>16}: p50 {_pct(samples, 50) * 1000:7.2f}ms "
+                    f"p95 {_pct(samples, 95) * 1000:7.2f}ms (평균 {statistics.mean(samples) * 1000:.2f}ms)"
+                )
+            print(f"  {'after (fragment)':>16}: 파이프라인 작업 없음 (fragment 안 위젯만 다시 그림)")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,149 @@
+# scripts/bench_chroma_concurrency.py
+"""
+여러 세션이 동시에 업로드/검색할 때의 Chroma 부하 테스트.
+
+- direct: 세션 스레드마다 collection.add를 직접 호출 (기존 방식)
+- writer: utils.chroma_writer.SingleWriter를 거쳐 bulk insert로 묶어서 쓰기
+
+두 방식 모두 쓰기가 진행되는 동안 reader 스레드가 계속 query를 날려서
+적재 처리량(vectors/s)과 검색 지연(p50/p95/p99)을 같이 측정한다.
+임베딩 모델 비용을 빼고 쓰기 경로만 보기 위해 임의 벡터를 사용한다.
+
+    python -m scripts.bench_chroma_concurrency --sessions 16 --readers 4
+"""
+
+import argparse
+import shutil
+import statistics
+import tempfile
+import threading
+import time
+import uuid
+
+import chromadb
+import numpy as np
+
+from utils.chroma_writer import SingleWriter
+
+
+def _percentile(values, pct: float) -> float:
+    if not values:
+        return 0.0
+    ordered = sorted(values)
+    idx = min(len(ordered) - 1, int(round(pct / 100 * (len(ordered) - 1))))
+    return ordered[idx]
+
+
+def _make_doc(rng: np.random.Generator, chunks: int, dim: int, session: int, doc: int):
+    ids = [str(uuid.uuid4()) for _ in range(chunks)]
+    embs = rng.standard_normal((chunks, dim)).astype(np.float32)
+    docs = [f"session {session} doc {doc} chunk {i}" for i in range(chunks)]
+    metas = [{"source": f"s{session}_d{doc}.pdf", "index": i} for i in range(chunks)]
+    return ids, embs, docs, metas
+
+
+def run_mode(mode: str, args) -> dict:
+    tmp_dir = tempfile.mkdtemp(prefix="chroma_bench_")
+    try:
+        client = chromadb.PersistentClient(path=tmp_dir)
+        collection = client.create_collection("bench", metadata={"hnsw:space": "cosine"})
+
+        # 검색이 빈 컬렉션을 치지 않도록 미리 조금 넣어 둔다.
+        seed_rng = np.random.default_rng(0)
+        ids, embs, docs, metas = _make_doc(seed_rng, 200, args.dim, -1, 0)
+        collection.add(ids=ids, embeddings=embs, documents=docs, metadatas=metas)
+
+        writer = SingleWriter(lambda: collection) if mode == "writer" else None
+        errors = []
+        latencies = []
+        lat_lock = threading.Lock()
+        done = threading.Event()
+
+        def session(sid: int) -> None:
+            rng = np.random.default_rng(sid + 1)
+            for d in range(args.docs_per_session):
+                ids, embs, docs, metas = _make_doc(rng, args.chunks_per_doc, args.dim, sid, d)
+                try:
+                    if writer is not None:
+                        writer.add(ids=ids, embeddings=embs, documents=docs, metadatas=metas)
+                    else:
+                        collection.add(ids=ids, embeddings=embs, documents=docs, metadatas=metas)
+                except Exception as e:  # 동시 쓰기 충돌도 결과로 보고한다
+                    errors.append(repr(e))
+
+        def reader(rid: int) -> None:
+            rng = np.random.default_rng(1000 + rid)
+            while not done.is_set():
+                q = rng.standard_normal(args.dim).astype(np.float32)
+                t0 = time.perf_counter()
+                collection.query(query_embeddings=[q], n_results=5)
+                elapsed = (time.perf_counter() - t0) * 1000
+                with lat_lock:
+                    latencies.append(elapsed)
+
+        readers = [threading.Thread(target=reader, args=(i,)) for i in range(args.readers)]
+        sessions = [threading.Thread(target=session, args=(i,)) for i in range(args.sessions)]
+        for t in readers:
+            t.start()
+
+        t0 = time.perf_counter()
+        for t in sessions:
+            t.start()
+        for t in sessions:
+            t.join()
+        wall = time.perf_counter() - t0
+
+        done.set()
+        for t in readers:
+            t.join()
+
+        total = args.sessions * args.docs_per_session * args.chunks_per_doc
+        result = {
+            "mode": mode,
+            "vectors": total,
+            "stored": collection.count() - 200,
+            "wall_s": wall,
+            "vectors_per_s": total / wall if wall else 0.0,
+            "queries": len(latencies),
+            "p50_ms": statistics.median(latencies) if latencies else 0.0,
+            "p95_ms": _percentile(latencies, 95),
+            "p99_ms": _percentile(latencies, 99),
+            "errors": len(errors),
+        }
+        if writer is not None:
+            result["bulk_writes"] = writer.stats()["bulk_writes"]
+        return result
+    finally:
+        shutil.rmtree(tmp_dir, ignore_errors=True)
+
+
+def main() -> None:
+    parser = argparse.ArgumentParser(description="Chroma 동시 적재/검색 부하 테스트")
+    parser.add_argument("--sessions", type=int, default=16, help="동시에 업로드하는 세션 수")
+    parser.add_argument("--docs-per-session", type=int, default=5)
+    parser.add_argument("--chunks-per-doc", type=int, default=60)
+    parser.add_argument("--readers", type=int, default=4, help="동시에 검색하는 스레드 수")
+    parser.add_argument("--dim", type=int, default=384, help="임베딩 차원 (all-MiniLM-L6-v2 = 384)")
+    parser.add_argument("--mode", choices=["direct", "writer", "both"], default="both")
+    args = parser.parse_args()
+
+    modes = ["direct", "writer"] if args.mode == "both" else [args.mode]
+    print(
+        f"sessions={args.sessions} docs/session={args.docs_per_session} "
+        f"chunks/doc={args.chunks_per_doc} readers={args.readers}"
+    )
+    for mode in modes:
+        r = run_mode(mode, args)
+        line = (
+            f"[{r['mode']:>6}] {r['vectors']} vectors in {r['wall_s']:.2f}s "
+            f"({r['vectors_per_s']:.0f}/s, stored={r['stored']}, errors={r['errors']}) | "
+            f"query n={r['queries']} p50={r['p50_ms']:.1f}ms "
+            f"p95={r['p95_ms']:.1f}ms p99={r['p99_ms']:.1f}ms"
+        )
+        if "bulk_writes" in r:
+            line += f" | bulk_writes={r['bulk_writes']}"
+        print(line)
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,161 @@
+# scripts/bench_context_cache.py
+"""
+provider 문맥 캐시(utils.context_cache)를 로컬 가짜 provider로 점검한다.
+가짜 provider는 Gemini cached content처럼 동작하며, 호출마다 청구된 입력 토큰을 기록한다.
+
+    python -m scripts.bench_context_cache --pages 30
+    python -m scripts.bench_context_cache --pdf "data/uploaded/6-2. 회귀 (KNN회귀, 선형회귀).pdf" --students 20
+
+한 문서에 대해 앱이 보내는 호출 순서(전체 요약 → 학습 팩 → 난이도별 문제 → 난이도 변경 / 재시도)를
+학생 수만큼 반복해서, 캐시 끔 / 켬 두 가지로 청구 입력 토큰(보관료 포함)을 비교한다.
+캐시를 켜도 문맥은 인라인과 같은 문자열이고, 손익분기 호출 수를 넘은 문맥만 캐시에 올린다.
+"""
+
+import argparse
+import threading
+import uuid
+
+from utils import llm_resilience, llm_scheduler, metrics
+from utils.context_cache import (
+    CACHE_STORAGE_PRICE_PER_HOUR,
+    CACHED_TOKEN_PRICE,
+    ContextCacheRegistry,
+    inline_deck_context,
+    inline_prompt,
+    record_usage,
+)
+from utils.llm_scheduler import estimate_tokens
+
+_TTL_S = 3600
+
+
+class _StandInProvider:
+    """cached content 생성/삭제/참조를 흉내 내고, 청구 토큰을 세는 가짜 provider."""
+
+    def __init__(self):
+        self._lock = threading.Lock()
+        self.caches = {}       # name → 토큰 수
+        self.billed = 0.0      # 정가 기준 환산 입력 토큰
+        self.calls = 0
+
+    def create(self, context: str, ttl_s: int) -> str:
+        name = f"cachedContents/{uuid.uuid4().hex[:8]}"
+        with self._lock:
+            self.caches[name] = estimate_tokens(context, expected_output=0)
+            # 업로드할 때 한 번은 정가로 청구 + TTL 동안 보관료
+            self.billed += self.caches[name] * (1 + CACHE_STORAGE_PRICE_PER_HOUR * ttl_s / 3600)
+        return name
+
+    def delete(self, name: str) -> None:
+        with self._lock:
+            self.caches.pop(name, None)
+
+    def __call__(self, prompt, temperature, timeout_s, model, schema=None, context=None) -> str:
+        name = None
+        if context:
+            name = registry.get_or_create(
+                "standin", context, create=self.create, delete=self.delete
+            )
+        if name:
+            prompt_tokens = estimate_tokens(prompt, expected_output=0)
+            cached = self.caches[name]
+        else:
+            prompt_tokens = estimate_tokens(inline_prompt(context, prompt), expected_output=0)
+            cached = 0
+        with self._lock:
+            self.calls += 1
+            self.billed += prompt_tokens + cached * CACHED_TOKEN_PRICE
+        record_usage("standin", prompt_tokens + cached, cached)
+        return "[]"
+
+
+registry = ContextCacheRegistry(ttl_s=_TTL_S, max_entries=8)
+
+
+def _synthetic_pages(n: int):
+    body = "신경망은 입력층, 은닉층, 출력층으로 구성되며 가중치와 편향을 학습한다. "
+    return [f"{i}장 슬라이드 제목\n" + body * 12 for i in range(1, n + 1)]
+
+
+def _workload(pages):
+    """
+    앱/배치 작업이 한 문서에 대해 보내는 호출들 (지시문만 다르고 문맥은 같다).
+    (이름, 지시문, 캐시를 못 쓸 때 붙이는 페이지 — None이면 앞쪽 8페이지)
+    """
+    calls = [("전체 요약", "이 강의가 전반적으로 무엇을 다루는지 6~10문장으로 작성해라.", None)]
+    calls.append(("학습 팩", "페이지 1~8 요약과 연습문제를 Markdown으로 작성해라. " * 20, None))
+    groups = [list(range(s, min(s + 7, len(pages)) + 1)) for s in range(1, len(pages) + 1, 8)]
+    for difficulty in ("easy", "medium", "hard"):
+        for g in groups:
+            calls.append(("문제", f"[대상 페이지] {g}\n[난이도] {difficulty}\n4지선다 문제를 JSON 배열로. " * 4, g))
+    # 학생이 난이도를 다시 바꾸거나 "다시 생성"을 누르는 경우
+    calls.append(("재시도", f"[대상 페이지] {groups[0]}\n[난이도] medium\n다른 문제를 만들어라. " * 4, groups[0]))
+    return calls
+
+
+def run(pages, use_cache: bool, students: int = 1) -> dict:
+    global registry
+    registry = ContextCacheRegistry(ttl_s=_TTL_S, max_entries=64, enabled=use_cache)
+    metrics._counters.clear()
+    provider = _StandInProvider()
+    llm_resilience.register_provider("standin", provider)
+
+    contexts = set()
+    for student in range(students):
+        for _, prompt, page_numbers in _workload(pages):
+            context = inline_deck_context(pages, page_numbers)
+            contexts.add(context)
+            # 학생마다 지시문은 조금씩 달라서(다른 질문) 응답 coalescing이 아니라 문맥 캐시만 재사용된다
+            llm_resilience.generate_text(
+                f"{prompt}\n(학생 {student})", providers=("standin",), context=context
+            )
+    released = sum(registry.release(c) for c in contexts)
+
+    return {
+        "calls": provider.calls,
+        "input_tokens": int(metrics.counter("llm.standin.input_tokens")),
+        "cached_tokens": int(metrics.counter("llm.standin.cached_input_tokens")),
+        "billed": int(provider.billed),
+        "creates": int(metrics.counter("llm.context_cache.creates")),
+        "hits": int(metrics.counter("llm.context_cache.hits")),
+        "released": released,
+        "left_on_provider": len(provider.caches),
+    }
+
+
+def main() -> None:
+    parser = argparse.ArgumentParser(description="provider 문맥 캐시 점검 (로컬 가짜 provider)")
+    parser.add_argument("--pages", type=int, default=30, help="가짜 덱 페이지 수")
+    parser.add_argument("--pdf", default=None, help="실제 PDF로 덱 문맥 만들기 (PyMuPDF 필요)")
+    parser.add_argument("--students", type=int, nargs="+", default=[1, 20], help="같은 덱을 쓰는 학생 수")
+    args = parser.parse_args()
+
+    if args.pdf:
+        from utils.extract_pdf import extract_text_from_pdf
+        pages = extract_text_from_pdf(args.pdf)
+    else:
+        pages = _synthetic_pages(args.pages)
+
+    # 속도 제한이 아니라 토큰 수를 보려는 것이므로 한도를 사실상 없앤다.
+    llm_scheduler._scheduler = llm_scheduler.LLMScheduler(rpm=1e6, tpm=1e9)
+
+    print(
+        f"덱 {len(pages)}페이지, 학생 1명당 호출 {len(_workload(pages))}회 · "
+        f"손익분기 {registry.break_even:.1f}회 (TTL {_TTL_S}s)"
+    )
+    for students in args.students:
+        print(f"\n학생 {students}명")
+        results = {}
+        for name, use_cache in (("no-cache", False), ("cache", True)):
+            r = results[name] = run(pages, use_cache, students)
+            print(
+                f"  [{name:>8}] 입력 {r['input_tokens']:,} 토큰 (캐시 {r['cached_tokens']:,}) "
+                f"→ 청구 환산 {r['billed']:,} 토큰 · 캐시 생성 {r['creates']} / 재사용 {r['hits']} "
+                f"· 정리 {r['released']} (provider에 남은 캐시 {r['left_on_provider']})"
+            )
+        saved = 1 - results["cache"]["billed"] / max(1, results["no-cache"]["billed"])
+        print(f"  청구 입력 토큰 {saved:.0%} 절감")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,153 @@
+# scripts/bench_ingest_memory.py
+"""
+적재(추출 → 청크 분할 → 임베딩 → 벡터DB 쓰기) 중 최대 메모리(peak RSS) 비교.
+
+    python -m scripts.bench_ingest_memory                    # data/uploaded/*.pdf 전체
+    python -m scripts.bench_ingest_memory --scales 1 8 32 --batch 128
+
+PDF마다 페이지를 scale배로 이어 붙인 큰 PDF를 만들어서(복사본 페이지마다 다른 문장을 넣어
+페이지 해시가 겹치지 않게 한다) 두 방식으로 적재한다.
+- before : 예전 방식 — 전체 페이지 리스트 → 전체 청크 → 전체 임베딩(파이썬 float 리스트) → upsert
+- stream : ingest.ingest_pdf — STUDY_MATE_INGEST_BATCH_CHUNKS개씩 흘려 넣기
+
+최대 메모리는 프로세스마다 한 번만 잴 수 있으므로 (적재 방식 × 크기)마다 새 프로세스를 띄우고,
+임시 폴더에서 실행해서 실제 chroma_db/ 는 건드리지 않는다.
+표의 값은 모델을 올린 뒤의 peak RSS에서 늘어난 양이다 (Linux / macOS).
+"""
+
+import argparse
+import json
+import os
+import random
+import resource
+import string
+import subprocess
+import sys
+import tempfile
+import time
+from pathlib import Path
+
+import fitz
+
+CHUNK_OVERLAP_TOKENS = 32  # app.py와 같은 값
+_ROOT = Path(__file__).resolve().parent.parent
+
+
+def _peak_rss_mb() -> float:
+    peak = resource.getrusage(resource.RUSAGE_SELF).ru_maxrss
+    # Linux는 KB, macOS는 바이트 단위
+    return peak / 1024 / 1024 if sys.platform == "darwin" else peak / 1024
+
+
+def make_scaled_pdf(src: Path, dst: Path, scale: int) -> int:
+    """src 페이지를 scale번 이어 붙인다. 복사본 페이지마다 본문 한가운데에 서로 다른 문장을 넣는다."""
+    rng = random.Random(0)
+    with fitz.open(src) as doc, fitz.open() as out:
+        for _ in range(scale):
+            start = out.page_count
+            out.insert_pdf(doc)
+            for i in range(start, out.page_count):
+                page = out[i]
+                words = " ".join(
+                    "".join(rng.choices(string.ascii_lowercase, k=rng.randint(3, 9))) for _ in range(12)
+                )
+                page.insert_text((36, page.rect.height / 2), words, fontsize=8)
+        out.save(dst)
+        return out.page_count
+
+
+# ────────────────────────────────────────────
+# 자식 프로세스: 한 가지 방식으로 한 번 적재
+# ────────────────────────────────────────────
+def _ingest_before(pdf: Path, chunk_size: int) -> int:
+    from utils import chroma_db
+    from utils.chunker import chunk_page
+    from utils.embedder import embed_texts
+    from utils.extract_pdf import extract_text_from_pdf
+
+    pages = extract_text_from_pdf(pdf)
+    ids, chunks, metadatas = [], [], []
+    for page_no, text in enumerate(pages, start=1):
+        for i, chunk in enumerate(chunk_page(text.strip(), chunk_size, CHUNK_OVERLAP_TOKENS, "tokens")):
+            ids.append(f"{page_no}:{i}")
+            chunks.append(chunk)
+            metadatas.append({"source": pdf.name, "page": page_no, "index": i})
+    if chunks:
+        chroma_db.load_records(ids, embed_texts(chunks), chunks, metadatas)
+    return len(chunks)
+
+
+def _ingest_stream(pdf: Path, chunk_size: int) -> int:
+    from utils.ingest import ingest_pdf
+
+    report = ingest_pdf(
+        pdf, source_name=pdf.name, doc_hash=pdf.stem,
+        chunk_size=chunk_size, overlap=CHUNK_OVERLAP_TOKENS, chunk_mode="tokens",
+    )
+    return report["chunks_embedded"]
+
+
+def _child(mode: str, pdf: Path) -> None:
+    from utils import chroma_db  # noqa: F401  (벡터DB 클라이언트도 기준선에 포함)
+    from utils.embedder import embed_array, max_chunk_tokens
+
+    embed_array(["warmup"])
+    baseline = _peak_rss_mb()
+    t0 = time.perf_counter()
+    run = _ingest_before if mode == "before" else _ingest_stream
+    chunks = run(pdf, max_chunk_tokens())
+    print(json.dumps({
+        "chunks": chunks,
+        "seconds": time.perf_counter() - t0,
+        "baseline_mb": baseline,
+        "peak_mb": _peak_rss_mb(),
+    }))
+
+
+def _run_child(mode: str, pdf: Path, batch: int) -> dict:
+    env = dict(os.environ)
+    env["PYTHONPATH"] = os.pathsep.join(filter(None, [str(_ROOT), env.get("PYTHONPATH")]))
+    env["STUDY_MATE_INGEST_BATCH_CHUNKS"] = str(batch)
+    with tempfile.TemporaryDirectory() as workdir:
+        out = subprocess.run(
+            [sys.executable, "-m", "scripts.bench_ingest_memory", "--child", mode, str(pdf)],
+            cwd=workdir, env=env, capture_output=True, text=True, check=True,
+        )
+    return json.loads(out.stdout.strip().splitlines()[-1])
+
+
+def main() -> None:
+    parser = argparse.ArgumentParser(description="적재 방식별 peak RSS 비교")
+    parser.add_argument("--dir", default="data/uploaded")
+    parser.add_argument("--scales", type=int, nargs="+", default=[1, 4, 16])
+    parser.add_argument("--batch", type=int, default=256, help="스트리밍 배치 청크 수")
+    parser.add_argument("--child", nargs=2, metavar=("MODE", "PDF"), help=argparse.SUPPRESS)
+    args = parser.parse_args()
+
+    if args.child:
+        _child(args.child[0], Path(args.child[1]))
+        return
+
+    pdfs = sorted(Path(args.dir).glob("*.pdf"))
+    if not pdfs:
+        print(f"{args.dir} 에 PDF가 없습니다.")
+        return
+
+    print(f"스트리밍 배치 {args.batch}청크 · 값은 모델 로드 후 peak RSS 증가량")
+    with tempfile.TemporaryDirectory() as tmp:
+        for pdf in pdfs:
+            print(f"\n{pdf.name}")
+            print(f"  {'pages':>6} {'chunks':>7}  {'before':>16}  {'stream':>16}")
+            for scale in args.scales:
+                scaled = Path(tmp) / f"{pdf.stem}_x{scale}.pdf"
+                n_pages = make_scaled_pdf(pdf, scaled, scale)
+                cells = []
+                for mode in ("before", "stream"):
+                    r = _run_child(mode, scaled, args.batch)
+                    cells.append(f"{r['peak_mb'] - r['baseline_mb']:7.1f}MB {r['seconds']:5.1f}s")
+                print(f"  {n_pages:>6} {r['chunks']:>7}  {cells[0]:>16}  {cells[1]:>16}")
+                scaled.unlink()
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,172 @@
+# scripts/bench_llm_resilience.py
+"""
+로컬 가짜 LLM 서버로 utils.llm_resilience(타임아웃 · 재시도 · hedging · circuit breaker · failover)를 점검한다.
+실제 API 키 없이 실행되며, 시나리오별 성공률과 end-to-end p50/p95/p99를 출력한다.
+
+    python -m scripts.bench_llm_resilience --requests 200
+
+시나리오
+- baseline : 가끔 느린 응답(꼬리 지연) + 가끔 500 에러, hedging 없음
+- hedged   : 같은 조건에서 p95를 넘기면 중복 요청
+- outage   : primary가 계속 500 → circuit open → backup으로 failover
+- hang     : primary가 응답하지 않음 → per-call 타임아웃 후 backup으로 failover
+"""
+
+import argparse
+import json
+import random
+import statistics
+import threading
+import time
+import urllib.request
+from concurrent.futures import ThreadPoolExecutor
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+
+from utils import llm_resilience, llm_scheduler, metrics
+
+# provider 이름 → 동작 설정 (시나리오마다 바꿔 끼운다)
+_behavior = {
+    "primary": {"latency": 0.05, "tail_p": 0.05, "tail_latency": 1.5, "error_p": 0.05},
+    "backup": {"latency": 0.08, "tail_p": 0.0, "tail_latency": 0.0, "error_p": 0.0},
+}
+
+
+class _FakeLLMHandler(BaseHTTPRequestHandler):
+    def log_message(self, *args):  # 요청 로그 출력 끄기
+        pass
+
+    def do_POST(self):
+        provider = self.path.strip("/")
+        cfg = _behavior[provider]
+        length = int(self.headers.get("Content-Length", 0))
+        body = json.loads(self.rfile.read(length) or b"{}")
+
+        delay = cfg["latency"] * random.uniform(0.7, 1.3)
+        if random.random() < cfg["tail_p"]:
+            delay = cfg["tail_latency"]
+        time.sleep(delay)
+
+        if random.random() < cfg["error_p"]:
+            try:
+                self.send_response(500)
+                self.end_headers()
+            except (BrokenPipeError, ConnectionResetError):
+                pass
+            return
+
+        payload = json.dumps({"text": f"[{provider}] {body.get('prompt', '')[:20]}"}).encode()
+        try:
+            self.send_response(200)
+            self.send_header("Content-Type", "application/json")
+            self.send_header("Content-Length", str(len(payload)))
+            self.end_headers()
+            self.wfile.write(payload)
+        except (BrokenPipeError, ConnectionResetError):
+            pass  # 클라이언트가 타임아웃으로 먼저 끊은 경우
+
+
+def _make_provider(base_url: str, name: str):
+    def call(prompt, temperature, timeout_s, model, schema=None, context=None):
+        req = urllib.request.Request(
+            f"{base_url}/{name}",
+            data=json.dumps({"prompt": prompt}).encode(),
+            headers={"Content-Type": "application/json"},
+            method="POST",
+        )
+        with urllib.request.urlopen(req, timeout=timeout_s) as resp:  # HTTPError(500)는 재시도 대상
+            return json.loads(resp.read())["text"]
+    return call
+
+
+def _reset_state() -> None:
+    llm_resilience._breakers.clear()
+    # 속도 제한 자체가 아니라 장애 대응을 보려는 것이므로 한도를 사실상 없앤다.
+    llm_scheduler._scheduler = llm_scheduler.LLMScheduler(rpm=1e6, tpm=1e9)
+    metrics._latencies.clear()
+    metrics._counters.clear()
+
+
+def run_scenario(name: str, n: int, concurrency: int, hedge: bool, timeout_s: float) -> None:
+    # hedging 기준(p95)을 잡을 수 있도록 먼저 조금 호출해서 지연 통계를 채운다.
+    if hedge:
+        for _ in range(llm_resilience.HEDGE_MIN_SAMPLES):
+            try:
+                llm_resilience.generate_text("warmup", providers=("primary",), hedge=False)
+            except RuntimeError:
+                pass
+
+    latencies, failures = [], 0
+    lock = threading.Lock()
+
+    def one(i: int) -> None:
+        nonlocal failures
+        t0 = time.perf_counter()
+        try:
+            llm_resilience.generate_text(
+                f"q{i}", providers=("primary", "backup"),
+                hedge=hedge, attempt_timeout_s=timeout_s, deadline_s=timeout_s * 4,
+            )
+            ok = True
+        except RuntimeError:
+            ok = False
+        elapsed = time.perf_counter() - t0
+        with lock:
+            latencies.append(elapsed)
+            failures += 0 if ok else 1
+
+    t0 = time.perf_counter()
+    with ThreadPoolExecutor(max_workers=concurrency) as pool:
+        list(pool.map(one, range(n)))
+    wall = time.perf_counter() - t0
+
+    lat = sorted(latencies)
+    pick = lambda p: lat[min(len(lat) - 1, int(round(p / 100 * (len(lat) - 1))))] * 1000
+    counters = metrics.snapshot("llm")["counters"]
+    print(
+        f"[{name:>8}] ok={n - failures}/{n} wall={wall:.1f}s "
+        f"p50={pick(50):.0f}ms p95={pick(95):.0f}ms p99={pick(99):.0f}ms "
+        f"mean={statistics.mean(lat) * 1000:.0f}ms"
+    )
+    print("           counters: " + ", ".join(f"{k}={int(v)}" for k, v in sorted(counters.items())))
+    for provider, s in llm_resilience.latency_metrics().items():
+        print(
+            f"           {provider}: n={s['count']} p50={s['p50'] * 1000:.0f}ms "
+            f"p95={s['p95'] * 1000:.0f}ms p99={s['p99'] * 1000:.0f}ms circuit={s['circuit']}"
+        )
+
+
+def main() -> None:
+    parser = argparse.ArgumentParser(description="LLM 호출 안정화 계층 점검 (로컬 가짜 서버)")
+    parser.add_argument("--requests", type=int, default=200)
+    parser.add_argument("--concurrency", type=int, default=8)
+    parser.add_argument("--timeout", type=float, default=0.5, help="호출당 타임아웃(초)")
+    args = parser.parse_args()
+
+    server = ThreadingHTTPServer(("127.0.0.1", 0), _FakeLLMHandler)
+    threading.Thread(target=server.serve_forever, daemon=True).start()
+    base_url = f"http://127.0.0.1:{server.server_address[1]}"
+
+    llm_resilience.register_provider("primary", _make_provider(base_url, "primary"))
+    llm_resilience.register_provider("backup", _make_provider(base_url, "backup"))
+    llm_resilience.BACKOFF_BASE_S = 0.02  # 점검용으로 backoff를 짧게
+
+    try:
+        for name, hedge, primary in [
+            ("baseline", False, {}),
+            ("hedged", True, {}),
+            ("outage", False, {"error_p": 1.0}),
+            ("hang", False, {"latency": 30.0, "tail_p": 0.0}),
+        ]:
+            _reset_state()
+            saved = dict(_behavior["primary"])
+            _behavior["primary"].update(primary)
+            try:
+                run_scenario(name, args.requests, args.concurrency, hedge, args.timeout)
+            finally:
+                _behavior["primary"] = saved
+    finally:
+        server.shutdown()
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,116 @@
+# scripts/bench_page_images.py
+"""
+페이지 이미지 인코딩 설정별 크기 / 렌더링 시간 비교 + 미리 렌더링(prefetch) 효과 측정.
+
+    python -m scripts.bench_page_images                  # data/uploaded/*.pdf 전체
+    python -m scripts.bench_page_images --pages 8 --quality 75
+
+설정
+- legacy     : 예전 방식 (배율 2배 PNG)
+- png@col    : 열 너비 기준 해상도 PNG
+- jpeg@col   : 열 너비 기준 해상도 JPEG
+- webp@col   : 열 너비 기준 해상도 WebP (Pillow 필요, 없으면 JPEG)
+"""
+
+import argparse
+import statistics
+import tempfile
+import time
+from pathlib import Path
+
+import fitz  # PyMuPDF
+
+from utils import artifact_cache, page_images
+
+
+def _legacy_render(pdf_path: Path, page_index: int) -> bytes:
+    with fitz.open(pdf_path) as doc:
+        pix = doc.load_page(page_index).get_pixmap(matrix=fitz.Matrix(2, 2))
+        return pix.tobytes("png")
+
+
+def _pct(values, p):
+    values = sorted(values)
+    return values[min(len(values) - 1, int(round(p / 100 * (len(values) - 1))))]
+
+
+def bench_encoding(pdfs, max_pages: int, width_px: int, quality: int) -> None:
+    settings = {
+        "legacy": lambda path, i: _legacy_render(path, i),
+        "png@col": lambda path, i: page_images.render_page(path, i, width_px, "png"),
+        "jpeg@col": lambda path, i: page_images.render_page(path, i, width_px, "jpeg", quality),
+        "webp@col": lambda path, i: page_images.render_page(path, i, width_px, "webp", quality),
+    }
+    print(f"열 너비 기준 렌더링 너비 {width_px}px, 품질 {quality}")
+    for pdf in pdfs:
+        with fitz.open(pdf) as doc:
+            n = min(max_pages, doc.page_count) if max_pages else doc.page_count
+        print(f"\n{pdf.name} ({n}페이지)")
+        base = None
+        for name, render in settings.items():
+            sizes, times = [], []
+            for i in range(n):
+                t0 = time.perf_counter()
+                data = render(pdf, i)
+                times.append(time.perf_counter() - t0)
+                sizes.append(len(data))
+            avg_kb = statistics.mean(sizes) / 1024
+            base = base or avg_kb
+            print(
+                f"  {name:>9}: 평균 {avg_kb:7.1f} KB/페이지 ({avg_kb / base:5.1%}) · "
+                f"렌더링 p50 {_pct(times, 50) * 1000:5.0f}ms p95 {_pct(times, 95) * 1000:5.0f}ms"
+            )
+
+
+def bench_page_flip(pdf: Path, flips: int, width_px: int) -> None:
+    """탭2에서 다음 페이지로 넘길 때 기다리는 시간: prefetch 없음 vs 있음."""
+    with fitz.open(pdf) as doc:
+        n = min(flips + 1, doc.page_count)
+
+    def run(prefetch: bool):
+        waits = []
+        for page_no in range(1, n + 1):
+            t0 = time.perf_counter()
+            page_images.get_page_image("bench-" + str(prefetch), pdf, page_no, width_px)
+            waits.append(time.perf_counter() - t0)
+            if prefetch:
+                page_images.prefetch_page_images(
+                    "bench-" + str(prefetch), pdf, page_images.neighbor_pages(page_no, n), width_px
+                )
+            time.sleep(0.3)  # 학생이 페이지를 보는 시간
+        return waits[1:]  # 첫 페이지는 둘 다 직접 렌더링
+
+    print(f"\n페이지 넘김 대기 시간 ({pdf.name}, {n - 1}회)")
+    for prefetch in (False, True):
+        waits = run(prefetch)
+        print(
+            f"  prefetch={'on ' if prefetch else 'off'}: "
+            f"p50 {_pct(waits, 50) * 1000:6.1f}ms p95 {_pct(waits, 95) * 1000:6.1f}ms"
+        )
+
+
+def main() -> None:
+    parser = argparse.ArgumentParser(description="페이지 이미지 크기/지연 벤치마크")
+    parser.add_argument("--dir", default="data/uploaded")
+    parser.add_argument("--pages", type=int, default=0, help="PDF당 최대 페이지 수 (0이면 전체)")
+    parser.add_argument("--quality", type=int, default=page_images.IMAGE_QUALITY)
+    parser.add_argument("--column-px", type=int, default=page_images.IMAGE_COLUMN_PX)
+    parser.add_argument("--flips", type=int, default=8, help="페이지 넘김 측정 횟수")
+    args = parser.parse_args()
+
+    pdfs = sorted(Path(args.dir).glob("*.pdf"))
+    if not pdfs:
+        print(f"{args.dir} 에 PDF가 없습니다.")
+        return
+
+    width_px = page_images.target_width_px(args.column_px)
+    bench_encoding(pdfs, args.pages, width_px, args.quality)
+
+    # 측정용 캐시는 실제 캐시 디렉터리를 건드리지 않게 임시 폴더로
+    with tempfile.TemporaryDirectory() as tmp:
+        artifact_cache._cache = artifact_cache.ArtifactCache(64 * 1024 * 1024, Path(tmp))
+        bench_page_flip(pdfs[0], args.flips, width_px)
+
+
+if __name__ == "__main__":
+    main()
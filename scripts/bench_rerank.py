@@ -0,0 +1,77 @@
+# scripts/bench_rerank.py
+"""
+검색 결과 MMR 재정렬(utils.rerank)이 줄이는 문맥 토큰 / 중복 정도를 측정한다.
+이미 적재된 벡터DB(chroma_db/)에 대해, 각 PDF 페이지 첫 줄(슬라이드 제목)을 질문으로 써서 검색한다.
+
+    python -m scripts.bench_rerank                      # data/uploaded/*.pdf 전체
+    python -m scripts.bench_rerank --top-k 5 --budget 1200
+
+비교
+- raw : Chroma 상위 top_k 그대로 (예전 방식)
+- mmr : top_k×MMR_FETCH_MULT개 후보에서 MMR + 토큰 예산으로 고른 결과
+"""
+
+import argparse
+import statistics
+from pathlib import Path
+
+import numpy as np
+
+from utils import rerank
+from utils.chroma_db import query_similar
+from utils.embedder import embed_texts
+from utils.extract_pdf import extract_text_from_pdf
+from utils.llm_scheduler import estimate_tokens
+
+
+def _queries(pdfs, per_pdf: int):
+    for pdf in pdfs:
+        titles = [p.strip().splitlines()[0] for p in extract_text_from_pdf(pdf) if p.strip()]
+        yield from [t for t in titles if len(t) >= 4][:per_pdf]
+
+
+def _redundancy(docs) -> float:
+    """검색된 문단끼리의 평균 코사인 유사도 (높을수록 서로 비슷한 문단이 많이 들어감)."""
+    if len(docs) < 2:
+        return 0.0
+    m = np.asarray(embed_texts(docs), dtype=np.float32)
+    m /= np.linalg.norm(m, axis=1, keepdims=True)
+    sims = m @ m.T
+    return float(sims[np.triu_indices(len(docs), k=1)].mean())
+
+
+def main() -> None:
+    parser = argparse.ArgumentParser(description="검색 결과 MMR 재정렬 토큰 절감 측정")
+    parser.add_argument("--dir", default="data/uploaded")
+    parser.add_argument("--top-k", type=int, default=5)
+    parser.add_argument("--budget", type=int, default=rerank.RAG_TOKEN_BUDGET)
+    parser.add_argument("--queries", type=int, default=10, help="PDF당 질문 수")
+    args = parser.parse_args()
+
+    pdfs = sorted(Path(args.dir).glob("*.pdf"))
+    queries = list(_queries(pdfs, args.queries))
+    if not queries:
+        print(f"{args.dir} 에 PDF가 없습니다.")
+        return
+
+    rows = {"raw": [], "mmr": []}
+    for q in queries:
+        for name, diversify in (("raw", False), ("mmr", True)):
+            result = query_similar(q, top_k=args.top_k, diversify=diversify, token_budget=args.budget)
+            docs = (result.get("documents") or [[]])[0]
+            rows[name].append((sum(estimate_tokens(d, expected_output=0) for d in docs), len(docs), _redundancy(docs)))
+
+    print(f"질문 {len(queries)}개 · top_k {args.top_k} · 토큰 예산 {args.budget}")
+    for name, r in rows.items():
+        tokens, counts, red = zip(*r)
+        print(
+            f"  {name}: 문맥 평균 {statistics.mean(tokens):6.0f} 토큰 (최대 {max(tokens):5d}) · "
+            f"문단 {statistics.mean(counts):.1f}개 · 문단 간 평균 유사도 {statistics.mean(red):.2f}"
+        )
+    raw = sum(t for t, _, _ in rows["raw"])
+    mmr = sum(t for t, _, _ in rows["mmr"])
+    print(f"문맥 토큰 {1 - mmr / max(1, raw):.0%} 절감")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,64 @@
+# scripts/boilerplate_report.py
+"""
+반복 머리글/바닥글 제거(utils.extract_pdf.detect_boilerplate)로 줄어드는 텍스트 양을 문서별로 보여준다.
+
+    python -m scripts.boilerplate_report                 # data/uploaded/*.pdf 전체
+    python -m scripts.boilerplate_report --show          # 찾은 반복 문구도 출력
+
+문서마다 바이트 / LLM 입력 토큰(추정) / 제거된 줄을 제거 전후로 비교한다.
+"""
+
+import argparse
+from pathlib import Path
+
+from utils.extract_pdf import detect_boilerplate, extract_text_from_pdf
+from utils.llm_scheduler import estimate_tokens
+
+
+def report(pdf: Path) -> dict:
+    raw = extract_text_from_pdf(pdf, strip_boilerplate=False)
+    stripped = extract_text_from_pdf(pdf, strip_boilerplate=True)
+    bytes_before = sum(len(p.encode("utf-8")) for p in raw)
+    bytes_after = sum(len(p.encode("utf-8")) for p in stripped)
+    tokens_before = sum(estimate_tokens(p, expected_output=0) for p in raw)
+    tokens_after = sum(estimate_tokens(p, expected_output=0) for p in stripped)
+    return {
+        "pages": len(raw),
+        "lines_removed": sum(len(r.splitlines()) - len(s.splitlines()) for r, s in zip(raw, stripped)),
+        "bytes_before": bytes_before,
+        "bytes_saved": bytes_before - bytes_after,
+        "tokens_before": tokens_before,
+        "tokens_saved": tokens_before - tokens_after,
+    }
+
+
+def main() -> None:
+    parser = argparse.ArgumentParser(description="반복 머리글/바닥글 제거 효과")
+    parser.add_argument("--dir", default="data/uploaded")
+    parser.add_argument("--show", action="store_true", help="찾은 반복 문구 출력")
+    args = parser.parse_args()
+
+    pdfs = sorted(Path(args.dir).glob("*.pdf"))
+    if not pdfs:
+        print(f"{args.dir} 에 PDF가 없습니다.")
+        return
+
+    total_bytes = total_saved = 0
+    for pdf in pdfs:
+        r = report(pdf)
+        total_bytes += r["bytes_before"]
+        total_saved += r["bytes_saved"]
+        print(
+            f"{pdf.name} ({r['pages']}페이지): {r['lines_removed']}줄 제거 · "
+            f"{r['bytes_saved']:,} / {r['bytes_before']:,} bytes "
+            f"({r['bytes_saved'] / max(1, r['bytes_before']):.1%}) · "
+            f"≈{r['tokens_saved']:,} / {r['tokens_before']:,} 토큰"
+        )
+        if args.show:
+            for band, line in sorted(detect_boilerplate(pdf)):
+                print(f"    [{band}] {line}")
+    print(f"\n전체 {total_saved:,} / {total_bytes:,} bytes ({total_saved / max(1, total_bytes):.1%}) 절감")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,121 @@
+# scripts/chroma_maintenance.py
+"""
+Chroma 벡터DB 정리용 커맨드.
+
+    python -m scripts.chroma_maintenance gc [--dry-run] [--no-dedupe]
+    python -m scripts.chroma_maintenance compact [--no-vacuum]
+    python -m scripts.chroma_maintenance delete-source "<파일명.pdf>"
+    python -m scripts.chroma_maintenance delete-hash <sha256>
+    python -m scripts.chroma_maintenance hnsw
+    python -m scripts.chroma_maintenance snapshot-export data/snapshot.smsnap
+    python -m scripts.chroma_maintenance snapshot-import data/snapshot.smsnap [--no-verify]
+    python -m scripts.chroma_maintenance blob-gc [--dry-run] [--ttl-days 30]
+    python -m scripts.chroma_maintenance cache-prune [--dry-run] [--max-mb 2048]
+"""
+
+import argparse
+
+from utils import blob_store, chroma_db
+
+
+def _fmt_bytes(n: int) -> str:
+    sign = "-" if n < 0 else ""
+    n = abs(n)
+    for unit in ["B", "KB", "MB", "GB"]:
+        if n < 1024:
+            return f"{sign}{n:.1f}{unit}" if unit != "B" else f"{sign}{n}B"
+        n /= 1024
+    return f"{sign}{n:.1f}TB"
+
+
+def _print_report(title: str, report: dict) -> None:
+    print(f"[{title}]")
+    for key, value in report.items():
+        if key.startswith("bytes"):
+            print(f"  {key}: {value} ({_fmt_bytes(value)})")
+        else:
+            print(f"  {key}: {value}")
+
+
+def main() -> None:
+    parser = argparse.ArgumentParser(description="Study-Mate Chroma DB 정리 도구")
+    sub = parser.add_subparsers(dest="command", required=True)
+
+    p_gc = sub.add_parser("gc", help="원본 PDF가 사라진 고아 벡터/중복 벡터 삭제")
+    p_gc.add_argument("--upload-dir", default="data/uploaded")
+    p_gc.add_argument("--dry-run", action="store_true", help="삭제하지 않고 개수만 출력")
+    p_gc.add_argument("--no-dedupe", action="store_true", help="중복 벡터 정리 생략")
+
+    p_compact = sub.add_parser("compact", help="HNSW 인덱스 재구성 + sqlite VACUUM")
+    p_compact.add_argument("--no-vacuum", action="store_true")
+
+    p_src = sub.add_parser("delete-source", help="파일 이름(source) 기준 삭제")
+    p_src.add_argument("source")
+
+    p_hash = sub.add_parser("delete-hash", help="문서 해시(doc_hash) 기준 삭제")
+    p_hash.add_argument("doc_hash")
+
+    sub.add_parser("hnsw", help="현재 / 설정된 HNSW 파라미터 (다르면 compact 필요)")
+
+    p_export = sub.add_parser("snapshot-export", help="벡터DB + 적재 기록 + 추출 텍스트를 스냅샷 파일로")
+    p_export.add_argument("path")
+    p_export.add_argument("--upload-dir", default="data/uploaded")
+
+    p_import = sub.add_parser("snapshot-import", help="스냅샷 파일을 이 노드에 가져오기 (재임베딩 없음)")
+    p_import.add_argument("path")
+    p_import.add_argument("--no-verify", action="store_true", help="체크섬 검사 생략")
+
+    p_blob = sub.add_parser("blob-gc", help="오래된 업로드 이름 매핑 + 참조 없는 원본 PDF(blob) 삭제")
+    p_blob.add_argument("--dry-run", action="store_true", help="삭제하지 않고 개수만 출력")
+    p_blob.add_argument("--ttl-days", type=float, default=blob_store.NAME_TTL_DAYS)
+
+    p_cache = sub.add_parser("cache-prune", help="디스크 캐시(spill)를 예산 안으로 (오래 안 읽은 것부터 삭제)")
+    p_cache.add_argument("--dry-run", action="store_true", help="삭제하지 않고 개수만 출력")
+    p_cache.add_argument("--max-mb", type=int, default=None, help="디스크 예산 (기본: STUDY_MATE_CACHE_DISK_MB)")
+
+    args = parser.parse_args()
+
+    if args.command == "gc":
+        report = chroma_db.gc_orphans(
+            upload_dir=args.upload_dir,
+            dedupe=not args.no_dedupe,
+            dry_run=args.dry_run,
+        )
+        _print_report("gc (dry-run)" if args.dry_run else "gc", report)
+    elif args.command == "compact":
+        report = chroma_db.compact(vacuum=not args.no_vacuum)
+        _print_report("compact", report)
+    elif args.command == "delete-source":
+        removed = chroma_db.delete_by_source(args.source)
+        print(f"삭제된 벡터: {removed}")
+    elif args.command == "delete-hash":
+        removed = chroma_db.delete_by_doc_hash(args.doc_hash)
+        print(f"삭제된 벡터: {removed}")
+    elif args.command == "hnsw":
+        _print_report("hnsw", chroma_db.hnsw_settings())
+    elif args.command == "snapshot-export":
+        from utils.snapshot import export_snapshot
+        _print_report("snapshot-export", export_snapshot(args.path, upload_dir=args.upload_dir))
+    elif args.command == "snapshot-import":
+        from utils.snapshot import import_snapshot
+        _print_report("snapshot-import", import_snapshot(args.path, verify=not args.no_verify))
+    elif args.command == "blob-gc":
+        report = blob_store.gc(name_ttl_days=args.ttl_days, dry_run=args.dry_run)
+        removed = report.pop("removed_hashes")
+        if not args.dry_run and removed:
+            # 원본이 없어진 문서의 추출 텍스트 / 학습 팩 캐시도 지운다 (벡터는 gc에서 고아로 정리)
+            from utils.artifact_cache import get_artifact_cache
+            artifacts = get_artifact_cache()
+            for doc_hash in removed:
+                artifacts.drop(doc_hash)
+        _print_report("blob-gc (dry-run)" if args.dry_run else "blob-gc", report)
+        _print_report("blob-store", blob_store.stats())
+    elif args.command == "cache-prune":
+        from utils.artifact_cache import get_artifact_cache
+        budget = None if args.max_mb is None else args.max_mb * 1024 * 1024
+        report = get_artifact_cache().prune_disk(budget_bytes=budget, dry_run=args.dry_run)
+        _print_report("cache-prune (dry-run)" if args.dry_run else "cache-prune", report)
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,81 @@
+# scripts/chunk_truncation_report.py
+"""
+청크 분할 방식별로 임베딩 모델이 잘라 버리는 양을 비교한다.
+
+    python -m scripts.chunk_truncation_report                 # data/uploaded/*.pdf 전체
+    python -m scripts.chunk_truncation_report --overlap 48
+
+방식
+- words  : 예전 방식 (단어 300개, 80개 겹침) — 모델 최대 길이를 넘으면 뒷부분은 임베딩에 반영되지 않는다
+- tokens : 모델 토크나이저 기준 최대 길이 이하, 문장/글머리표 경계에서 자름
+
+PDF마다 청크 수, 최대 길이를 넘는 청크 비율, 버려지는 토큰 비율, 청크당 평균/최대 토큰 수를 출력한다.
+"""
+
+import argparse
+import statistics
+from pathlib import Path
+
+from utils.chunker import chunk_page
+from utils.embedder import count_tokens, max_chunk_tokens
+from utils.extract_pdf import extract_text_from_pdf
+
+
+def _stats(chunks, limit: int) -> dict:
+    lengths = count_tokens(chunks)
+    total = sum(lengths)
+    dropped = sum(max(0, n - limit) for n in lengths)
+    return {
+        "chunks": len(lengths),
+        "over": sum(1 for n in lengths if n > limit),
+        "dropped_ratio": dropped / total if total else 0.0,
+        "mean": statistics.mean(lengths) if lengths else 0.0,
+        "max": max(lengths, default=0),
+    }
+
+
+def report(pdf: Path, modes: dict, limit: int) -> dict:
+    pages = extract_text_from_pdf(pdf)
+    out = {}
+    for name, (size, overlap, mode) in modes.items():
+        chunks = [c for p in pages if p.strip() for c in chunk_page(p.strip(), size, overlap, mode)]
+        out[name] = _stats(chunks, limit)
+    return out
+
+
+def main() -> None:
+    parser = argparse.ArgumentParser(description="청크 분할 방식별 임베딩 잘림 통계")
+    parser.add_argument("--dir", default="data/uploaded")
+    parser.add_argument("--overlap", type=int, default=32, help="tokens 방식의 겹침 토큰 수")
+    args = parser.parse_args()
+
+    pdfs = sorted(Path(args.dir).glob("*.pdf"))
+    if not pdfs:
+        print(f"{args.dir} 에 PDF가 없습니다.")
+        return
+
+    limit = max_chunk_tokens()
+    modes = {
+        "words": (300, 80, "words"),
+        "tokens": (limit, args.overlap, "tokens"),
+    }
+    print(f"모델 최대 입력 {limit} 토큰 (특수 토큰 제외)")
+    totals = {name: {"chunks": 0, "over": 0} for name in modes}
+    for pdf in pdfs:
+        print(f"\n{pdf.name}")
+        for name, r in report(pdf, modes, limit).items():
+            totals[name]["chunks"] += r["chunks"]
+            totals[name]["over"] += r["over"]
+            print(
+                f"  {name:>6}: 청크 {r['chunks']:4d}개 · 최대 길이 초과 "
+                f"{r['over'] / max(1, r['chunks']):6.1%} · 버려지는 토큰 {r['dropped_ratio']:6.1%} · "
+                f"청크당 평균 {r['mean']:5.1f} / 최대 {r['max']:4d} 토큰"
+            )
+
+    print("\n전체")
+    for name, t in totals.items():
+        print(f"  {name:>6}: 청크 {t['chunks']}개 중 {t['over']}개 잘림")
+
+
+if __name__ == "__main__":
+    main()
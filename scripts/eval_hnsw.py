@@ -0,0 +1,159 @@
+# scripts/eval_hnsw.py
+"""
+HNSW 설정(M / construction_ef / search_ef)별 recall@k · 검색 지연 · 인덱스 메모리 평가.
+
+적재된 강의 청크 임베딩(chroma_db/)을 (M, construction_ef)마다 임시 컬렉션에 한 번 넣고,
+search_ef는 같은 인덱스에서 바꿔 가며 잰다 (기본 설정이면 인덱스 6번, 18번이 아니라).
+numpy 전수 비교(brute-force) top-k를 정답으로 삼아 HNSW 검색 결과와 비교한다.
+빌드 시간(build)은 같은 인덱스를 쓰는 search_ef 행끼리 같은 값이다.
+
+    python -m scripts.eval_hnsw
+    python -m scripts.eval_hnsw --m 8 16 32 --construction-ef 100 200 --search-ef 10 50 100 --k 5 20
+
+질문 벡터는 청크 임베딩에 작은 잡음을 더한 것을 쓴다 (자기 자신이 항상 1등이 되지 않도록).
+인덱스 메모리는 hnswlib 구조 기준 추정치(벡터 + 0층 이웃 + 위층 이웃)이다.
+"""
+
+import argparse
+import itertools
+import math
+import shutil
+import tempfile
+import time
+from typing import Iterator
+
+import chromadb
+import numpy as np
+
+from utils import chroma_db
+
+
+def _pct(values, p):
+    values = sorted(values)
+    return values[min(len(values) - 1, int(round(p / 100 * (len(values) - 1))))]
+
+
+def _load_corpus():
+    ids, embs = [], []
+    for got in chroma_db.dump_records():
+        ids.extend(got["ids"])
+        embs.append(np.asarray(got["embeddings"], dtype=np.float32))
+    if not ids:
+        return [], np.zeros((0, 0), dtype=np.float32)
+    return ids, np.vstack(embs)
+
+
+def _unit(m: np.ndarray) -> np.ndarray:
+    norms = np.linalg.norm(m, axis=1, keepdims=True)
+    norms[norms == 0] = 1.0
+    return m / norms
+
+
+def exact_topk(corpus: np.ndarray, queries: np.ndarray, k: int) -> np.ndarray:
+    """코사인 유사도 전수 비교 top-k 인덱스 (질문마다 유사도 내림차순)."""
+    sims = _unit(queries) @ _unit(corpus).T
+    k = min(k, corpus.shape[0])
+    part = np.argpartition(-sims, k - 1, axis=1)[:, :k]
+    order = np.take_along_axis(sims, part, axis=1).argsort(axis=1)[:, ::-1]
+    return np.take_along_axis(part, order, axis=1)
+
+
+def index_bytes(n: int, dim: int, m: int) -> int:
+    """hnswlib 메모리 추정: 0층(벡터 + 2M 이웃 + label) + 위층(평균 1/ln M 층, 층마다 M 이웃)."""
+    level0 = n * (dim * 4 + (2 * m + 1) * 4 + 8)
+    upper = int(n / math.log(max(m, 2)) * (m + 1) * 4)
+    return level0 + upper
+
+
+def _set_search_ef(col, search_ef: int) -> None:
+    """이미 만든 인덱스의 검색 탐색 폭만 바꾼다 (인덱스는 다시 만들지 않는다)."""
+    try:
+        col.modify(configuration={"hnsw": {"ef_search": search_ef}})  # chromadb 1.x
+    except TypeError:
+        col.modify(metadata={"hnsw:search_ef": search_ef})  # 예전 버전: metadata로 지정
+
+
+def _search(col, ids, queries, truth, ks) -> dict:
+    k_max = max(ks)
+    latencies, hits = [], {k: 0 for k in ks}
+    for qi, q in enumerate(queries):
+        t0 = time.perf_counter()
+        got = col.query(query_embeddings=[q], n_results=k_max, include=[])
+        latencies.append(time.perf_counter() - t0)
+        found = got["ids"][0]
+        for k in ks:
+            want = {ids[j] for j in truth[qi, :k]}
+            hits[k] += len(want & set(found[:k]))
+    return {
+        "recall": {k: hits[k] / (len(queries) * min(k, len(ids))) for k in ks},
+        "p50_ms": _pct(latencies, 50) * 1000,
+        "p95_ms": _pct(latencies, 95) * 1000,
+    }
+
+
+def evaluate(ids, corpus, queries, truth, m, construction_ef, search_efs, ks, batch) -> Iterator[dict]:
+    """
+    (M, construction_ef)마다 인덱스를 한 번만 만들고, 같은 인덱스에서 search_ef만 바꿔 가며 잰다.
+    search_ef마다 결과 dict 하나씩 돌려준다.
+    """
+    tmp = tempfile.mkdtemp(prefix="hnsw_eval_")
+    try:
+        client = chromadb.PersistentClient(path=tmp)
+        col = client.create_collection(
+            "eval", metadata=chroma_db.hnsw_metadata(m, construction_ef, search_efs[0])
+        )
+        t0 = time.perf_counter()
+        for s in range(0, len(ids), batch):
+            col.add(ids=ids[s:s + batch], embeddings=corpus[s:s + batch])
+        build_s = time.perf_counter() - t0
+
+        for i, search_ef in enumerate(search_efs):
+            if i:
+                _set_search_ef(col, search_ef)
+            yield {
+                **_search(col, ids, queries, truth, ks),
+                "search_ef": search_ef,
+                "build_s": build_s,
+                "index_mb": index_bytes(len(ids), corpus.shape[1], m) / 1024 / 1024,
+            }
+    finally:
+        shutil.rmtree(tmp, ignore_errors=True)
+
+
+def main() -> None:
+    parser = argparse.ArgumentParser(description="HNSW 설정별 recall / 지연 / 메모리 평가")
+    parser.add_argument("--m", type=int, nargs="+", default=[8, 16, 32])
+    parser.add_argument("--construction-ef", type=int, nargs="+", default=[100, 200])
+    parser.add_argument("--search-ef", type=int, nargs="+", default=[10, 50, 100])
+    parser.add_argument("--k", type=int, nargs="+", default=[5, 20], help="recall@k (20 = MMR 후보 수)")
+    parser.add_argument("--queries", type=int, default=200)
+    parser.add_argument("--noise", type=float, default=0.05, help="질문 벡터에 더할 잡음 크기")
+    parser.add_argument("--batch", type=int, default=1000)
+    args = parser.parse_args()
+
+    ids, corpus = _load_corpus()
+    if not ids:
+        print("벡터DB가 비어 있습니다. 먼저 앱에서 PDF를 적재하세요.")
+        return
+
+    rng = np.random.default_rng(0)
+    picks = rng.choice(len(ids), size=min(args.queries, len(ids)), replace=False)
+    queries = _unit(corpus[picks]) + rng.normal(scale=args.noise, size=(len(picks), corpus.shape[1]))
+    queries = _unit(queries.astype(np.float32))
+    truth = exact_topk(corpus, queries, max(args.k))
+
+    print(f"청크 {len(ids)}개 · 차원 {corpus.shape[1]} · 질문 {len(queries)}개")
+    print(f"현재 설정: {chroma_db.hnsw_settings()['configured']}")
+    header = " ".join(f"recall@{k:<3}" for k in args.k)
+    print(f"\n{'M':>3} {'c_ef':>5} {'s_ef':>5}  {header}  {'p50':>7} {'p95':>7}  {'build':>6}  {'index':>8}")
+    for m, c_ef in itertools.product(args.m, args.construction_ef):
+        for r in evaluate(ids, corpus, queries, truth, m, c_ef, args.search_ef, args.k, args.batch):
+            recalls = " ".join(f"{r['recall'][k]:>9.3f}" for k in args.k)
+            print(
+                f"{m:>3} {c_ef:>5} {r['search_ef']:>5}  {recalls}  {r['p50_ms']:6.2f}ms {r['p95_ms']:6.2f}ms  "
+                f"{r['build_s']:5.1f}s  {r['index_mb']:6.2f}MB"
+            )
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,96 @@
+# scripts/precompute_study_packs.py
+"""
+폴더 안의 모든 PDF에 대해 학습 팩(전체 요약 · 페이지별 요약 · 난이도별 문제 · GPT 학습 팩)을
+미리 만들어 data/packs/<doc_hash>/v<N>.json 에 저장하는 배치 작업.
+
+- --workers 개수만큼만 동시에 처리 (LLM 호출량 제한)
+- 문서별로 단계마다 체크포인트를 남기므로, 중단 후 다시 실행하면 이어서 진행
+- 이미 완성된 팩(같은 해시 + 같은 버전)은 건너뜀
+
+    python -m scripts.precompute_study_packs --dir data/uploaded --workers 2
+"""
+
+import argparse
+import threading
+import time
+from concurrent.futures import ThreadPoolExecutor, as_completed
+from pathlib import Path
+
+from utils.extract_pdf import extract_text_from_pdf
+from utils.llm_scheduler import PRECOMPUTE, priority
+from utils.study_pack import (
+    DIFFICULTIES,
+    PACK_VERSION,
+    build_study_pack,
+    file_sha256,
+    load_study_pack,
+)
+
+_print_lock = threading.Lock()
+
+
+def _log(msg: str) -> None:
+    with _print_lock:
+        print(msg, flush=True)
+
+
+def process_pdf(pdf_path: Path, args) -> str:
+    doc_hash = file_sha256(pdf_path)
+    if load_study_pack(doc_hash) is not None:
+        return "skip"
+
+    pages = extract_text_from_pdf(pdf_path)
+    # 같은 프로세스에서 학생 요청이 들어오면 그쪽이 먼저 나가도록 가장 낮은 우선순위로 줄을 선다.
+    with priority(PRECOMPUTE):
+        build_study_pack(
+            pages,
+            doc_hash=doc_hash,
+            source_name=pdf_path.name,
+            difficulties=args.difficulties,
+            questions_per_page=args.questions_per_page,
+            page_summaries=not args.no_page_summaries,
+            log=_log,
+        )
+    return "done"
+
+
+def main() -> None:
+    parser = argparse.ArgumentParser(description="학습 팩 사전 생성 배치 작업")
+    parser.add_argument("--dir", default="data/uploaded", help="PDF가 들어 있는 폴더")
+    parser.add_argument("--workers", type=int, default=2, help="동시에 처리할 PDF 수")
+    parser.add_argument("--difficulties", nargs="+", default=DIFFICULTIES, choices=DIFFICULTIES)
+    parser.add_argument("--questions-per-page", type=int, default=2)
+    parser.add_argument("--no-page-summaries", action="store_true", help="페이지별 요약 생략")
+    args = parser.parse_args()
+
+    pdfs = sorted(Path(args.dir).glob("*.pdf"))
+    if not pdfs:
+        print(f"{args.dir} 에 PDF가 없습니다.")
+        return
+
+    _log(f"학습 팩 v{PACK_VERSION}: PDF {len(pdfs)}개, workers={args.workers}")
+    t0 = time.perf_counter()
+    counts = {"done": 0, "skip": 0, "failed": 0}
+
+    with ThreadPoolExecutor(max_workers=args.workers) as pool:
+        futures = {pool.submit(process_pdf, p, args): p for p in pdfs}
+        for fut in as_completed(futures):
+            pdf_path = futures[fut]
+            try:
+                status = fut.result()
+            except Exception as e:
+                # 실패한 문서는 체크포인트가 남아 있으므로 다음 실행 때 이어서 진행된다.
+                status = "failed"
+                _log(f"✗ {pdf_path.name}: {e!r}")
+            else:
+                _log(f"{'✓' if status == 'done' else '-'} {pdf_path.name} ({status})")
+            counts[status] += 1
+
+    _log(
+        f"완료 {counts['done']} / 건너뜀 {counts['skip']} / 실패 {counts['failed']} "
+        f"({time.perf_counter() - t0:.1f}s)"
+    )
+
+
+if __name__ == "__main__":
+    main()
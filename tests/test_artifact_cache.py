@@ -0,0 +1,95 @@
+# tests/test_artifact_cache.py
+
+import os
+import threading
+import time
+
+import pytest
+
+from utils.artifact_cache import ArtifactCache
+
+_VALUE = "x" * 1000   # 약 1KB
+
+
+def test_lru_spills_oldest_to_disk_and_reads_it_back(tmp_path):
+    cache = ArtifactCache(budget_bytes=2500, spill_dir=tmp_path)
+    for i in range(3):
+        cache.put("doc", "pages", _VALUE + str(i), params=i)
+    cache.get("doc", "pages", params=1)   # 1을 최근에 쓴 것으로
+    cache.put("doc", "pages", _VALUE + "3", params=3)
+
+    stats = cache.stats()
+    assert stats["evictions"] == 2
+    assert stats["bytes"] <= 2500
+    assert cache.get("doc", "pages", params=0) == _VALUE + "0"   # 디스크에서 다시 읽는다
+    assert cache.stats()["disk_hits"] == 1
+
+
+def test_compute_runs_once_for_concurrent_requests(tmp_path):
+    cache = ArtifactCache(budget_bytes=1 << 20, spill_dir=tmp_path)
+    calls = []
+
+    def compute():
+        calls.append(1)
+        time.sleep(0.1)
+        return "summary"
+
+    results = []
+    threads = [
+        threading.Thread(target=lambda: results.append(cache.get_or_compute("doc", "summary", compute)))
+        for _ in range(4)
+    ]
+    for t in threads:
+        t.start()
+    for t in threads:
+        t.join(timeout=5)
+    assert results == ["summary"] * 4
+    assert len(calls) == 1
+    assert not cache._inflight
+
+
+def test_failed_or_empty_compute_is_not_cached_and_releases_the_key(tmp_path):
+    cache = ArtifactCache(budget_bytes=1 << 20, spill_dir=tmp_path)
+
+    def boom():
+        raise RuntimeError("LLM down")
+
+    with pytest.raises(RuntimeError):
+        cache.get_or_compute("doc", "summary", boom)
+    assert not cache._inflight
+    assert cache.get_or_compute("doc", "summary", lambda: None) is None
+    assert cache.get_or_compute("doc", "summary", lambda: "ok") == "ok"
+
+
+def test_drop_removes_memory_and_disk_entries(tmp_path):
+    cache = ArtifactCache(budget_bytes=1 << 20, spill_dir=tmp_path)
+    cache.put("doc", "pages", ["p1"], persist=True)
+    cache.drop("doc")
+    assert cache.get("doc", "pages") is None
+    assert not (tmp_path / "doc").exists()
+
+
+def test_prune_disk_removes_least_recently_read_files(tmp_path):
+    cache = ArtifactCache(budget_bytes=0, spill_dir=tmp_path)   # 메모리에 두지 않고 디스크로만
+    for i in range(4):
+        cache.put(f"doc{i}", "pages", _VALUE)
+    files = sorted(tmp_path.glob("*/*.pkl"))
+    size = files[0].stat().st_size
+    now = time.time()
+    for i, path in enumerate(files):
+        os.utime(path, (now - 100 + i, now - 100 + i))   # doc0이 가장 오래됨
+    cache.get("doc0", "pages")   # 읽으면 mtime이 갱신된다
+
+    report = cache.prune_disk(budget_bytes=size * 2)
+    assert report["files_removed"] == 2
+    assert report["bytes_after"] <= size * 2
+    assert sorted(p.parent.name for p in tmp_path.glob("*/*.pkl")) == ["doc0", "doc3"]
+
+
+def test_disk_budget_is_enforced_while_spilling(tmp_path):
+    cache = ArtifactCache(budget_bytes=0, spill_dir=tmp_path, disk_budget_bytes=5000)
+    for i in range(20):
+        cache.put(f"doc{i}", "pages", _VALUE)
+    total = sum(p.stat().st_size for p in tmp_path.glob("*/*.pkl"))
+    # 예산의 10%를 쓸 때마다 정리하므로 예산 + 한 번 정리 주기 분량을 넘지 않는다
+    assert total <= 5000 * 1.1 + 1100
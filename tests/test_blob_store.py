@@ -0,0 +1,74 @@
+# tests/test_blob_store.py
+
+import pytest
+
+from utils import blob_store
+
+
+@pytest.fixture(autouse=True)
+def _isolated_store(tmp_path, monkeypatch):
+    monkeypatch.setattr(blob_store, "BLOB_DIR", tmp_path / "blobs")
+    monkeypatch.setattr(blob_store, "DB_PATH", tmp_path / "blobs" / "index.sqlite3")
+    monkeypatch.setattr(blob_store, "_initialized", False)
+
+
+def test_same_content_is_stored_once_and_counted_per_name():
+    h1 = blob_store.put(b"deck", "a.pdf", owner="u1")
+    h2 = blob_store.put(b"deck", "b.pdf", owner="u2")
+    assert h1 == h2
+    assert blob_store.refs(h1) == 2
+    assert blob_store.stats() == {"blobs": 1, "bytes": 4, "names": 2}
+
+
+def test_reputting_the_same_mapping_does_not_add_a_ref():
+    digest = blob_store.put(b"deck", "a.pdf", owner="u1")
+    blob_store.put(b"deck", "a.pdf", owner="u1")
+    assert blob_store.refs(digest) == 1
+
+
+def test_replacing_a_name_moves_the_ref_and_gc_removes_the_old_blob():
+    old = blob_store.put(b"v1", "lec.pdf", owner="u1")
+    new = blob_store.put(b"v2", "lec.pdf", owner="u1")
+    assert blob_store.refs(old) == 0
+    assert blob_store.refs(new) == 1
+    assert blob_store.resolve("lec.pdf", owner="u1") == new
+
+    report = blob_store.gc()
+    assert report["removed_hashes"] == [old]
+    assert report["bytes_reclaimed"] == 2
+    assert not blob_store.has(old)
+    assert blob_store.refs(old) is None
+    assert blob_store.has(new)
+
+
+def test_release_and_dry_run():
+    digest = blob_store.put(b"deck", "a.pdf", owner="u1")
+    assert blob_store.release("a.pdf", owner="u1")
+    assert not blob_store.release("a.pdf", owner="u1")
+
+    assert blob_store.gc(dry_run=True)["blobs_removed"] == 1
+    assert blob_store.has(digest)  # dry-run은 아무것도 지우지 않는다
+    assert blob_store.gc()["blobs_removed"] == 1
+    assert not blob_store.has(digest)
+
+
+def test_expired_names_are_unlinked_by_gc():
+    digest = blob_store.put(b"deck", "a.pdf", owner="u1")
+    report = blob_store.gc(name_ttl_days=-1)  # 모든 매핑이 만료된 것으로 본다
+    assert report["names_expired"] == 1
+    assert report["removed_hashes"] == [digest]
+    assert blob_store.resolve("a.pdf", owner="u1") is None
+
+
+def test_put_after_gc_restores_the_file():
+    digest = blob_store.put(b"deck", "a.pdf", owner="u1")
+    blob_store.release("a.pdf", owner="u1")
+    blob_store.gc()
+    assert blob_store.put(b"deck", "a.pdf", owner="u1") == digest
+    assert blob_store.has(digest)
+    assert blob_store.refs(digest) == 1
+
+
+def test_digest_mismatch_is_rejected():
+    with pytest.raises(ValueError):
+        blob_store.put(b"deck", "a.pdf", digest="0" * 64)
@@ -0,0 +1,80 @@
+# tests/test_chroma_writer.py
+
+import numpy as np
+import pytest
+
+from utils.chroma_writer import SingleWriter
+
+
+class _Collection:
+    """add/upsert만 흉내 내는 컬렉션. 한 번에 같은 id를 넘기면 Chroma처럼 거부한다."""
+
+    def __init__(self):
+        self.records = {}
+        self.calls = 0
+
+    def _write(self, ids, embeddings, documents, metadatas, overwrite):
+        self.calls += 1
+        if len(set(ids)) != len(ids):
+            raise ValueError("duplicate ids in one call")
+        if any((m or {}).get("bad") for m in metadatas):
+            raise ValueError("bad metadata")
+        for vid, doc in zip(ids, documents):
+            if overwrite or vid not in self.records:
+                self.records[vid] = doc
+
+    def add(self, ids, embeddings, documents, metadatas):
+        self._write(ids, embeddings, documents, metadatas, overwrite=False)
+
+    def upsert(self, ids, embeddings, documents, metadatas):
+        self._write(ids, embeddings, documents, metadatas, overwrite=True)
+
+
+def _payload(ids, docs, metas=None):
+    return ids, np.zeros((len(ids), 3), dtype=np.float32), docs, metas or [{} for _ in ids]
+
+
+def _submit_together(writer, kind, payloads):
+    # linger_s 안에 연달아 넣으면 한 번의 bulk 쓰기로 묶인다
+    return [writer._submit(kind, p) for p in payloads]
+
+
+def test_merged_add_keeps_first_of_duplicate_ids():
+    coll = _Collection()
+    writer = SingleWriter(lambda: coll, linger_s=0.2)
+    futures = _submit_together(writer, "add", [
+        _payload(["a", "b"], ["a1", "b1"]),
+        _payload(["b", "c"], ["b2", "c2"]),
+    ])
+    for f in futures:
+        assert f.result(timeout=5) is None
+    assert coll.records == {"a": "a1", "b": "b1", "c": "c2"}
+    assert coll.calls == 1
+
+
+def test_merged_upsert_keeps_last_of_duplicate_ids():
+    coll = _Collection()
+    writer = SingleWriter(lambda: coll, linger_s=0.2)
+    futures = _submit_together(writer, "upsert", [
+        _payload(["a", "b"], ["a1", "b1"]),
+        _payload(["b"], ["b2"]),
+    ])
+    for f in futures:
+        f.result(timeout=5)
+    assert coll.records == {"a": "a1", "b": "b2"}
+
+
+def test_one_bad_request_fails_only_its_own_future():
+    coll = _Collection()
+    writer = SingleWriter(lambda: coll, linger_s=0.2)
+    good1, bad, good2 = _submit_together(writer, "add", [
+        _payload(["a"], ["a1"]),
+        _payload(["b"], ["b1"], [{"bad": True}]),
+        _payload(["c"], ["c1"]),
+    ])
+    assert good1.result(timeout=5) is None
+    assert good2.result(timeout=5) is None
+    with pytest.raises(ValueError, match="bad metadata"):
+        bad.result(timeout=5)
+    assert coll.records == {"a": "a1", "c": "c1"}
+    assert writer.stats()["bulk_retries"] == 1
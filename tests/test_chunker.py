@@ -0,0 +1,43 @@
+# tests/test_chunker.py
+
+from utils.chunker import chunk_text_tokens, split_units
+
+
+def _count_words(texts):
+    """테스트용 토크나이저: 공백 단위 단어 수 (긴 단어는 4글자당 1토큰)."""
+    return [sum(max(1, len(w) // 4) for w in t.split()) for t in texts]
+
+
+def test_split_units_joins_wrapped_lines_and_splits_bullets():
+    text = "딥러닝은 신경망을\n여러 층 쌓은 모델이다.\n- 입력층\n- 은닉층 출력층"
+    assert split_units(text) == ["딥러닝은 신경망을 여러 층 쌓은 모델이다.", "- 입력층", "- 은닉층 출력층"]
+
+
+def test_chunks_never_exceed_max_tokens():
+    text = " ".join(f"문장 {i} 은 짧은 설명이다." for i in range(40))
+    chunks = chunk_text_tokens(text, max_tokens=20, overlap_tokens=5, count_tokens=_count_words)
+    assert len(chunks) > 1
+    assert all(n <= 20 for n in _count_words(chunks))
+
+
+def test_overlap_repeats_only_whole_trailing_sentences():
+    text = "가 나 다. 라 마 바. 사 아 자. 차 카 타."
+    chunks = chunk_text_tokens(text, max_tokens=6, overlap_tokens=3, count_tokens=_count_words)
+    assert chunks == ["가 나 다. 라 마 바.", "라 마 바. 사 아 자.", "사 아 자. 차 카 타."]
+
+
+def test_sentence_longer_than_max_is_split_on_words():
+    text = " ".join(["단어"] * 25) + "."
+    chunks = chunk_text_tokens(text, max_tokens=10, overlap_tokens=0, count_tokens=_count_words)
+    assert [n for n in _count_words(chunks)] == [10, 10, 5]
+
+
+def test_single_huge_token_is_split_by_characters():
+    url = "https://example.com/" + "a" * 200
+    chunks = chunk_text_tokens(url, max_tokens=10, overlap_tokens=2, count_tokens=_count_words)
+    assert "".join(chunks) == url
+    assert all(n <= 10 for n in _count_words(chunks))
+
+
+def test_empty_text():
+    assert chunk_text_tokens("  \n ", max_tokens=10, overlap_tokens=2, count_tokens=_count_words) == []
@@ -0,0 +1,93 @@
+# tests/test_circuit_breaker.py
+
+import threading
+import time
+
+import pytest
+
+from utils import llm_resilience
+from utils.llm_resilience import CircuitBreaker
+
+
+def _open_breaker(reset_timeout: float = 0.05) -> CircuitBreaker:
+    breaker = CircuitBreaker(failure_threshold=2, reset_timeout=reset_timeout)
+    breaker.record_failure()
+    breaker.record_failure()
+    return breaker
+
+
+def test_opens_after_threshold_and_half_opens_after_timeout():
+    breaker = _open_breaker()
+    assert breaker.state == "open"
+    assert not breaker.allow()
+    time.sleep(0.06)
+    assert breaker.state == "half-open"
+
+
+def test_half_open_allows_a_single_trial():
+    breaker = _open_breaker()
+    time.sleep(0.06)
+    assert breaker.allow()
+    assert not breaker.allow()  # 시험 호출이 진행 중이면 다른 호출은 막는다
+
+
+def test_trial_success_closes_and_failure_reopens():
+    breaker = _open_breaker()
+    time.sleep(0.06)
+    assert breaker.allow()
+    breaker.record_success()
+    assert breaker.state == "closed"
+
+    breaker = _open_breaker()
+    time.sleep(0.06)
+    assert breaker.allow()
+    breaker.record_failure()
+    assert breaker.state == "open"
+
+
+def test_release_trial_only_by_owner_thread():
+    breaker = _open_breaker()
+    time.sleep(0.06)
+    assert breaker.allow()
+
+    other = threading.Thread(target=breaker.release_trial)
+    other.start()
+    other.join()
+    assert not breaker.allow()  # 다른 스레드는 자리를 돌려줄 수 없다
+
+    breaker.release_trial()
+    assert breaker.state == "half-open"
+    assert breaker.allow()
+
+
+class _HTTPError(Exception):
+    def __init__(self, code: int):
+        super().__init__(f"HTTP {code}")
+        self.code = code
+
+
+@pytest.mark.parametrize("code", [400, 401, 403, 404])
+def test_non_retryable_errors_do_not_open_the_circuit(code):
+    name = f"test-non-retryable-{code}"
+
+    def provider(prompt, temperature, timeout_s, model, schema=None, context=None):
+        raise _HTTPError(code)
+
+    llm_resilience.register_provider(name, provider)
+    for _ in range(llm_resilience.BREAKER_FAILURES + 1):
+        with pytest.raises(RuntimeError):
+            llm_resilience.generate_text(f"prompt {code}", providers=(name,), max_attempts=1)
+    assert llm_resilience.get_breaker(name).state == "closed"
+
+
+def test_retryable_errors_open_the_circuit():
+    name = "test-retryable-503"
+
+    def provider(prompt, temperature, timeout_s, model, schema=None, context=None):
+        raise _HTTPError(503)
+
+    llm_resilience.register_provider(name, provider)
+    for i in range(llm_resilience.BREAKER_FAILURES):
+        with pytest.raises(RuntimeError):
+            llm_resilience.generate_text(f"prompt {i}", providers=(name,), max_attempts=1)
+    assert llm_resilience.get_breaker(name).state == "open"
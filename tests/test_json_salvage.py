@@ -0,0 +1,32 @@
+# tests/test_json_salvage.py
+
+from utils.json_salvage import iter_json_array, parse_json_array
+
+
+def test_prose_with_brackets_before_array():
+    items, complete = parse_json_array('다음은 [페이지 1] 문제입니다: [{"a":1}]')
+    assert items == [{"a": 1}]
+    assert complete
+
+
+def test_echoed_prompt_header_and_fence():
+    text = '[대상 페이지] 3\n```json\n[\n  {"a": 1},\n  {"a": 2}\n]\n```'
+    items, complete = parse_json_array(text)
+    assert items == [{"a": 1}, {"a": 2}]
+    assert complete
+
+
+def test_wrapped_object_and_empty_array():
+    assert parse_json_array('{"items": [{"a": 1}]}') == ([{"a": 1}], True)
+    assert parse_json_array("[페이지 2] 없음: []") == ([], True)
+
+
+def test_truncated_and_broken_elements_are_salvaged():
+    items, complete = parse_json_array('[{"a": 1}, {"a": oops}, {"a": 3}, {"a": 4')
+    assert items == [{"a": 1}, {"a": 3}]
+    assert not complete
+
+
+def test_streaming_chunks_split_inside_prefix():
+    chunks = ["[페이", "지 1] 결과: [", " {\"a\"", ": 1}, {\"a\": 2}", "]"]
+    assert list(iter_json_array(chunks)) == [{"a": 1}, {"a": 2}]
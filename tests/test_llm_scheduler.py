@@ -0,0 +1,85 @@
+# tests/test_llm_scheduler.py
+
+import threading
+import time
+
+import pytest
+
+from utils.llm_scheduler import INTERACTIVE, PRECOMPUTE, LLMScheduler, TokenBucket
+
+
+def test_token_bucket_wait_time_and_oversized_requests():
+    bucket = TokenBucket(rate_per_s=10, capacity=2)
+    assert bucket.wait_time(2) == 0.0
+    bucket.take(2)
+    assert bucket.wait_time(1) == pytest.approx(0.1, abs=0.02)
+    # 한도보다 큰 요청도 capacity만큼만 기다리면 통과한다
+    assert bucket.wait_time(100) == pytest.approx(0.2, abs=0.02)
+
+
+def _drained_scheduler(provider: str) -> LLMScheduler:
+    sched = LLMScheduler(rpm=1200, tpm=10_000_000)  # 요청 버킷: 초당 20개
+    sched._provider_buckets(provider)[0]._tokens = 0
+    return sched
+
+
+def test_interactive_request_overtakes_queued_precompute():
+    sched = _drained_scheduler("p")
+    order = []
+
+    def call(level, name):
+        sched.acquire("p", 1, level=level)
+        order.append(name)
+
+    batch = threading.Thread(target=call, args=(PRECOMPUTE, "precompute"))
+    batch.start()
+    time.sleep(0.01)  # 배치 요청이 먼저 줄을 선다
+    student = threading.Thread(target=call, args=(INTERACTIVE, "interactive"))
+    student.start()
+    batch.join(timeout=5)
+    student.join(timeout=5)
+
+    assert order == ["interactive", "precompute"]
+
+
+def test_acquire_timeout_does_not_take_tokens():
+    sched = _drained_scheduler("p")
+    with pytest.raises(TimeoutError):
+        sched.acquire("p", 1, timeout=0.01)
+    assert sched.stats()["queue_depth"] == 0
+
+
+def test_coalesce_runs_identical_requests_once():
+    sched = LLMScheduler()
+    calls = []
+    results = []
+
+    def work():
+        calls.append(1)
+        time.sleep(0.1)
+        return "answer"
+
+    threads = [
+        threading.Thread(target=lambda: results.append(sched.coalesce("same-prompt", work)))
+        for _ in range(4)
+    ]
+    for t in threads:
+        t.start()
+    for t in threads:
+        t.join(timeout=5)
+
+    assert results == ["answer"] * 4
+    assert len(calls) == 1
+    assert sched.stats()["inflight"] == 0
+
+
+def test_coalesce_shares_errors_and_releases_the_key():
+    sched = LLMScheduler()
+
+    def boom():
+        raise RuntimeError("provider down")
+
+    with pytest.raises(RuntimeError):
+        sched.coalesce("k", boom)
+    # 실패한 요청은 남아 있지 않으므로 다음 호출은 새로 실행된다
+    assert sched.coalesce("k", lambda: "ok") == "ok"
@@ -0,0 +1,69 @@
+# tests/test_question_bank.py
+
+import pytest
+
+from utils import question_bank
+
+
+@pytest.fixture(autouse=True)
+def _isolated_bank(tmp_path, monkeypatch):
+    monkeypatch.setattr(question_bank, "DB_PATH", tmp_path / "question_bank.sqlite3")
+    monkeypatch.setattr(question_bank, "_initialized", False)
+
+
+def _q(page, text, answer=1):
+    return {
+        "page": page,
+        "question": text,
+        "choices": {"1": "가", "2": "나", "3": "다", "4": "라"},
+        "answer": answer,
+        "explain": "",
+    }
+
+
+def test_near_duplicates_are_skipped_per_page():
+    added = question_bank.add_questions("doc", "easy", [
+        _q(1, "경사하강법에서 학습률의 역할은 무엇인가?"),
+        _q(1, "경사하강법에서 학습률의 역할은 무엇인가요?"),   # 어미만 다름 → 중복
+        _q(1, "경사 하강법에서, 학습률의 역할은 무엇인가?"),   # 띄어쓰기 / 문장부호만 다름 → 중복
+        _q(2, "경사하강법에서 학습률의 역할은 무엇인가?"),     # 다른 페이지는 따로
+        _q(1, "활성화 함수로 ReLU를 쓰는 이유는?"),
+    ])
+    assert added == 3
+    assert question_bank.count_questions("doc", "easy") == {1: 2, 2: 1}
+
+
+def test_invalid_questions_are_ignored():
+    added = question_bank.add_questions("doc", "easy", [
+        {"page": "x", "question": "페이지 없음", "choices": {}, "answer": 1},
+        _q(1, "   "),
+        {"page": 1, "question": "보기 형식이 다름", "choices": ["가", "나"], "answer": 1},
+    ])
+    assert added == 0
+
+
+def test_seed_questions_runs_once_per_page():
+    pack = {"easy": [_q(1, "첫 번째 문제"), _q(2, "두 번째 문제")]}
+    assert question_bank.seed_questions("doc", pack) == 2
+    assert question_bank.seed_questions("doc", pack) == 0
+
+    # 이미 넣은 페이지는 다른 문제가 와도 건너뛰고, 새 페이지만 넣는다
+    more = {"easy": [_q(1, "완전히 다른 새 문제"), _q(3, "세 번째 페이지 문제")]}
+    assert question_bank.seed_questions("doc", more) == 1
+    assert question_bank.count_questions("doc", "easy") == {1: 1, 2: 1, 3: 1}
+
+
+def test_draw_or_generate_only_generates_missing_pages():
+    question_bank.add_questions("doc", "medium", [_q(1, "이미 있는 문제 A"), _q(1, "이미 있는 문제 B")])
+    calls = []
+
+    def generate(pages, n):
+        calls.append((sorted(pages), n))
+        return [_q(p, f"{p}페이지 새 문제 {i}") for p in pages for i in range(n)]
+
+    questions = question_bank.draw_or_generate("doc", [1, 2, 3], 2, "medium", generate)
+    assert calls == [([2, 3], 2)]
+    assert sorted(q["page"] for q in questions) == [1, 1, 2, 2, 3, 3]
+
+    question_bank.draw_or_generate("doc", [1, 2, 3], 2, "medium", generate)
+    assert len(calls) == 1  # 두 번째는 문제 은행에서만 꺼낸다
@@ -0,0 +1,42 @@
+# tests/test_rerank.py
+
+import numpy as np
+
+from utils.rerank import mmr_select
+
+# 질의와 가까운 후보 둘(0, 1)은 서로 거의 같고, 2는 조금 덜 가깝지만 다른 내용이다.
+QUERY = np.array([1.0, 0.0, 0.0])
+DOCS = np.array([
+    [0.95, 0.31, 0.0],
+    [0.95, 0.30, 0.0],
+    [0.80, 0.0, 0.60],
+    [0.0, 1.0, 0.0],
+])
+
+
+def test_near_duplicates_are_not_both_picked():
+    picked = mmr_select(QUERY, DOCS, k=2, lambda_mult=0.5)
+    assert len(picked) == 2
+    assert not {0, 1} <= set(picked)
+    assert 2 in picked
+
+
+def test_lambda_one_is_plain_relevance_order():
+    assert mmr_select(QUERY, DOCS, k=3, lambda_mult=1.0)[:2] == [1, 0]
+
+
+def test_budget_skips_candidates_that_do_not_fit():
+    costs = [100, 100, 500, 50]
+    picked = mmr_select(QUERY, DOCS, k=3, lambda_mult=0.5, costs=costs, budget=200)
+    assert sum(costs[i] for i in picked) <= 200
+    assert 2 not in picked  # 예산을 넘는 후보는 건너뛰고 더 짧은 후보를 본다
+
+
+def test_first_candidate_is_kept_even_over_budget():
+    picked = mmr_select(QUERY, DOCS, k=2, lambda_mult=1.0, costs=[900, 900, 900, 900], budget=100)
+    assert picked == [1]
+
+
+def test_empty_inputs():
+    assert mmr_select(QUERY, np.zeros((0, 3)), k=3) == []
+    assert mmr_select(QUERY, DOCS, k=0) == []
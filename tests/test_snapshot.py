@@ -0,0 +1,77 @@
+# tests/test_snapshot.py
+
+from types import SimpleNamespace
+
+import numpy as np
+import pytest
+
+# snapshot은 chroma_db / embedder를 불러오므로, 전체 의존성이 있을 때만 실행한다.
+pytest.importorskip("chromadb")
+pytest.importorskip("sentence_transformers")
+
+IDS = ["d1:p1:0", "d1:p2:0", "d1:p2:1"]
+DOCS = ["첫 문단", "둘째 문단", "셋째 문단"]
+METAS = [{"deck": "d1", "page": 1}, {"deck": "d1", "page": 2}, {"deck": "d1", "page": 2}]
+EMBS = np.arange(12, dtype=np.float32).reshape(3, 4)
+DECKS = {"d1": {"doc_hash": "d1", "source": "lec.pdf", "page_hashes": ["a", "b"]}}
+PAGES = {"d1": ["페이지 1", "페이지 2"]}
+
+
+@pytest.fixture
+def snapshot(tmp_path, monkeypatch):
+    # chroma_db는 import할 때 현재 폴더에 DB를 연다 → 테스트 폴더에서 불러온다
+    monkeypatch.chdir(tmp_path)
+    from utils import snapshot as module
+    from utils.artifact_cache import ArtifactCache
+
+    monkeypatch.setattr(module.ingest, "load_manifest_decks", lambda: DECKS)
+    monkeypatch.setattr(module, "_collect_pages", lambda decks, upload_dir: PAGES)
+    monkeypatch.setattr(
+        module.chroma_db, "dump_records",
+        lambda: iter([{"ids": IDS, "embeddings": EMBS, "documents": DOCS, "metadatas": METAS}]),
+    )
+    loaded, merged = [], []
+    monkeypatch.setattr(module.chroma_db, "load_records", lambda *args: loaded.append(args))
+    monkeypatch.setattr(module.ingest, "merge_manifest_decks", lambda decks: merged.append(decks))
+    cache = ArtifactCache(budget_bytes=1 << 20, spill_dir=tmp_path / "cache")
+    monkeypatch.setattr(module, "get_artifact_cache", lambda: cache)
+    return SimpleNamespace(module=module, loaded=loaded, merged=merged, cache=cache)
+
+
+def test_export_import_round_trip(snapshot, tmp_path):
+    path = tmp_path / "node.smsnap"
+    report = snapshot.module.export_snapshot(path)
+    assert report["vectors"] == 3 and report["dim"] == 4
+
+    header = snapshot.module.read_snapshot_header(path)
+    assert header["count"] == 3
+    assert all(sec["offset"] % 64 == 0 for sec in header["sections"].values())
+
+    snapshot.module.import_snapshot(path)
+    (ids, embeddings, documents, metadatas), = snapshot.loaded
+    assert ids == IDS and documents == DOCS and metadatas == METAS
+    np.testing.assert_array_equal(np.asarray(embeddings), EMBS)
+    assert snapshot.merged == [DECKS]
+    assert snapshot.cache.get("d1", "pages", snapshot.module.PAGES_CACHE_PARAMS) == PAGES["d1"]
+
+
+def test_corrupted_section_fails_checksum_before_writing(snapshot, tmp_path):
+    path = tmp_path / "node.smsnap"
+    snapshot.module.export_snapshot(path)
+    sec = snapshot.module.read_snapshot_header(path)["sections"]["documents"]
+    data = bytearray(path.read_bytes())
+    data[sec["offset"] + 1] ^= 0xFF
+    path.write_bytes(bytes(data))
+
+    with pytest.raises(ValueError, match="documents"):
+        snapshot.module.import_snapshot(path)
+    assert snapshot.loaded == []   # 검증이 먼저 실패해 아무것도 쓰지 않는다
+    assert snapshot.merged == []
+
+
+def test_truncated_file_is_rejected(snapshot, tmp_path):
+    path = tmp_path / "node.smsnap"
+    snapshot.module.export_snapshot(path)
+    path.write_bytes(path.read_bytes()[:-4])
+    with pytest.raises(ValueError):
+        snapshot.module.read_snapshot_header(path)
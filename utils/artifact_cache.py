@@ -0,0 +1,287 @@
+# utils/artifact_cache.py
+
+from typing import Any, Callable, Dict, Hashable, List, Optional, Tuple
+from collections import OrderedDict
+from pathlib import Path
+import hashlib
+import os
+import pickle
+import sys
+import threading
+
+# 프로세스 전체에서 공유하는 메모리 예산 (MB)과 디스크 spill 위치 / 디스크 예산 (MB)
+DEFAULT_BUDGET_MB = int(os.getenv("STUDY_MATE_CACHE_MB", "512"))
+DEFAULT_SPILL_DIR = Path(os.getenv("STUDY_MATE_CACHE_DIR", "data/cache/artifacts"))
+DEFAULT_DISK_BUDGET_MB = int(os.getenv("STUDY_MATE_CACHE_DISK_MB", "2048"))
+
+# 디스크에 새로 쓴 양이 디스크 예산의 이 비율을 넘을 때마다 spill 폴더를 정리한다.
+_PRUNE_EVERY = 0.1
+
+_Key = Tuple[str, str, str]  # (doc_hash, kind, params_digest)
+_MISSING = object()
+
+
+def _sizeof(value: Any) -> int:
+    """캐시 항목이 차지하는 메모리를 대략 계산 (bytes/str/list/dict 위주)."""
+    if isinstance(value, (bytes, bytearray, str)):
+        return sys.getsizeof(value)
+    if isinstance(value, (list, tuple, set, frozenset)):
+        return sys.getsizeof(value) + sum(_sizeof(v) for v in value)
+    if isinstance(value, dict):
+        return sys.getsizeof(value) + sum(_sizeof(k) + _sizeof(v) for k, v in value.items())
+    return sys.getsizeof(value)
+
+
+def _params_digest(params: Hashable) -> str:
+    return hashlib.sha1(repr(params).encode("utf-8")).hexdigest()[:12]
+
+
+class ArtifactCache:
+    """
+    문서 해시(doc_hash) 기준으로 추출 텍스트 / 페이지 이미지 / 청크 / 요약 등을 공유하는 캐시.
+
+    - 모든 세션(스크립트 스레드)이 같은 인스턴스를 쓰므로
+      같은 PDF를 30명이 열어도 메모리에는 한 벌만 올라간다.
+    - 메모리 사용량이 budget_bytes를 넘으면 가장 오래 안 쓴 항목부터 디스크로 내린다(LRU spill).
+    - 디스크 spill은 disk_budget_bytes를 넘으면 가장 오래 안 읽은 파일(mtime)부터 지운다.
+    - 같은 항목을 여러 세션이 동시에 요청하면 한 번만 계산한다.
+
+    캐시에서 꺼낸 값은 여러 세션이 공유하므로 호출 쪽에서 수정하면 안 된다.
+    """
+
+    def __init__(
+        self,
+        budget_bytes: int,
+        spill_dir: Optional[Path] = None,
+        disk_budget_bytes: Optional[int] = None,
+    ):
+        self.budget_bytes = budget_bytes
+        self.spill_dir = Path(spill_dir) if spill_dir else None
+        self.disk_budget_bytes = disk_budget_bytes
+        # 처음 쓸 때 한 번 정리하도록 예산만큼 쓴 것으로 시작한다
+        self._written_since_prune = disk_budget_bytes or 0
+
+        self._lock = threading.Lock()
+        self._items: "OrderedDict[_Key, Tuple[Any, int]]" = OrderedDict()
+        self._bytes = 0
+        self._inflight: Dict[_Key, threading.Lock] = {}
+        self._stats = {"hits": 0, "disk_hits": 0, "misses": 0, "evictions": 0}
+
+    # ── 내부: 디스크 spill ─────────────────────
+    def _spill_path(self, key: _Key) -> Optional[Path]:
+        if self.spill_dir is None:
+            return None
+        doc_hash, kind, digest = key
+        return self.spill_dir / doc_hash / f"{kind}-{digest}.pkl"
+
+    def _write_spill(self, key: _Key, value: Any) -> None:
+        path = self._spill_path(key)
+        if path is None or path.exists():
+            return
+        path.parent.mkdir(parents=True, exist_ok=True)
+        tmp = path.with_suffix(f".{threading.get_ident()}.tmp")
+        with open(tmp, "wb") as f:
+            pickle.dump(value, f, protocol=pickle.HIGHEST_PROTOCOL)
+            written = f.tell()
+        os.replace(tmp, path)
+
+        if self.disk_budget_bytes is None:
+            return
+        with self._lock:
+            self._written_since_prune += written
+            due = self._written_since_prune >= self.disk_budget_bytes * _PRUNE_EVERY
+            if due:
+                self._written_since_prune = 0
+        if due:
+            self.prune_disk()
+
+    def _read_spill(self, key: _Key) -> Any:
+        path = self._spill_path(key)
+        if path is None or not path.exists():
+            return _MISSING
+        try:
+            with open(path, "rb") as f:
+                value = pickle.load(f)
+            os.utime(path)  # mtime = 마지막으로 읽은 시각 (prune_disk의 LRU 기준)
+            return value
+        except (OSError, pickle.UnpicklingError, EOFError):
+            return _MISSING
+
+    # ── 내부: 메모리 LRU ───────────────────────
+    def _insert(self, key: _Key, value: Any) -> list:
+        """메모리에 넣고, 예산을 넘기면 밀려난 항목 목록을 반환 (lock 안에서 호출)."""
+        size = _sizeof(value)
+        if key in self._items:
+            self._bytes -= self._items.pop(key)[1]
+
+        evicted = []
+        if size > self.budget_bytes:
+            # 예산보다 큰 항목은 메모리에 두지 않고 디스크로만 보낸다.
+            evicted.append((key, value))
+            return evicted
+
+        self._items[key] = (value, size)
+        self._bytes += size
+        while self._bytes > self.budget_bytes and self._items:
+            old_key, (old_value, old_size) = self._items.popitem(last=False)
+            self._bytes -= old_size
+            self._stats["evictions"] += 1
+            evicted.append((old_key, old_value))
+        return evicted
+
+    def _lookup(self, key: _Key) -> Any:
+        with self._lock:
+            if key in self._items:
+                self._items.move_to_end(key)
+                self._stats["hits"] += 1
+                return self._items[key][0]
+
+        value = self._read_spill(key)
+        if value is _MISSING:
+            return _MISSING
+
+        with self._lock:
+            self._stats["disk_hits"] += 1
+            evicted = self._insert(key, value)
+        for k, v in evicted:
+            self._write_spill(k, v)
+        return value
+
+    # ── 공개 API ───────────────────────────────
+    def get(self, doc_hash: str, kind: str, params: Hashable = ()) -> Any:
+        """캐시에 있으면 값을, 없으면 None을 반환."""
+        value = self._lookup((doc_hash, kind, _params_digest(params)))
+        return None if value is _MISSING else value
+
+    def put(
+        self,
+        doc_hash: str,
+        kind: str,
+        value: Any,
+        params: Hashable = (),
+        persist: bool = False,
+    ) -> None:
+        """persist=True면 디스크에도 바로 써서, 다른 프로세스(앱)가 다음에 읽을 수 있게 한다."""
+        key = (doc_hash, kind, _params_digest(params))
+        with self._lock:
+            evicted = self._insert(key, value)
+        if persist:
+            self._write_spill(key, value)
+        for k, v in evicted:
+            self._write_spill(k, v)
+
+    def get_or_compute(
+        self,
+        doc_hash: str,
+        kind: str,
+        compute: Callable[[], Any],
+        params: Hashable = (),
+    ) -> Any:
+        """
+        캐시에 있으면 바로 반환하고, 없으면 compute()로 만들어 저장한 뒤 반환.
+        compute()가 None을 돌려주거나 예외를 던지면 캐시하지 않는다 (실패 결과를 모든 세션에 돌려주지 않도록).
+        여러 세션이 동시에 같은 항목을 요청해도 compute()는 한 번만 실행된다.
+        """
+        key = (doc_hash, kind, _params_digest(params))
+        value = self._lookup(key)
+        if value is not _MISSING:
+            return value
+
+        with self._lock:
+            key_lock = self._inflight.setdefault(key, threading.Lock())
+
+        try:
+            with key_lock:
+                # 기다리는 동안 다른 세션이 이미 계산했을 수 있다.
+                value = self._lookup(key)
+                if value is _MISSING:
+                    with self._lock:
+                        self._stats["misses"] += 1
+                    value = compute()
+                    # None(아직 없는 결과)은 저장하지 않아서, 나중에 생기면 다시 읽어 온다.
+                    # compute()가 예외를 던지면 아무것도 저장하지 않는다 → 다음 요청이 다시 계산한다.
+                    if value is not None:
+                        self.put(doc_hash, kind, value, params)
+        finally:
+            with self._lock:
+                self._inflight.pop(key, None)
+        return value
+
+    def drop(self, doc_hash: str) -> None:
+        """문서 하나의 캐시 항목을 메모리/디스크에서 모두 제거."""
+        with self._lock:
+            for key in [k for k in self._items if k[0] == doc_hash]:
+                self._bytes -= self._items.pop(key)[1]
+        if self.spill_dir is not None:
+            doc_dir = self.spill_dir / doc_hash
+            if doc_dir.is_dir():
+                for p in doc_dir.iterdir():
+                    p.unlink(missing_ok=True)
+                doc_dir.rmdir()
+
+    def prune_disk(self, budget_bytes: Optional[int] = None, dry_run: bool = False) -> Dict[str, int]:
+        """
+        spill 폴더가 budget_bytes(기본: disk_budget_bytes)를 넘으면 가장 오래 안 읽은 파일부터 지운다.
+        반환: {"files_before", "files_removed", "bytes_before", "bytes_after", "bytes_reclaimed"}
+        """
+        budget = self.disk_budget_bytes if budget_bytes is None else budget_bytes
+        files: List[Tuple[float, int, Path]] = []
+        if self.spill_dir is not None and self.spill_dir.is_dir():
+            for path in self.spill_dir.glob("*/*.pkl"):
+                try:
+                    st = path.stat()
+                except OSError:
+                    continue  # 다른 스레드가 방금 지웠다
+                files.append((st.st_mtime, st.st_size, path))
+
+        total = sum(size for _, size, _ in files)
+        bytes_before, removed, reclaimed = total, 0, 0
+        if budget is not None and total > budget:
+            files.sort(key=lambda f: f[0])
+            for _, size, path in files:
+                if total <= budget:
+                    break
+                if not dry_run:
+                    path.unlink(missing_ok=True)
+                    try:
+                        path.parent.rmdir()  # 문서 폴더가 비었으면 같이 지운다
+                    except OSError:
+                        pass
+                total -= size
+                removed += 1
+                reclaimed += size
+        return {
+            "files_before": len(files),
+            "files_removed": removed,
+            "bytes_before": bytes_before,
+            "bytes_after": bytes_before - reclaimed,
+            "bytes_reclaimed": reclaimed,
+        }
+
+    def stats(self) -> Dict[str, int]:
+        with self._lock:
+            return {
+                "entries": len(self._items),
+                "bytes": self._bytes,
+                "budget_bytes": self.budget_bytes,
+                "disk_budget_bytes": self.disk_budget_bytes,
+                **self._stats,
+            }
+
+
+_cache: Optional[ArtifactCache] = None
+_cache_lock = threading.Lock()
+
+
+def get_artifact_cache() -> ArtifactCache:
+    """프로세스 전체에서 하나만 쓰는 ArtifactCache (lazy 생성)."""
+    global _cache
+    if _cache is None:
+        with _cache_lock:
+            if _cache is None:
+                _cache = ArtifactCache(
+                    budget_bytes=DEFAULT_BUDGET_MB * 1024 * 1024,
+                    spill_dir=DEFAULT_SPILL_DIR,
+                    disk_budget_bytes=DEFAULT_DISK_BUDGET_MB * 1024 * 1024,
+                )
+    return _cache
@@ -0,0 +1,221 @@
+# utils/blob_store.py
+
+from typing import Dict, List, Optional
+from pathlib import Path
+import hashlib
+import os
+import sqlite3
+import threading
+import time
+
+# 업로드 원본을 내용 해시(SHA-256)로 저장하는 저장소.
+# 같은 파일은 이름이 달라도 한 번만 저장되고, 같은 이름의 다른 파일끼리 덮어쓰지 않는다.
+BLOB_DIR = Path(os.getenv("STUDY_MATE_BLOB_DIR", "data/blobs"))
+DB_PATH = BLOB_DIR / "index.sqlite3"
+
+# 이 기간(일) 동안 다시 올리지 않은 이름 매핑은 gc에서 정리한다 (세션이 끝나도 매핑은 남으므로)
+NAME_TTL_DAYS = float(os.getenv("STUDY_MATE_BLOB_NAME_TTL_DAYS", "30"))
+
+_SCHEMA = """
+CREATE TABLE IF NOT EXISTS blobs (
+    hash        TEXT    PRIMARY KEY,
+    size        INTEGER NOT NULL,
+    refs        INTEGER NOT NULL DEFAULT 0,   -- 이 blob을 가리키는 이름 매핑 수
+    created_at  REAL    NOT NULL
+);
+CREATE TABLE IF NOT EXISTS names (
+    owner       TEXT    NOT NULL,             -- 올린 사람(세션) 구분. 같은 이름도 owner별로 따로
+    name        TEXT    NOT NULL,
+    hash        TEXT    NOT NULL REFERENCES blobs(hash),
+    updated_at  REAL    NOT NULL,
+    PRIMARY KEY (owner, name)
+);
+CREATE INDEX IF NOT EXISTS idx_names_hash ON names (hash);
+"""
+
+_write_lock = threading.Lock()
+_initialized = False
+
+
+def _connect() -> sqlite3.Connection:
+    global _initialized
+    DB_PATH.parent.mkdir(parents=True, exist_ok=True)
+    conn = sqlite3.connect(str(DB_PATH), timeout=10, isolation_level=None)
+    conn.row_factory = sqlite3.Row
+    if not _initialized:
+        conn.execute("PRAGMA journal_mode=WAL")
+        conn.executescript(_SCHEMA)
+        _initialized = True
+    return conn
+
+
+def blob_path(digest: str) -> Path:
+    """해시 → 파일 경로 (앞 2글자로 폴더를 나눠서 한 폴더에 파일이 몰리지 않게 한다)."""
+    return BLOB_DIR / "sha256" / digest[:2] / f"{digest}.pdf"
+
+
+def has(digest: str) -> bool:
+    return blob_path(digest).is_file()
+
+
+def _write_once(data, digest: Optional[str]) -> str:
+    """
+    blob 파일을 원자적으로 쓴다 (임시 파일 → fsync → rename). 이미 있으면 쓰지 않는다.
+    digest를 넘기면 해시 계산을 건너뛰지만, 실제로 쓸 때는 내용과 맞는지 확인한다.
+    """
+    if digest and has(digest):
+        return digest
+    actual = hashlib.sha256(data).hexdigest()
+    if digest and digest != actual:
+        raise ValueError(f"blob 해시 불일치: {digest[:12]} != {actual[:12]}")
+    path = blob_path(actual)
+    if path.exists():
+        return actual
+    path.parent.mkdir(parents=True, exist_ok=True)
+    tmp = path.with_suffix(f".{os.getpid()}.{threading.get_ident()}.tmp")
+    with open(tmp, "wb") as f:
+        f.write(data)
+        f.flush()
+        os.fsync(f.fileno())
+    os.replace(tmp, path)
+    return actual
+
+
+def put(data, name: str, owner: str = "", digest: Optional[str] = None) -> str:
+    """
+    업로드 파일을 저장하고 (owner, name) → 해시 매핑을 기록한다. 해시를 반환.
+    - 같은 내용이면 파일은 다시 쓰지 않는다 (write-once)
+    - 같은 (owner, name)에 다른 내용을 올리면 매핑만 바꾸고, 이전 blob의 참조 수를 줄인다
+    """
+    digest = _write_once(data, digest)
+    now = time.time()
+    with _write_lock:
+        conn = _connect()
+        try:
+            conn.execute("BEGIN IMMEDIATE")  # 다른 프로세스와 참조 수가 엇갈리지 않게
+            conn.execute(
+                "INSERT OR IGNORE INTO blobs (hash, size, refs, created_at) VALUES (?, ?, 0, ?)",
+                (digest, len(data), now),
+            )
+            row = conn.execute(
+                "SELECT hash FROM names WHERE owner=? AND name=?", (owner, name)
+            ).fetchone()
+            if row is None or row["hash"] != digest:
+                if row is not None:
+                    conn.execute("UPDATE blobs SET refs = refs - 1 WHERE hash=?", (row["hash"],))
+                conn.execute("UPDATE blobs SET refs = refs + 1 WHERE hash=?", (digest,))
+            conn.execute(
+                "INSERT OR REPLACE INTO names (owner, name, hash, updated_at) VALUES (?, ?, ?, ?)",
+                (owner, name, digest, now),
+            )
+            conn.execute("COMMIT")
+        except BaseException:
+            conn.execute("ROLLBACK")
+            raise
+        finally:
+            conn.close()
+    # 참조 수가 0이던 사이에 gc가 파일을 지웠을 수 있다 → 없으면 다시 쓴다
+    _write_once(data, digest)
+    return digest
+
+
+def resolve(name: str, owner: str = "") -> Optional[str]:
+    """(owner, name)이 가리키는 해시 (없으면 None)."""
+    conn = _connect()
+    try:
+        row = conn.execute(
+            "SELECT hash FROM names WHERE owner=? AND name=?", (owner, name)
+        ).fetchone()
+    finally:
+        conn.close()
+    return row["hash"] if row else None
+
+
+def refs(digest: str) -> Optional[int]:
+    """이 blob을 가리키는 이름 매핑 수 (기록이 없으면 None)."""
+    conn = _connect()
+    try:
+        row = conn.execute("SELECT refs FROM blobs WHERE hash=?", (digest,)).fetchone()
+    finally:
+        conn.close()
+    return row["refs"] if row else None
+
+
+def _unlink_names(conn: sqlite3.Connection, rows) -> None:
+    for r in rows:
+        conn.execute("DELETE FROM names WHERE owner=? AND name=?", (r["owner"], r["name"]))
+        conn.execute("UPDATE blobs SET refs = refs - 1 WHERE hash=?", (r["hash"],))
+
+
+def release(name: str, owner: str = "") -> bool:
+    """이름 매핑을 지우고 참조 수를 줄인다. (blob 파일은 gc에서 지운다)"""
+    with _write_lock:
+        conn = _connect()
+        try:
+            conn.execute("BEGIN IMMEDIATE")
+            rows = conn.execute(
+                "SELECT owner, name, hash FROM names WHERE owner=? AND name=?", (owner, name)
+            ).fetchall()
+            _unlink_names(conn, rows)
+            conn.execute("COMMIT")
+        except BaseException:
+            conn.execute("ROLLBACK")
+            raise
+        finally:
+            conn.close()
+    return bool(rows)
+
+
+def gc(name_ttl_days: float = NAME_TTL_DAYS, dry_run: bool = False) -> Dict[str, int]:
+    """
+    1) name_ttl_days 동안 다시 올리지 않은 이름 매핑을 지운다
+    2) 참조 수가 0인 blob 파일과 기록을 지운다
+    지운 blob의 해시는 "removed_hashes"로 돌려주므로, 호출 쪽에서 해시 기준 캐시/벡터도 정리할 수 있다.
+
+    반환: {"names_expired", "blobs_removed", "bytes_reclaimed", "removed_hashes"}
+    """
+    cutoff = time.time() - name_ttl_days * 86400
+    with _write_lock:
+        conn = _connect()
+        try:
+            conn.execute("BEGIN IMMEDIATE")
+            expired = conn.execute(
+                "SELECT owner, name, hash FROM names WHERE updated_at < ?", (cutoff,)
+            ).fetchall()
+            _unlink_names(conn, expired)
+            dead = conn.execute("SELECT hash, size FROM blobs WHERE refs <= 0").fetchall()
+            if dry_run:
+                conn.execute("ROLLBACK")
+            else:
+                conn.executemany("DELETE FROM blobs WHERE hash=?", [(r["hash"],) for r in dead])
+                # 파일도 트랜잭션(쓰기 잠금) 안에서 지운다. 커밋한 뒤에 지우면 그 사이 put이
+                # 같은 blob을 다시 참조해도 파일이 사라져 "기록은 있는데 파일이 없는" 상태가 된다.
+                # (put은 자기 트랜잭션이 끝난 뒤 파일이 없으면 다시 쓴다)
+                for r in dead:
+                    blob_path(r["hash"]).unlink(missing_ok=True)
+                conn.execute("COMMIT")
+        except BaseException:
+            conn.execute("ROLLBACK")
+            raise
+        finally:
+            conn.close()
+
+    removed: List[str] = [r["hash"] for r in dead]
+    return {
+        "names_expired": len(expired),
+        "blobs_removed": len(removed),
+        "bytes_reclaimed": sum(r["size"] for r in dead),
+        "removed_hashes": removed,
+    }
+
+
+def stats() -> Dict[str, int]:
+    conn = _connect()
+    try:
+        row = conn.execute(
+            "SELECT COUNT(*) AS blobs, COALESCE(SUM(size), 0) AS bytes FROM blobs"
+        ).fetchone()
+        names = conn.execute("SELECT COUNT(*) AS n FROM names").fetchone()["n"]
+    finally:
+        conn.close()
+    return {"blobs": row["blobs"], "bytes": row["bytes"], "names": names}
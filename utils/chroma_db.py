@@ -1,13 +1,21 @@
 # utils/chroma_db.py
 
-from typing import List, Dict
+from typing import Any, Dict, Iterator, List, Optional
+from concurrent.futures import Future
 from pathlib import Path
+import json
+import os
+import sqlite3
+import time
 import uuid
 
 import chromadb
 from chromadb.config import Settings
 
-from utils.embedder import embed_texts
+from utils.embedder import embed_array, embed_texts
+from utils.chroma_writer import SingleWriter
+from utils.llm_scheduler import estimate_tokens
+from utils import blob_store, rerank
 
 # Chroma Persistent DB 설정 (폴더에 저장)
 CHROMA_DIR = Path("chroma_db")
@@ -16,41 +24,530 @@ CHROMA_DIR.mkdir(exist_ok=True)
 _client = chromadb.PersistentClient(path=str(CHROMA_DIR))
 
 _COLLECTION_NAME = "study_mate"
-_collection = _client.get_or_create_collection(
-    name=_COLLECTION_NAME,
-    metadata={"hnsw:space": "cosine"}  # 코사인 유사도
-)
 
+# HNSW 인덱스 설정 (기본값은 Chroma 기본값과 같다)
+# - M: 노드당 이웃 수. 크면 recall↑, 인덱스 메모리↑
+# - construction_ef: 인덱스를 만들 때 탐색 폭. 크면 인덱스 품질↑, 적재 시간↑
+# - search_ef: 검색할 때 탐색 폭. 크면 recall↑, 검색 지연↑
+# M / construction_ef는 컬렉션을 만들 때 고정되므로, 바꾼 뒤에는 compact()로 인덱스를 다시 만든다.
+HNSW_M = int(os.getenv("STUDY_MATE_HNSW_M", "16"))
+HNSW_CONSTRUCTION_EF = int(os.getenv("STUDY_MATE_HNSW_CONSTRUCTION_EF", "100"))
+HNSW_SEARCH_EF = int(os.getenv("STUDY_MATE_HNSW_SEARCH_EF", "10"))
 
-def add_chunks(chunks: List[str], source_name: str) -> None:
+
+def hnsw_metadata(
+    m: int = HNSW_M,
+    construction_ef: int = HNSW_CONSTRUCTION_EF,
+    search_ef: int = HNSW_SEARCH_EF,
+) -> Dict[str, Any]:
+    """컬렉션 metadata로 넘길 HNSW 설정 (코사인 유사도)."""
+    return {
+        "hnsw:space": "cosine",
+        "hnsw:M": m,
+        "hnsw:construction_ef": construction_ef,
+        "hnsw:search_ef": search_ef,
+    }
+
+
+# 인덱스를 실제로 만들 때 쓴 HNSW 설정 기록.
+# get_or_create_collection은 이미 있는 컬렉션에 넘긴 metadata를 그대로 돌려줄 수 있어서
+# 컬렉션 metadata만 보고는 인덱스가 어떤 설정으로 만들어졌는지 알 수 없다.
+HNSW_BUILD_PATH = CHROMA_DIR / "hnsw_build.json"
+
+
+def _load_hnsw_build() -> Optional[Dict[str, Any]]:
+    try:
+        with open(HNSW_BUILD_PATH, "r", encoding="utf-8") as f:
+            return json.load(f)
+    except (OSError, json.JSONDecodeError):
+        return None
+
+
+def _save_hnsw_build(metadata: Dict[str, Any]) -> None:
+    build = {k: v for k, v in metadata.items() if k.startswith("hnsw:")}
+    tmp = HNSW_BUILD_PATH.with_suffix(".json.tmp")
+    with open(tmp, "w", encoding="utf-8") as f:
+        json.dump(build, f, indent=2)
+    os.replace(tmp, HNSW_BUILD_PATH)
+
+
+# 지금 쓰는 컬렉션 이름 기록 (포인터).
+# compact()는 새 이름(study_mate__v<시각>)으로 인덱스를 다시 만든 뒤 이 파일만 바꿔서 전환하므로,
+# 어느 단계에서 멈춰도 포인터가 가리키는 컬렉션은 온전하다.
+LIVE_COLLECTION_PATH = CHROMA_DIR / "collection.json"
+# 예전 compact가 쓰던 임시 컬렉션 이름 (기존 컬렉션을 지운 뒤 이름을 바꾸는 방식이었다)
+_LEGACY_COMPACT_NAME = f"{_COLLECTION_NAME}__compact"
+
+
+def _load_live_name() -> Optional[str]:
+    try:
+        with open(LIVE_COLLECTION_PATH, "r", encoding="utf-8") as f:
+            return json.load(f).get("name")
+    except (OSError, json.JSONDecodeError, AttributeError):
+        return None
+
+
+def _save_live_name(name: str) -> None:
+    tmp = LIVE_COLLECTION_PATH.with_suffix(".json.tmp")
+    with open(tmp, "w", encoding="utf-8") as f:
+        json.dump({"name": name}, f)
+    os.replace(tmp, LIVE_COLLECTION_PATH)
+
+
+def _open_live_collection():
+    """
+    포인터가 가리키는 컬렉션을 연다. 포인터가 없으면(처음 / 예전 버전) 기본 이름을 쓴다.
+    - 예전 compact가 기존 컬렉션을 지우고 이름을 바꾸기 전에 멈췄다면 임시 컬렉션이 유일한 사본이므로 그걸 살린다.
+    - 포인터가 가리키지 않는 study_mate__* 컬렉션은 중단된 재구성본이거나 전환 뒤 못 지운 이전 컬렉션이라 지운다.
+    반환: (컬렉션 이름, 컬렉션)
+    """
+    names = {getattr(c, "name", c) for c in _client.list_collections()}
+    live = _load_live_name()
+    if live not in names:
+        live = _COLLECTION_NAME
+        if live not in names and _LEGACY_COMPACT_NAME in names:
+            live = _LEGACY_COMPACT_NAME
+    collection = _client.get_or_create_collection(name=live, metadata=_COLLECTION_METADATA)
+    _save_live_name(live)
+
+    for name in names - {live}:
+        if name.startswith(f"{_COLLECTION_NAME}__"):
+            try:
+                _client.delete_collection(name)
+            except Exception:
+                pass
+    return live, collection
+
+
+_COLLECTION_METADATA = hnsw_metadata()
+_live_name, _collection = _open_live_collection()
+# 기록이 없고 비어 있으면 지금 설정으로 새로 만든 인덱스다.
+# (벡터가 이미 있는데 기록이 없으면 어떤 설정으로 만들었는지 모르므로 비워 둔다 → compact 권장)
+if _load_hnsw_build() is None and _collection.count() == 0:
+    _save_hnsw_build(_COLLECTION_METADATA)
+
+# Chroma(sqlite)가 한 번에 받아주는 최대 레코드 수보다 약간 작게 잡는다.
+_MAX_BATCH = 5000
+
+# 모든 쓰기(add/upsert/update/delete/compact)는 writer 스레드 하나를 거친다.
+# 여러 세션의 동시 업로드는 bulk insert로 묶이고, 읽기(query/get)는 lock 없이 바로 실행된다.
+_writer = SingleWriter(lambda: _collection, max_batch=_MAX_BATCH)
+
+
+def _read(fn):
+    """
+    lock 없는 읽기. 읽는 사이에 compact()가 컬렉션을 바꾸고 이전 컬렉션을 지웠다면
+    새 컬렉션에서 한 번 더 읽는다.
+    """
+    collection = _collection
+    try:
+        return fn(collection)
+    except Exception:
+        if collection is _collection:
+            raise
+        return fn(_collection)
+
+
+def add_chunks(
+    chunks: List[str],
+    source_name: str,
+    doc_hash: Optional[str] = None,
+) -> None:
     """
     청크 리스트를 임베딩하고, Chroma 컬렉션에 저장.
     source_name: 업로드한 파일 이름 등.
+    doc_hash: PDF 바이트의 SHA-256. 주어지면 id를 "<doc_hash>:<index>"로 고정해서
+              같은 문서를 다시 넣어도 중복 벡터가 쌓이지 않는다(upsert).
     """
     if not chunks:
         return
 
-    embeddings = embed_texts(chunks)
+    metadatas = [{"source": source_name, "index": i} for i in range(len(chunks))]
+
+    if doc_hash:
+        ids = [f"{doc_hash}:{i}" for i in range(len(chunks))]
+        for meta in metadatas:
+            meta["doc_hash"] = doc_hash
+        upsert_chunks(ids, chunks, metadatas)
+        return
 
+    embeddings = embed_array(chunks)
     ids = [str(uuid.uuid4()) for _ in chunks]
-    metadatas = [{"source": source_name, "index": i} for i in range(len(chunks))]
+    for start in range(0, len(ids), _MAX_BATCH):
+        end = start + _MAX_BATCH
+        _writer.add(
+            ids=ids[start:end],
+            embeddings=embeddings[start:end],
+            documents=chunks[start:end],
+            metadatas=metadatas[start:end],
+        )
+
 
-    _collection.add(
-        documents=chunks,
-        embeddings=embeddings,
-        ids=ids,
-        metadatas=metadatas,
-    )
+def upsert_chunks(
+    ids: List[str],
+    chunks: List[str],
+    metadatas: List[Dict[str, Any]],
+) -> None:
+    """
+    id/메타데이터를 호출 쪽에서 직접 정해서 청크를 임베딩 + upsert.
+    (페이지 단위 증분 적재처럼 id 규칙이 따로 있는 경우에 사용)
+    """
+    if not chunks:
+        return
 
+    embeddings = embed_array(chunks)
+    for start in range(0, len(ids), _MAX_BATCH):
+        end = start + _MAX_BATCH
+        _writer.upsert(
+            ids=ids[start:end],
+            embeddings=embeddings[start:end],
+            documents=chunks[start:end],
+            metadatas=metadatas[start:end],
+        )
 
-def query_similar(query: str, top_k: int = 5) -> Dict:
+
+def upsert_chunks_nowait(
+    ids: List[str],
+    chunks: List[str],
+    metadatas: List[Dict[str, Any]],
+) -> Future:
+    """
+    청크를 지금 스레드에서 임베딩하고, 쓰기는 writer 큐에 넣기만 한다 (_MAX_BATCH개 이하).
+    스트리밍 적재에서 다음 배치 임베딩과 이전 배치 쓰기를 겹치게 할 때 쓴다.
+    넘긴 리스트는 쓰기가 끝날 때까지 writer가 참조하므로, 호출 쪽에서 고치지 말 것.
+    """
+    if len(ids) > _MAX_BATCH:
+        raise ValueError(f"한 번에 {_MAX_BATCH}개까지 넣을 수 있습니다: {len(ids)}")
+    return _writer.submit_upsert(ids, embed_array(chunks), chunks, metadatas)
+
+
+def load_records(
+    ids: List[str],
+    embeddings,
+    documents: List[str],
+    metadatas: List[Dict[str, Any]],
+) -> None:
+    """
+    이미 임베딩된 레코드를 그대로 upsert (스냅샷 가져오기 등, 임베딩 모델을 돌리지 않는다).
+    embeddings는 (n, dim) 배열이면 되고, np.memmap도 그대로 받는다.
+    """
+    for start in range(0, len(ids), _MAX_BATCH):
+        end = start + _MAX_BATCH
+        _writer.upsert(
+            ids=ids[start:end],
+            embeddings=embeddings[start:end],
+            documents=documents[start:end],
+            metadatas=metadatas[start:end],
+        )
+
+
+def get_metadatas(where: Dict[str, Any]) -> Dict[str, List]:
+    """where 조건에 맞는 벡터의 id와 메타데이터만 조회. 반환: {"ids": [...], "metadatas": [...]}"""
+    got = _read(lambda c: c.get(where=where, include=["metadatas"]))
+    return {"ids": got["ids"], "metadatas": got["metadatas"]}
+
+
+def has_vectors(where: Dict[str, Any]) -> bool:
+    """where 조건에 맞는 벡터가 하나라도 있는지 (레코드 하나만 읽는다)."""
+    return bool(_read(lambda c: c.get(where=where, limit=1, include=[]))["ids"])
+
+
+def update_metadatas(ids: List[str], metadatas: List[Dict[str, Any]]) -> None:
+    """임베딩은 그대로 두고 메타데이터만 갱신 (재임베딩 없음)."""
+    def _update() -> None:
+        for start in range(0, len(ids), _MAX_BATCH):
+            end = start + _MAX_BATCH
+            _collection.update(ids=ids[start:end], metadatas=metadatas[start:end])
+
+    _writer.call(_update)
+
+
+def query_similar(
+    query: str,
+    top_k: int = 5,
+    query_embedding: Optional[List[float]] = None,
+    diversify: Optional[bool] = None,
+    token_budget: Optional[int] = None,
+    where: Optional[Dict[str, Any]] = None,
+) -> Dict:
     """
     질의문(query)을 임베딩하여, 상위 top_k 유사 문단을 검색.
+    query_embedding: 호출 쪽에서 이미 임베딩했다면 넘겨서 다시 계산하지 않게 한다.
+    where: 메타데이터 조건 (예: {"deck": doc_hash} → 그 문서에서만 검색)
+
+    diversify=True(기본값: STUDY_MATE_MMR)이면 top_k×MMR_FETCH_MULT개를 가져온 뒤
+    MMR로 서로 겹치지 않는 top_k개 이하를 token_budget(기본 RAG_TOKEN_BUDGET) 안에서 고른다.
+    반환 형태는 Chroma query 결과와 같다 (ids/documents/metadatas/distances, 질의 하나).
     """
-    query_emb = embed_texts([query])[0]  # 하나만 넣었으니 [0] 사용
+    if query_embedding is None:
+        query_emb = embed_texts([query])[0]  # 하나만 넣었으니 [0] 사용
+    else:
+        query_emb = query_embedding
+
+    if diversify is None:
+        diversify = rerank.MMR_ENABLED
+    filters = {"where": where} if where else {}
+    if not diversify:
+        return _read(lambda c: c.query(query_embeddings=[query_emb], n_results=top_k, **filters))
 
-    result = _collection.query(
+    budget = rerank.RAG_TOKEN_BUDGET if token_budget is None else token_budget
+    result = _read(lambda c: c.query(
         query_embeddings=[query_emb],
-        n_results=top_k,
-    )
+        n_results=top_k * rerank.MMR_FETCH_MULT,
+        include=["documents", "metadatas", "distances", "embeddings"],
+        **filters,
+    ))
+    docs = (result.get("documents") or [[]])[0]
+    embeddings = result.pop("embeddings", None)
+    if not docs or embeddings is None:
+        return result
+
+    costs = [estimate_tokens(d, expected_output=0) for d in docs]
+    picked = rerank.mmr_select(query_emb, embeddings[0], top_k, costs=costs, budget=budget)
+    rerank.record_saving(sum(costs[:top_k]), sum(costs[i] for i in picked))
+
+    for field in ("ids", "documents", "metadatas", "distances"):
+        rows = result.get(field)
+        if rows:
+            result[field] = [[rows[0][i] for i in picked]]
     return result
+
+
+# ────────────────────────────────────────────
+# 삭제 / 정리(GC) / 압축(compaction)
+# ────────────────────────────────────────────
+def count_vectors() -> int:
+    """컬렉션에 저장된 벡터 개수."""
+    return _read(lambda c: c.count())
+
+
+def _dir_size(path: Path) -> int:
+    """폴더 아래 모든 파일 크기의 합(bytes)."""
+    total = 0
+    for p in path.rglob("*"):
+        try:
+            if p.is_file():
+                total += p.stat().st_size
+        except OSError:
+            pass
+    return total
+
+
+def _iter_records(
+    include: List[str],
+    batch_size: int = _MAX_BATCH,
+    where: Optional[Dict[str, Any]] = None,
+) -> Iterator[Dict[str, Any]]:
+    """
+    컬렉션 전체(where가 있으면 조건에 맞는 것만)를 batch_size 단위로 끊어서 get() 결과를 하나씩 돌려준다.
+    (순회 도중에 삭제하면 offset이 어긋나므로, 삭제는 순회가 끝난 뒤에 할 것)
+    """
+    offset = 0
+    while True:
+        got = _read(lambda c: c.get(where=where, include=include, limit=batch_size, offset=offset))
+        if not got["ids"]:
+            break
+        yield got
+        offset += len(got["ids"])
+
+
+def dump_records(batch_size: int = _MAX_BATCH) -> Iterator[Dict[str, Any]]:
+    """컬렉션 전체 레코드(ids/embeddings/documents/metadatas)를 batch_size씩 (스냅샷 내보내기용)."""
+    return _iter_records(include=["embeddings", "documents", "metadatas"], batch_size=batch_size)
+
+
+def iter_records(
+    where: Dict[str, Any], include: List[str], batch_size: int = _MAX_BATCH
+) -> Iterator[Dict[str, Any]]:
+    """where 조건에 맞는 레코드를 batch_size씩 (문서 하나의 벡터를 한꺼번에 올리지 않고 읽을 때)."""
+    return _iter_records(include=include, batch_size=batch_size, where=where)
+
+
+def delete_ids(ids: List[str]) -> None:
+    """id 목록으로 벡터 삭제."""
+    if not ids:
+        return
+
+    def _delete() -> None:
+        for start in range(0, len(ids), _MAX_BATCH):
+            _collection.delete(ids=ids[start:start + _MAX_BATCH])
+
+    _writer.call(_delete)
+
+
+def _delete_where(where: Dict[str, Any]) -> int:
+    found = _read(lambda c: c.get(where=where, include=[]))
+    ids = found["ids"]
+    if ids:
+        delete_ids(ids)
+    return len(ids)
+
+
+def delete_by_source(source_name: str) -> int:
+    """
+    source 메타데이터가 source_name인 벡터를 모두 삭제하고, 삭제한 개수를 반환.
+    """
+    return _delete_where({"source": source_name})
+
+
+def delete_by_doc_hash(doc_hash: str) -> int:
+    """
+    doc_hash 메타데이터(PDF SHA-256)가 일치하는 벡터를 모두 삭제하고, 삭제한 개수를 반환.
+    """
+    return _delete_where({"doc_hash": doc_hash})
+
+
+def gc_orphans(
+    upload_dir: str | Path = "data/uploaded",
+    dedupe: bool = True,
+    dry_run: bool = False,
+) -> Dict[str, int]:
+    """
+    원본 PDF가 더 이상 없는 벡터(고아 벡터)를 삭제한다.
+    원본은 blob 저장소(doc_hash)나 upload_dir(예전 방식, 파일 이름) 중 한 곳에 있으면 된다.
+    dedupe=True면, 예전 방식(uuid id)으로 rerun마다 중복 저장된
+    (source, page, index, 본문)이 같은 벡터도 하나만 남기고 지운다.
+
+    반환: {"vectors_before", "vectors_after", "orphans", "duplicates",
+           "vectors_removed", "bytes_before", "bytes_after", "bytes_reclaimed"}
+    """
+    upload_dir = Path(upload_dir)
+    bytes_before = _dir_size(CHROMA_DIR)
+    vectors_before = count_vectors()
+
+    orphan_ids: List[str] = []
+    dup_ids: List[str] = []
+    seen = set()
+    source_exists: Dict[str, bool] = {}
+
+    include = ["metadatas", "documents"] if dedupe else ["metadatas"]
+    for got in _iter_records(include=include):
+        docs = got.get("documents") or [None] * len(got["ids"])
+        for vid, meta, doc in zip(got["ids"], got["metadatas"], docs):
+            meta = meta or {}
+            source = meta.get("source")
+            doc_hash = meta.get("doc_hash")
+
+            if source is not None:
+                key = (source, doc_hash)
+                if key not in source_exists:
+                    source_exists[key] = (
+                        (doc_hash is not None and blob_store.has(doc_hash))
+                        or (upload_dir / source).is_file()
+                    )
+                if not source_exists[key]:
+                    orphan_ids.append(vid)
+                    continue
+
+            if dedupe:
+                # 같은 내용이라도 문서(deck)가 다르면 각자의 벡터이므로 중복으로 보지 않는다
+                key = (meta.get("deck"), source, meta.get("page"), meta.get("index"), doc)
+                if key in seen:
+                    dup_ids.append(vid)
+                else:
+                    seen.add(key)
+
+    if not dry_run:
+        delete_ids(orphan_ids + dup_ids)
+
+    vectors_after = count_vectors()
+    bytes_after = _dir_size(CHROMA_DIR)
+    return {
+        "vectors_before": vectors_before,
+        "vectors_after": vectors_after,
+        "orphans": len(orphan_ids),
+        "duplicates": len(dup_ids),
+        "vectors_removed": vectors_before - vectors_after,
+        "bytes_before": bytes_before,
+        "bytes_after": bytes_after,
+        "bytes_reclaimed": bytes_before - bytes_after,
+    }
+
+
+def _vacuum_sqlite() -> None:
+    """Chroma 메타데이터용 sqlite 파일에서 삭제된 행이 차지하던 공간을 돌려받는다."""
+    db_path = CHROMA_DIR / "chroma.sqlite3"
+    if not db_path.exists():
+        return
+    conn = sqlite3.connect(str(db_path), isolation_level=None)
+    try:
+        conn.execute("VACUUM")
+    finally:
+        conn.close()
+
+
+def hnsw_settings() -> Dict[str, Any]:
+    """
+    인덱스를 만들 때 실제로 쓴 HNSW 설정(컬렉션 생성 / compact 때 기록)과, 환경변수로 지정한 설정.
+    둘이 다르거나 기록이 없으면(current=None) compact()로 인덱스를 다시 만들어야 반영된다.
+    """
+    current = _load_hnsw_build()
+    return {
+        "current": current,
+        "configured": dict(_COLLECTION_METADATA),
+        "needs_compact": current is None
+        or any(current.get(k) != v for k, v in _COLLECTION_METADATA.items()),
+    }
+
+
+def writer_stats() -> Dict[str, int]:
+    """단일 writer 통계 (요청 수 / bulk 쓰기 횟수 / 요청별로 다시 쓴 횟수 / 기록한 레코드 수 / 대기 중인 요청 수)."""
+    return _writer.stats()
+
+
+def compact(vacuum: bool = True) -> Dict[str, int]:
+    """
+    컬렉션을 새로 만들어 살아 있는 벡터만 다시 넣는 방식으로 HNSW 인덱스를 재구성한다.
+    (HNSW는 delete 시 노드를 '삭제 표시'만 하므로, 삭제가 많이 쌓이면 재구성이 필요)
+    새 컬렉션은 현재 HNSW 설정(hnsw_metadata())으로 만든다.
+
+    1) 새 이름(study_mate__v<시각>)의 컬렉션에 전체 레코드 복사
+    2) 포인터 파일(LIVE_COLLECTION_PATH)을 새 이름으로 바꿔서 전환
+    3) 이전 컬렉션 삭제 (실패하거나 중간에 멈추면 다음 시작 때 지운다)
+
+    반환: {"vectors", "bytes_before", "bytes_after", "bytes_reclaimed"}
+    """
+    bytes_before = _dir_size(CHROMA_DIR)
+
+    def _rebuild() -> None:
+        # writer 스레드 안에서 실행되므로 재구성 중에 다른 쓰기가 끼어들지 않는다.
+        # (읽기는 재구성이 끝날 때까지 기존 컬렉션을 그대로 쓴다)
+        global _collection, _live_name
+
+        # 지금 설정(HNSW_M 등)으로 다시 만든다 → HNSW 설정을 바꾼 뒤 compact하면 반영된다
+        metadata = {**(_collection.metadata or {}), **_COLLECTION_METADATA}
+        new_name = f"{_COLLECTION_NAME}__v{time.time_ns()}"
+        rebuilt = _client.create_collection(name=new_name, metadata=metadata)
+        try:
+            for got in _iter_records(include=["embeddings", "documents", "metadatas"]):
+                rebuilt.add(
+                    ids=got["ids"],
+                    embeddings=got["embeddings"],
+                    documents=got["documents"],
+                    metadatas=got["metadatas"],
+                )
+        except Exception:
+            _client.delete_collection(new_name)
+            raise
+
+        old_name = _live_name
+        _save_live_name(new_name)  # 여기서 전환이 확정된다
+        _collection, _live_name = rebuilt, new_name
+        _save_hnsw_build(metadata)
+        try:
+            _client.delete_collection(old_name)
+        except Exception:
+            pass
+
+    _writer.call(_rebuild)
+
+    if vacuum:
+        _writer.call(_vacuum_sqlite)
+
+    bytes_after = _dir_size(CHROMA_DIR)
+    return {
+        "vectors": count_vectors(),
+        "bytes_before": bytes_before,
+        "bytes_after": bytes_after,
+        "bytes_reclaimed": bytes_before - bytes_after,
+    }
@@ -0,0 +1,181 @@
+# utils/chroma_writer.py
+
+from typing import Any, Callable, Dict, List, Optional
+from concurrent.futures import Future
+import queue
+import threading
+import time
+
+import numpy as np
+
+
+class _WriteOp:
+    __slots__ = ("kind", "payload", "future")
+
+    def __init__(self, kind: str, payload: Any):
+        self.kind = kind          # "add" | "upsert" | "call"
+        self.payload = payload
+        self.future: Future = Future()
+
+
+class SingleWriter:
+    """
+    Chroma 컬렉션에 대한 쓰기를 백그라운드 스레드 하나로 모으는 단일 writer.
+
+    - 여러 세션(Streamlit 스크립트 스레드)이 동시에 add/upsert를 요청해도
+      실제 컬렉션 쓰기는 이 스레드에서만 순서대로 일어난다.
+    - 큐에 연달아 쌓인 add/upsert는 max_batch 레코드까지 하나의 bulk 호출로 합친다.
+      (linger_s 만큼 잠깐 기다려서 다른 세션의 요청도 같이 묶는다)
+    - 호출한 쪽은 자기 요청이 반영될 때까지 기다리므로, 기존의 동기식 사용법은 그대로다.
+    - 읽기(query/get)는 이 writer를 거치지 않는다(lock-free).
+
+    collection_getter: 호출할 때마다 현재 컬렉션을 돌려주는 함수
+                       (compact 등으로 컬렉션 객체가 바뀌어도 따라가도록)
+    """
+
+    def __init__(
+        self,
+        collection_getter: Callable[[], Any],
+        max_batch: int = 5000,
+        linger_s: float = 0.01,
+    ):
+        self._get_collection = collection_getter
+        self.max_batch = max_batch
+        self.linger_s = linger_s
+
+        self._queue: "queue.Queue[_WriteOp]" = queue.Queue()
+        self._thread: Optional[threading.Thread] = None
+        self._start_lock = threading.Lock()
+        self._pending: Optional[_WriteOp] = None
+        self._stats = {"requests": 0, "bulk_writes": 0, "bulk_retries": 0, "records": 0}
+
+    # ── 공개 API ───────────────────────────────
+    def add(self, ids: List[str], embeddings, documents: List[str], metadatas: List[Dict]) -> None:
+        self._submit("add", (ids, embeddings, documents, metadatas)).result()
+
+    def upsert(self, ids: List[str], embeddings, documents: List[str], metadatas: List[Dict]) -> None:
+        self._submit("upsert", (ids, embeddings, documents, metadatas)).result()
+
+    def submit_upsert(self, ids: List[str], embeddings, documents: List[str], metadatas: List[Dict]) -> Future:
+        """upsert를 큐에 넣고 기다리지 않는다. 반영 여부는 돌려받은 Future로 확인한다."""
+        return self._submit("upsert", (ids, embeddings, documents, metadatas))
+
+    def call(self, fn: Callable[[], Any]) -> Any:
+        """delete/update/compact처럼 묶을 수 없는 쓰기는 함수째로 writer 스레드에서 실행."""
+        return self._submit("call", fn).result()
+
+    def stats(self) -> Dict[str, int]:
+        return {**self._stats, "queue_depth": self._queue.qsize()}
+
+    # ── 내부 ───────────────────────────────────
+    def _submit(self, kind: str, payload: Any) -> Future:
+        self._ensure_started()
+        op = _WriteOp(kind, payload)
+        self._queue.put(op)
+        return op.future
+
+    def _ensure_started(self) -> None:
+        if self._thread is not None and self._thread.is_alive():
+            return
+        with self._start_lock:
+            if self._thread is None or not self._thread.is_alive():
+                self._thread = threading.Thread(
+                    target=self._run, name="chroma-writer", daemon=True
+                )
+                self._thread.start()
+
+    def _next_op(self, timeout: Optional[float]) -> Optional[_WriteOp]:
+        if self._pending is not None:
+            op, self._pending = self._pending, None
+            return op
+        try:
+            return self._queue.get(timeout=timeout)
+        except queue.Empty:
+            return None
+
+    def _run(self) -> None:
+        while True:
+            op = self._next_op(timeout=None)
+            if op.kind == "call":
+                self._execute_call(op)
+                continue
+
+            # 같은 종류(add/upsert)의 요청을 max_batch까지 모은다.
+            batch = [op]
+            size = len(op.payload[0])
+            deadline = time.monotonic() + self.linger_s
+            while size < self.max_batch:
+                nxt = self._next_op(timeout=max(0.0, deadline - time.monotonic()))
+                if nxt is None:
+                    break
+                if nxt.kind != op.kind or size + len(nxt.payload[0]) > self.max_batch:
+                    self._pending = nxt  # 순서 유지: 다음 루프에서 처리
+                    break
+                batch.append(nxt)
+                size += len(nxt.payload[0])
+
+            self._execute_bulk(op.kind, batch)
+
+    def _execute_call(self, op: _WriteOp) -> None:
+        self._stats["requests"] += 1
+        try:
+            op.future.set_result(op.payload())
+        except BaseException as e:
+            op.future.set_exception(e)
+
+    def _execute_bulk(self, kind: str, batch: List[_WriteOp]) -> None:
+        self._stats["requests"] += len(batch)
+        try:
+            self._write(kind, batch)
+        except BaseException as e:
+            if len(batch) == 1:
+                batch[0].future.set_exception(e)
+                return
+            # 묶어 쓴 것 중 한 요청이 잘못돼도 다른 세션의 쓰기까지 실패하지 않도록 요청별로 다시 쓴다.
+            # (에러는 그 요청을 보낸 쪽의 future로만 간다)
+            self._stats["bulk_retries"] += 1
+            for op in batch:
+                try:
+                    self._write(kind, [op])
+                except BaseException as e:
+                    op.future.set_exception(e)
+                else:
+                    op.future.set_result(None)
+            return
+
+        for op in batch:
+            op.future.set_result(None)
+
+    def _write(self, kind: str, batch: List[_WriteOp]) -> None:
+        ids: List[str] = []
+        embeddings: List = []
+        documents: List[str] = []
+        metadatas: List[Dict] = []
+        position: Dict[str, int] = {}
+
+        for op in batch:
+            b_ids, b_embs, b_docs, b_metas = op.payload
+            for i, vid in enumerate(b_ids):
+                if vid in position:
+                    if kind == "upsert":
+                        # 같은 id를 여러 세션이 동시에 upsert하면 나중 요청으로 덮어쓴다.
+                        j = position[vid]
+                        embeddings[j], documents[j], metadatas[j] = b_embs[i], b_docs[i], b_metas[i]
+                    # add는 이미 있는 id를 건너뛰므로 먼저 온 것만 남긴다 (한 번에 같은 id를 넘기면 Chroma가 거부).
+                    continue
+                position[vid] = len(ids)
+                ids.append(vid)
+                embeddings.append(b_embs[i])
+                documents.append(b_docs[i])
+                metadatas.append(b_metas[i])
+
+        collection = self._get_collection()
+        write = collection.upsert if kind == "upsert" else collection.add
+        write(
+            ids=ids,
+            embeddings=np.asarray(embeddings, dtype=np.float32),
+            documents=documents,
+            metadatas=metadatas,
+        )
+        self._stats["bulk_writes"] += 1
+        self._stats["records"] += len(ids)
@@ -1,6 +1,10 @@
 # utils/chunker.py
 
-from typing import List
+from typing import Callable, List, Optional, Tuple
+import re
+
+# 문자열 리스트 → 각 문자열의 토큰 수
+TokenCounter = Callable[[List[str]], List[int]]
 
 def chunk_text(
     text: str,
@@ -50,3 +54,130 @@ def split_pages_to_chunks(
         all_chunks.extend(chunks)
 
     return all_chunks
+
+
+# ────────────────────────────────────────────
+# 토큰 기준 + 문장/글머리표 경계 청크 분할
+# ────────────────────────────────────────────
+# 글머리표 / 번호 목록으로 시작하는 줄은 새 단위로 본다.
+_BULLET_RE = re.compile(r"^\s*(?:[-•·▪▫◦○●■□▶►➢✓*]|\d+[.)]|[①-⑳]|[가-하][.)])\s*")
+# 문장 끝 (한국어 "~다." 포함, 마침표 뒤 공백 기준)
+_SENTENCE_END_RE = re.compile(r"(?<=[.!?。])\s+")
+_TERMINAL_CHARS = (".", "!", "?", "。", ":", ";")
+
+
+def split_units(text: str) -> List[str]:
+    """
+    슬라이드 텍스트를 문장 / 글머리표 단위로 나눈다.
+    PDF 추출 텍스트는 문장 중간에서도 줄이 바뀌므로, 글머리표로 시작하거나
+    앞 줄이 문장부호로 끝난 경우에만 새 단위로 보고 나머지 줄은 이어 붙인다.
+    """
+    units: List[str] = []
+    current = ""
+    for line in text.splitlines():
+        line = line.strip()
+        if not line:
+            continue
+        if current and (_BULLET_RE.match(line) or current.endswith(_TERMINAL_CHARS)):
+            units.append(current)
+            current = line
+        else:
+            current = f"{current} {line}".strip()
+    if current:
+        units.append(current)
+
+    out: List[str] = []
+    for unit in units:
+        out.extend(s for s in _SENTENCE_END_RE.split(unit) if s.strip())
+    return out
+
+
+def _split_long_unit(unit: str, max_tokens: int, count_tokens: TokenCounter) -> List[Tuple[str, int]]:
+    """한 문장이 max_tokens보다 길면 단어 경계에서 자른다 (단어 하나가 너무 길면 글자 단위로)."""
+    words = unit.split()
+    counts = count_tokens(words)
+    pieces: List[Tuple[str, int]] = []
+    buf: List[str] = []
+    used = 0
+    for word, n in zip(words, counts):
+        if n > max_tokens:
+            # 공백 없이 아주 긴 토큰열(URL, 수식 등) → 토큰 수 비율로 글자 단위 분할
+            step = max(1, len(word) * max_tokens // n)
+            parts = [word[i:i + step] for i in range(0, len(word), step)]
+            for part, pn in zip(parts, count_tokens(parts)):
+                if buf:
+                    pieces.append((" ".join(buf), used))
+                    buf, used = [], 0
+                pieces.append((part, pn))
+            continue
+        if buf and used + n > max_tokens:
+            pieces.append((" ".join(buf), used))
+            buf, used = [], 0
+        buf.append(word)
+        used += n
+    if buf:
+        pieces.append((" ".join(buf), used))
+    return pieces
+
+
+def chunk_text_tokens(
+    text: str,
+    max_tokens: int,
+    overlap_tokens: int,
+    count_tokens: TokenCounter,
+) -> List[str]:
+    """
+    임베딩 모델 토크나이저 기준으로 max_tokens를 넘지 않게 문장/글머리표 단위로 묶는다.
+    - 모델이 잘라 버리는 부분이 없도록 청크 길이를 모델 최대 길이에 맞춘다
+    - 다음 청크 앞에는 직전 청크 끝 문장들을 overlap_tokens 이내로 다시 붙인다
+    count_tokens: 문자열 리스트 → 각 문자열의 토큰 수 (특수 토큰 제외)
+    """
+    units = split_units(text)
+    if not units:
+        return []
+
+    sized: List[Tuple[str, int]] = []
+    for unit, n in zip(units, count_tokens(units)):
+        if n > max_tokens:
+            sized.extend(_split_long_unit(unit, max_tokens, count_tokens))
+        else:
+            sized.append((unit, n))
+
+    chunks: List[str] = []
+    window: List[Tuple[str, int]] = []
+    used = 0
+    for unit, n in sized:
+        if window and used + n > max_tokens:
+            chunks.append(" ".join(u for u, _ in window))
+            # 끝에서부터 overlap_tokens 이내의 문장만 남긴다
+            keep: List[Tuple[str, int]] = []
+            kept = 0
+            for u, un in reversed(window):
+                if kept + un > overlap_tokens or kept + un + n > max_tokens:
+                    break
+                keep.insert(0, (u, un))
+                kept += un
+            window, used = keep, kept
+        window.append((unit, n))
+        used += n
+    if window:
+        chunks.append(" ".join(u for u, _ in window))
+    return chunks
+
+
+def chunk_page(
+    text: str,
+    chunk_size: int,
+    overlap: int,
+    mode: str = "words",
+    count_tokens: Optional[TokenCounter] = None,
+) -> List[str]:
+    """
+    mode="words" : chunk_size / overlap 를 공백 기준 단어 수로 보고 자른다 (예전 방식)
+    mode="tokens": chunk_size / overlap 를 임베딩 모델 토큰 수로 보고 문장 경계에서 자른다
+    """
+    if mode == "tokens":
+        if count_tokens is None:
+            from utils.embedder import count_tokens
+        return chunk_text_tokens(text, chunk_size, overlap, count_tokens)
+    return chunk_text(text, chunk_size, overlap)
@@ -0,0 +1,273 @@
+# utils/context_cache.py
+
+from typing import Callable, Dict, List, Optional, Tuple
+from collections import OrderedDict
+import atexit
+import hashlib
+import os
+import threading
+import time
+
+from utils import metrics
+
+# ────────────────────────────────────────────
+# 설정 (환경변수로 조정 가능)
+# ────────────────────────────────────────────
+# "0"이면 provider 쪽 캐시를 만들지 않고 문맥을 매번 프롬프트 앞에 붙여 보낸다.
+CONTEXT_CACHE_ENABLED = os.getenv("STUDY_MATE_CONTEXT_CACHE", "1") == "1"
+# provider 캐시 수명(초). 쓰일 때마다 연장되고, 안 쓰이면 provider가 알아서 지운다.
+CONTEXT_CACHE_TTL_S = int(os.getenv("STUDY_MATE_CONTEXT_CACHE_TTL_S", "3600"))
+# 동시에 살려 둘 provider 캐시 수 (보관 비용 상한). 넘치면 오래 안 쓴 문서부터 지운다.
+CONTEXT_CACHE_MAX = int(os.getenv("STUDY_MATE_CONTEXT_CACHE_MAX", "32"))
+# 손익분기 계산용 가격 (입력 토큰 정가 = 1 기준)
+# - 캐시에서 읽은 토큰 가격 (Gemini 2.0 Flash: $0.025 / $0.10 per 1M)
+# - 캐시 보관료, 토큰·시간당 (Gemini 2.0 Flash: $1.00 / 1M tokens / hour)
+CACHED_TOKEN_PRICE = float(os.getenv("STUDY_MATE_CONTEXT_CACHE_PRICE", "0.25"))
+CACHE_STORAGE_PRICE_PER_HOUR = float(os.getenv("STUDY_MATE_CONTEXT_CACHE_STORAGE_PRICE", "10"))
+
+# 덱 문맥: 페이지당 최대 글자 수 / 전체 최대 글자 수
+DECK_CHARS_PER_PAGE = 800
+DECK_MAX_CHARS = 120_000
+
+
+# ────────────────────────────────────────────
+# 덱 문맥 (여러 호출이 공유하는 접두부)
+# ────────────────────────────────────────────
+def deck_context(pages: List[str], page_numbers: Optional[List[int]] = None) -> str:
+    """
+    페이지들을 "[페이지 N]" 블록으로 이어 붙인 문맥 (page_numbers는 1-based, 없으면 전체).
+    """
+    if page_numbers is None:
+        page_numbers = range(1, len(pages) + 1)
+    blocks: List[str] = []
+    total = 0
+    for i in page_numbers:
+        if not 1 <= i <= len(pages):
+            continue
+        t = pages[i - 1].strip()
+        if len(t) > DECK_CHARS_PER_PAGE:
+            t = t[:DECK_CHARS_PER_PAGE] + "\n...(생략)"
+        block = f"[페이지 {i}]\n{t}"
+        if total + len(block) > DECK_MAX_CHARS:
+            break
+        blocks.append(block)
+        total += len(block) + 2
+    return "[강의 자료]\n" + "\n\n".join(blocks)
+
+
+def context_key(context: str) -> str:
+    return hashlib.sha256(context.encode("utf-8")).hexdigest()[:32]
+
+
+def inline_deck_context(pages: List[str], page_numbers: Optional[List[int]] = None, limit: int = 8) -> str:
+    """
+    LLM 호출에 붙이는 덱 문맥 (기본: 앞쪽 limit페이지, 또는 대상 페이지만).
+    provider 캐시에 올릴 때도 이 문자열을 그대로 올리므로, 캐시를 쓰든 안 쓰든 모델이 보는 문맥은 같다.
+    """
+    if page_numbers is None:
+        page_numbers = list(range(1, min(limit, len(pages)) + 1))
+    return deck_context(pages, page_numbers[:limit])
+
+
+def inline_prompt(context: Optional[str], prompt: str) -> str:
+    """
+    캐시를 못 쓸 때의 프롬프트. 문맥을 항상 맨 앞에 두어서
+    provider의 자동 prefix 캐시(OpenAI 등)에는 걸리도록 한다.
+    """
+    return f"{context}\n\n{prompt}" if context else prompt
+
+
+# ────────────────────────────────────────────
+# provider 캐시 수명 관리
+# ────────────────────────────────────────────
+_Key = Tuple[str, str]  # (provider/model, context_key)
+
+
+def break_even_calls(
+    ttl_s: float,
+    cached_price: float = CACHED_TOKEN_PRICE,
+    storage_price_per_hour: float = CACHE_STORAGE_PRICE_PER_HOUR,
+) -> float:
+    """
+    문맥 T토큰을 n번 보낼 때 인라인 비용은 n·T,
+    캐시 비용은 T(업로드) + T·보관료·TTL(시간) + n·T·캐시 가격.
+    캐시가 싸지는 최소 호출 수 n = (1 + 보관료·TTL) / (1 − 캐시 가격). (T와 무관)
+    """
+    if cached_price >= 1:
+        return float("inf")
+    return (1 + storage_price_per_hour * ttl_s / 3600) / (1 - cached_price)
+
+
+class ContextCacheRegistry:
+    """
+    provider 쪽 cached-content 핸들을 문서(문맥 해시)별로 관리한다.
+
+    - TTL 안에 같은 문맥으로 break_even_calls()번 넘게 호출돼야 업로드한다 (그 전에는 인라인)
+    - 같은 문맥은 provider마다 한 번만 업로드 (동시에 요청해도 한 번)
+    - 쓰일 때마다 만료 시간을 연장하고, 만료가 지난 핸들은 다시 만든다
+    - 만들기에 실패한 문맥(너무 짧음 등)은 TTL 동안 다시 시도하지 않고 인라인으로 보낸다
+    - CONTEXT_CACHE_MAX를 넘으면 오래 안 쓴 캐시부터 provider에서 지운다
+    """
+
+    def __init__(
+        self,
+        ttl_s: int = CONTEXT_CACHE_TTL_S,
+        max_entries: int = CONTEXT_CACHE_MAX,
+        enabled: bool = CONTEXT_CACHE_ENABLED,
+    ):
+        self.ttl_s = ttl_s
+        self.max_entries = max_entries
+        self.enabled = enabled
+        self._lock = threading.Lock()
+        # key → {"name", "expires_at", "refreshed_at", "delete"}; name=None이면 실패 기록
+        self._entries: "OrderedDict[_Key, Dict]" = OrderedDict()
+        self._creating: Dict[_Key, threading.Lock] = {}
+        # 아직 캐시가 없는 문맥의 최근 호출 시각 (손익분기 판단용, 오래 안 쓴 것부터 버린다)
+        self._uses: "OrderedDict[_Key, List[float]]" = OrderedDict()
+        self.break_even = break_even_calls(ttl_s)
+
+    def _worth_caching(self, key: _Key) -> bool:
+        """TTL 안의 호출 수가 손익분기를 넘었는지 (이번 호출 포함)."""
+        now = time.monotonic()
+        with self._lock:
+            uses = [t for t in self._uses.pop(key, []) if now - t < self.ttl_s]
+            uses.append(now)
+            self._uses[key] = uses
+            while len(self._uses) > self.max_entries * 32:
+                self._uses.popitem(last=False)
+            return len(uses) > self.break_even
+
+    @staticmethod
+    def _delete(key: _Key, entry: Optional[Dict]) -> None:
+        """provider 쪽 캐시 삭제 (네트워크 호출이므로 lock 밖에서 부른다)."""
+        if entry and entry["name"] and entry["delete"]:
+            try:
+                entry["delete"](entry["name"])
+            except Exception as e:  # 이미 만료된 캐시 등 → 무시
+                print(f"context cache 삭제 실패({key[0]}): {e!r}")
+
+    def _lookup(self, key: _Key, refresh: Optional[Callable[[str, int], None]]) -> Tuple[bool, Optional[str]]:
+        now = time.monotonic()
+        with self._lock:
+            entry = self._entries.get(key)
+            if entry is None or entry["expires_at"] <= now:
+                self._entries.pop(key, None)
+                return False, None
+            self._entries.move_to_end(key)
+            name = entry["name"]
+            # 수명의 절반이 지났으면 연장 (provider 호출은 한 번만)
+            needs_refresh = name and refresh and now - entry["refreshed_at"] > self.ttl_s / 2
+            if needs_refresh:
+                entry["refreshed_at"] = now
+                entry["expires_at"] = now + self.ttl_s * 0.9
+        if needs_refresh:
+            try:
+                refresh(name, self.ttl_s)
+            except Exception as e:
+                print(f"context cache 연장 실패({key[0]}): {e!r}")
+        return True, name
+
+    def get_or_create(
+        self,
+        provider: str,
+        context: str,
+        create: Callable[[str, int], str],
+        delete: Optional[Callable[[str], None]] = None,
+        refresh: Optional[Callable[[str, int], None]] = None,
+    ) -> Optional[str]:
+        """
+        context에 대한 provider 캐시 이름을 반환. 캐시를 쓸 수 없으면 None (→ 인라인으로 보낼 것).
+        create(context, ttl_s) → 캐시 이름, delete(name), refresh(name, ttl_s)는 provider가 넘긴다.
+        """
+        if not self.enabled:
+            return None
+        key = (provider, context_key(context))
+
+        found, name = self._lookup(key, refresh)
+        if found:
+            metrics.incr(f"llm.context_cache.{'hits' if name else 'skips'}")
+            return name
+        if not self._worth_caching(key):
+            metrics.incr("llm.context_cache.below_break_even")
+            return None
+
+        with self._lock:
+            create_lock = self._creating.setdefault(key, threading.Lock())
+        with create_lock:
+            found, name = self._lookup(key, refresh)  # 다른 스레드가 방금 만들었을 수 있다
+            if found:
+                metrics.incr(f"llm.context_cache.{'hits' if name else 'skips'}")
+                return name
+            try:
+                name = create(context, self.ttl_s)
+                metrics.incr("llm.context_cache.creates")
+            except Exception as e:
+                print(f"context cache 생성 실패({provider}), 인라인으로 전송: {e!r}")
+                metrics.incr("llm.context_cache.create_failures")
+                name = None
+
+            now = time.monotonic()
+            with self._lock:
+                self._entries[key] = {
+                    "name": name,
+                    # provider보다 조금 일찍 만료시켜서, 지워진 캐시를 참조하는 일이 없게 한다
+                    "expires_at": now + self.ttl_s * 0.9,
+                    "refreshed_at": now,
+                    "delete": delete,
+                }
+                self._creating.pop(key, None)
+                self._uses.pop(key, None)
+                evicted = []
+                while sum(1 for e in self._entries.values() if e["name"]) > self.max_entries:
+                    oldest = next(k for k, e in self._entries.items() if e["name"])
+                    evicted.append((oldest, self._entries.pop(oldest)))
+            for k, entry in evicted:
+                self._delete(k, entry)
+                metrics.incr("llm.context_cache.evictions")
+        return name
+
+    def invalidate(self, provider: str, context: str) -> bool:
+        """
+        provider 쪽에서 캐시가 이미 없어졌을 때(만료 / 404) 기록만 지운다 (provider 삭제 호출 없음).
+        다음 호출에서 다시 만든다.
+        """
+        with self._lock:
+            return self._entries.pop((provider, context_key(context)), None) is not None
+
+    def release(self, context: str) -> int:
+        """한 문서(문맥)의 provider 캐시를 모두 지운다. 지운 개수를 반환."""
+        ck = context_key(context)
+        with self._lock:
+            for k in [k for k in self._uses if k[1] == ck]:
+                del self._uses[k]
+            dropped = [(k, self._entries.pop(k)) for k in list(self._entries) if k[1] == ck]
+        for k, entry in dropped:
+            self._delete(k, entry)
+        return sum(1 for _, e in dropped if e["name"])
+
+    def release_all(self) -> None:
+        with self._lock:
+            dropped = list(self._entries.items())
+            self._entries.clear()
+        for k, entry in dropped:
+            self._delete(k, entry)
+
+    def stats(self) -> Dict[str, int]:
+        with self._lock:
+            live = sum(1 for e in self._entries.values() if e["name"])
+        counters = metrics.snapshot("llm.context_cache")["counters"]
+        return {"live": live, **{k.rsplit(".", 1)[-1]: int(v) for k, v in counters.items()}}
+
+
+_registry = ContextCacheRegistry()
+atexit.register(_registry.release_all)  # 프로세스 종료 시 보관 비용이 계속 나가지 않도록 정리
+
+
+def get_context_cache() -> ContextCacheRegistry:
+    return _registry
+
+
+def record_usage(provider: str, input_tokens: int, cached_tokens: int) -> None:
+    """provider가 보고한 입력 토큰 / 그중 캐시에서 읽은 토큰 수를 누적한다."""
+    metrics.incr(f"llm.{provider}.input_tokens", input_tokens or 0)
+    metrics.incr(f"llm.{provider}.cached_input_tokens", cached_tokens or 0)
@@ -1,23 +1,53 @@
 # utils/embedder.py
 
 from typing import List
+import os
+
+import numpy as np
 from sentence_transformers import SentenceTransformer
 
+# 가벼우면서도 성능 괜찮은 기본 모델 (스냅샷은 같은 모델로 만든 것만 가져온다)
+MODEL_NAME = "sentence-transformers/all-MiniLM-L6-v2"
+
+# 한 번에 모델에 넣는 문장 수 (sentence-transformers 기본값과 같다)
+ENCODE_BATCH = int(os.getenv("STUDY_MATE_EMBED_BATCH", "32"))
+
 _model: SentenceTransformer | None = None
 
 def get_model() -> SentenceTransformer:
     """SentenceTransformer 모델을 lazy load."""
     global _model
     if _model is None:
-        # 가벼우면서도 성능 괜찮은 기본 모델
-        _model = SentenceTransformer("sentence-transformers/all-MiniLM-L6-v2")
+        _model = SentenceTransformer(MODEL_NAME)
     return _model
 
 
+def embed_array(texts: List[str]) -> np.ndarray:
+    """
+    여러 개의 텍스트를 임베딩하여 (n, dim) float32 배열로 반환.
+    적재처럼 벡터DB로 바로 넘기는 경우에 쓴다 (파이썬 float 리스트보다 메모리가 훨씬 작다).
+    """
+    model = get_model()
+    embeddings = model.encode(texts, batch_size=ENCODE_BATCH, show_progress_bar=False)
+    return np.asarray(embeddings, dtype=np.float32)
+
+
 def embed_texts(texts: List[str]) -> List[List[float]]:
     """
     여러 개의 텍스트를 임베딩하여 2차원 리스트(embeddings)로 반환.
+    (질문 임베딩처럼 몇 개 안 되는 경우용. 많은 청크는 embed_array)
     """
-    model = get_model()
-    embeddings = model.encode(texts, show_progress_bar=False)
-    return embeddings.tolist()
+    return embed_array(texts).tolist()
+
+
+def max_chunk_tokens() -> int:
+    """모델이 잘라 버리지 않고 받는 최대 토큰 수 ([CLS]/[SEP] 특수 토큰 2개 제외)."""
+    return get_model().max_seq_length - 2
+
+
+def count_tokens(texts: List[str]) -> List[int]:
+    """임베딩 모델 토크나이저 기준 토큰 수 (특수 토큰 제외)."""
+    if not texts:
+        return []
+    encoded = get_model().tokenizer(texts, add_special_tokens=False)["input_ids"]
+    return [len(ids) for ids in encoded]
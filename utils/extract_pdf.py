@@ -1,27 +1,218 @@
 # utils/extract_pdf.py
 
 from pathlib import Path
+from collections import Counter, deque
+from concurrent.futures import ProcessPoolExecutor
+from concurrent.futures.process import BrokenProcessPool
+from typing import FrozenSet, Iterator, Optional, Tuple
+import multiprocessing
+import os
+import re
+import threading
+
 import fitz  # PyMuPDF
 
-def extract_text_from_pdf(pdf_path: str | Path) -> list[str]:
+# 이 페이지 수 이상이면 여러 프로세스로 나눠서 추출한다 (작은 PDF는 프로세스 띄우는 비용이 더 크다)
+PARALLEL_MIN_PAGES = int(os.getenv("STUDY_MATE_EXTRACT_PARALLEL_MIN_PAGES", "64"))
+# 추출 프로세스 수 (0이면 CPU 수 기준, 최대 4)
+EXTRACT_WORKERS = int(os.getenv("STUDY_MATE_EXTRACT_WORKERS", "0")) or min(4, os.cpu_count() or 1)
+# 프로세스 하나가 한 번에 맡는 페이지 범위 크기
+RANGE_PAGES = 16
+
+# 모든 페이지에 반복되는 머리글/바닥글(과목명, 학교명, 쪽 번호, 저작권 문구)을 지운다. "0"이면 그대로 둔다.
+STRIP_BOILERPLATE = os.getenv("STUDY_MATE_STRIP_BOILERPLATE", "1") == "1"
+# 페이지 위/아래 이 비율 안쪽의 블록을 머리글/바닥글 영역으로 본다
+BOILERPLATE_MARGIN = 0.15
+# 같은 줄이 표본 페이지의 이 비율 이상에 나오면 반복 문구로 본다 (본문 영역은 더 엄격하게)
+BOILERPLATE_MARGIN_RATIO = 0.5
+BOILERPLATE_BODY_RATIO = 0.8
+# 반복 문구를 찾을 때 볼 최대 페이지 수 (고르게 뽑는다) / 이보다 적은 PDF는 찾지 않는다
+BOILERPLATE_SAMPLE_PAGES = 48
+BOILERPLATE_MIN_PAGES = 4
+# 이보다 긴 줄은 본문으로 보고 반복 문구 후보에서 뺀다
+BOILERPLATE_MAX_LINE = 120
+
+# 공용 캐시(artifact_cache)에 추출 텍스트("pages")를 넣을 때 쓰는 params — 제거 여부가 바뀌면 다시 추출
+PAGES_CACHE_PARAMS = ("strip_boilerplate", STRIP_BOILERPLATE)
+
+# (영역, 정규화한 줄) — 영역은 "top" / "body" / "bottom"
+_LineKey = Tuple[str, str]
+
+_pool: Optional[ProcessPoolExecutor] = None
+_pool_lock = threading.Lock()
+
+
+# ────────────────────────────────────────────
+# 반복 머리글/바닥글 찾기
+# ────────────────────────────────────────────
+def _norm_line(line: str) -> str:
+    # 쪽 번호 / 날짜처럼 숫자만 바뀌는 줄도 같은 줄로 센다 ("3 / 24" → "# / #")
+    return re.sub(r"\d+", "#", " ".join(line.split()))
+
+
+def _page_lines(page) -> Iterator[Tuple[str, str]]:
+    """페이지의 (영역, 줄)을 블록 순서대로. 영역은 블록 위치(bbox)로 정한다."""
+    height = page.rect.height or 1.0
+    for x0, y0, x1, y1, text, _, block_type in page.get_text("blocks"):
+        if block_type != 0:  # 이미지 블록
+            continue
+        if y1 <= height * BOILERPLATE_MARGIN:
+            band = "top"
+        elif y0 >= height * (1 - BOILERPLATE_MARGIN):
+            band = "bottom"
+        else:
+            band = "body"
+        for line in text.splitlines():
+            if line.strip():
+                yield band, line
+
+
+def detect_boilerplate(pdf_path: str | Path) -> FrozenSet[_LineKey]:
     """
-    주어진 PDF 파일 경로에서 페이지별 텍스트를 추출하여 리스트로 반환.
-    각 요소는 한 페이지(슬라이드)에 해당하는 문자열.
+    여러 페이지에 반복되는 줄(영역, 정규화한 줄)의 집합.
+    표본 페이지(최대 BOILERPLATE_SAMPLE_PAGES개)에서 줄마다 나온 페이지 수를 세고,
+    머리글/바닥글 영역은 절반 이상, 본문 영역은 80% 이상 나오면 반복 문구로 본다.
     """
-    pdf_path = Path(pdf_path)
-    doc = fitz.open(pdf_path)
+    with fitz.open(pdf_path) as doc:
+        n = doc.page_count
+        if n < BOILERPLATE_MIN_PAGES:
+            return frozenset()
+        sample = sorted({i * n // BOILERPLATE_SAMPLE_PAGES for i in range(BOILERPLATE_SAMPLE_PAGES)}) \
+            if n > BOILERPLATE_SAMPLE_PAGES else range(n)
+        counts: Counter = Counter()
+        for i in sample:
+            counts.update({
+                (band, _norm_line(line))
+                for band, line in _page_lines(doc[i])
+                if len(line.strip()) <= BOILERPLATE_MAX_LINE
+            })
+    m = len(sample)
+    return frozenset(
+        key for key, c in counts.items()
+        if c >= m * (BOILERPLATE_BODY_RATIO if key[0] == "body" else BOILERPLATE_MARGIN_RATIO)
+    )
+
 
-    pages: list[str] = []
-    for page in doc:
+def _page_text(page, boilerplate: FrozenSet[_LineKey] = frozenset()) -> str:
+    if not boilerplate:
         # 기본 텍스트 추출
-        text = page.get_text("text") or ""
-        text = text.strip()
+        return (page.get_text("text") or "").strip()
+    lines = [
+        line for band, line in _page_lines(page)
+        if (band, _norm_line(line)) not in boilerplate
+    ]
+    return "\n".join(lines).strip()
+
+
+def _extract_range(
+    pdf_path: str,
+    start: int,
+    stop: int,
+    boilerplate: FrozenSet[_LineKey] = frozenset(),
+) -> list[str]:
+    """[start, stop) 페이지 텍스트 (작업 프로세스에서 실행, 문서는 프로세스마다 따로 연다)."""
+    with fitz.open(pdf_path) as doc:
+        return [_page_text(doc[i], boilerplate) for i in range(start, min(stop, doc.page_count))]
 
-        # 완전히 비어 있는 페이지는 스킵 (원하면 유지해도 됨)
-        if text:
-            pages.append(text)
-        else:
-            pages.append("")  # 페이지 수를 맞추고 싶으면 이렇게 남겨도 됨
 
-    doc.close()
-    return pages
+def _get_pool() -> ProcessPoolExecutor:
+    """
+    프로세스 전체에서 공유하는 추출용 프로세스 풀.
+    Streamlit은 스레드를 많이 쓰므로 fork 대신 spawn으로 띄운다.
+    """
+    global _pool
+    with _pool_lock:
+        if _pool is None:
+            _pool = ProcessPoolExecutor(
+                max_workers=EXTRACT_WORKERS,
+                mp_context=multiprocessing.get_context("spawn"),
+            )
+        return _pool
+
+
+def _reset_pool() -> None:
+    global _pool
+    with _pool_lock:
+        if _pool is not None:
+            _pool.shutdown(wait=False, cancel_futures=True)
+        _pool = None
+
+
+def _iter_sequential(
+    pdf_path: Path,
+    start: int = 0,
+    boilerplate: FrozenSet[_LineKey] = frozenset(),
+) -> Iterator[str]:
+    with fitz.open(pdf_path) as doc:
+        for i in range(start, doc.page_count):
+            yield _page_text(doc[i], boilerplate)
+
+
+def iter_pdf_pages(
+    pdf_path: str | Path,
+    workers: Optional[int] = None,
+    parallel: Optional[bool] = None,
+    strip_boilerplate: Optional[bool] = None,
+) -> Iterator[str]:
+    """
+    페이지 텍스트를 페이지 순서대로 하나씩 내보내는 generator.
+
+    parallel=True(기본값: PARALLEL_MIN_PAGES 이상이면 자동)이면 페이지 범위를 RANGE_PAGES씩 나눠
+    프로세스 풀에 맡기고, 앞 범위가 끝나는 대로 순서대로 내보낸다.
+    → 받는 쪽은 마지막 페이지 추출이 끝나기 전에 청크 분할 / 임베딩을 시작할 수 있다.
+    동시에 맡기는 범위는 workers×2개로 제한해서, 받는 쪽이 느려도 결과가 메모리에 쌓이지 않는다.
+
+    strip_boilerplate=True(기본값: STUDY_MATE_STRIP_BOILERPLATE)이면 먼저 표본 페이지로
+    반복 머리글/바닥글을 찾고(detect_boilerplate), 각 페이지에서 그 줄들을 빼고 내보낸다.
+    """
+    pdf_path = Path(pdf_path)
+    with fitz.open(pdf_path) as doc:
+        page_count = doc.page_count
+
+    if strip_boilerplate is None:
+        strip_boilerplate = STRIP_BOILERPLATE
+    boilerplate = detect_boilerplate(pdf_path) if strip_boilerplate else frozenset()
+
+    if parallel is None:
+        parallel = page_count >= PARALLEL_MIN_PAGES and EXTRACT_WORKERS > 1
+    if not parallel:
+        yield from _iter_sequential(pdf_path, boilerplate=boilerplate)
+        return
+
+    workers = workers or EXTRACT_WORKERS
+    ranges = deque(
+        (s, min(s + RANGE_PAGES, page_count)) for s in range(0, page_count, RANGE_PAGES)
+    )
+    pending: deque = deque()
+    next_page = 0
+    try:
+        pool = _get_pool()
+        while ranges or pending:
+            while ranges and len(pending) < workers * 2:
+                start, stop = ranges.popleft()
+                pending.append(pool.submit(_extract_range, str(pdf_path), start, stop, boilerplate))
+            texts = pending.popleft().result()
+            yield from texts
+            next_page += len(texts)
+    except BrokenProcessPool:
+        # 작업 프로세스가 죽었으면(메모리 부족 등) 남은 페이지는 이 프로세스에서 이어서 추출
+        _reset_pool()
+        yield from _iter_sequential(pdf_path, start=next_page, boilerplate=boilerplate)
+    finally:
+        for fut in pending:
+            fut.cancel()
+
+
+def extract_text_from_pdf(
+    pdf_path: str | Path,
+    workers: Optional[int] = None,
+    strip_boilerplate: Optional[bool] = None,
+) -> list[str]:
+    """
+    주어진 PDF 파일 경로에서 페이지별 텍스트를 추출하여 리스트로 반환.
+    각 요소는 한 페이지(슬라이드)에 해당하는 문자열.
+    텍스트가 없는 페이지는 "" 로 남겨서 페이지 수를 맞춘다.
+    큰 PDF는 iter_pdf_pages가 여러 프로세스로 나눠서 추출한다.
+    모든 페이지에 반복되는 머리글/바닥글은 기본으로 지운다 (strip_boilerplate=False면 그대로).
+    """
+    return list(iter_pdf_pages(pdf_path, workers=workers, strip_boilerplate=strip_boilerplate))
@@ -0,0 +1,528 @@
+# utils/ingest.py
+
+from typing import Any, Dict, Iterable, List, Optional
+from concurrent.futures import Future
+from pathlib import Path
+import hashlib
+import json
+import os
+import re
+import sqlite3
+import threading
+import time
+
+from utils.chunker import chunk_page
+from utils.extract_pdf import iter_pdf_pages
+from utils import blob_store, chroma_db
+
+# 적재 기록(manifest)은 벡터DB와 함께 움직여야 하므로 chroma_db 폴더 안에 둔다.
+MANIFEST_PATH = chroma_db.CHROMA_DIR / "ingest_manifest.json"
+
+# 페이지 요약 캐시 (page_hash → 요약). 바뀌지 않은 페이지는 다시 요약하지 않는다.
+# 조회할 때 화면에 보이는 페이지만 읽도록 SQLite에 둔다. (예전 JSON 파일은 처음 열 때 옮겨 온다)
+PAGE_SUMMARY_DB = Path("data/page_summaries.sqlite3")
+_LEGACY_PAGE_SUMMARY_PATH = Path("data/page_summaries.json")
+
+_MANIFEST_VERSION = 1
+
+# 적재 시 한 번에 임베딩 + 쓰기할 청크 수. 문서가 아무리 커도 메모리에는 이만큼(최대 두 배치)만 올라간다.
+STREAM_BATCH_CHUNKS = int(os.getenv("STUDY_MATE_INGEST_BATCH_CHUNKS", "256"))
+
+# _lock: manifest JSON 파일 읽기-수정-쓰기 보호
+# _deck_locks: 같은 강의자료를 두 세션이 동시에 적재하지 않도록 deck 단위로 직렬화
+#              (다른 강의자료끼리는 병렬로 임베딩하고, 쓰기는 chroma_db의 단일 writer가 묶어 준다)
+_lock = threading.Lock()
+_deck_locks: Dict[str, threading.Lock] = {}
+
+
+def _deck_lock(key: str) -> threading.Lock:
+    with _lock:
+        return _deck_locks.setdefault(key, threading.Lock())
+
+
+# ────────────────────────────────────────────
+# 공통: 해시 / JSON 저장
+# ────────────────────────────────────────────
+def deck_key(source_name: str) -> str:
+    """
+    같은 강의자료의 개정판을 하나로 묶기 위한 이름.
+    "딥러닝 개론_07 (2).pdf" → "딥러닝 개론_07"
+    적재 기록 / 벡터는 파일 이름이 아니라 doc_hash로 구분하고, 이 이름은 한 사람이 올린 파일 중
+    이전 버전을 찾을 때(app.py)와 예전 방식(이름 키) 기록을 옮길 때만 쓴다.
+    """
+    stem = Path(source_name).stem
+    stem = re.sub(r"\s*\(\d+\)$", "", stem)
+    return stem.strip()
+
+
+def page_hash(text: str) -> str:
+    """공백 차이는 무시한 페이지 텍스트 해시."""
+    normalized = " ".join(text.split())
+    return hashlib.sha256(normalized.encode("utf-8")).hexdigest()
+
+
+def _load_json(path: Path, default: Dict[str, Any]) -> Dict[str, Any]:
+    if not path.exists():
+        return default
+    try:
+        with open(path, "r", encoding="utf-8") as f:
+            return json.load(f)
+    except (OSError, json.JSONDecodeError):
+        return default
+
+
+def _save_json(path: Path, data: Dict[str, Any]) -> None:
+    """임시 파일에 쓰고 교체해서, 중간에 죽어도 반쯤 쓴 파일이 남지 않게 한다."""
+    path.parent.mkdir(parents=True, exist_ok=True)
+    tmp = path.with_suffix(path.suffix + ".tmp")
+    with open(tmp, "w", encoding="utf-8") as f:
+        json.dump(data, f, ensure_ascii=False, indent=2)
+    os.replace(tmp, path)
+
+
+def _load_manifest() -> Dict[str, Any]:
+    return _load_json(MANIFEST_PATH, {"version": _MANIFEST_VERSION, "decks": {}})
+
+
+def get_ingest_record(doc_hash: str) -> Optional[Dict[str, Any]]:
+    """해당 문서(내용 해시)의 적재 기록."""
+    return _load_manifest()["decks"].get(doc_hash)
+
+
+def load_manifest_decks() -> Dict[str, Any]:
+    """현재 적재 기록 전체 (doc_hash → 기록, 예전 방식은 deck_key → 기록)."""
+    with _lock:
+        return _load_manifest()["decks"]
+
+
+def merge_manifest_decks(decks: Dict[str, Any]) -> int:
+    """
+    다른 노드에서 가져온 적재 기록을 합친다 (같은 deck은 가져온 쪽이 이긴다).
+    벡터를 먼저 넣고 나서 부를 것 — 기록이 있어도 벡터가 없으면 ingest가 다시 적재한다.
+    """
+    with _lock:
+        manifest = _load_manifest()
+        manifest["decks"].update(decks)
+        _save_json(MANIFEST_PATH, manifest)
+    return len(decks)
+
+
+def forget_deck(key: str) -> int:
+    """문서(doc_hash, 예전 방식은 deck_key)의 벡터와 적재 기록을 모두 지운다. 삭제한 벡터 수를 반환."""
+    with _deck_lock(key):
+        ids = [vid for got in chroma_db.iter_records({"deck": key}, include=[]) for vid in got["ids"]]
+        chroma_db.delete_ids(ids)
+        with _lock:
+            manifest = _load_manifest()
+            manifest["decks"].pop(key, None)
+            _save_json(MANIFEST_PATH, manifest)
+    return len(ids)
+
+
+# ────────────────────────────────────────────
+# 페이지 단위 증분 적재
+# ────────────────────────────────────────────
+def ingest_document(
+    pages: List[str],
+    source_name: str,
+    doc_hash: str,
+    chunk_size: int = 300,
+    overlap: int = 100,
+    chunk_mode: str = "words",
+    previous_doc_hash: Optional[str] = None,
+) -> Dict[str, Any]:
+    """
+    PDF 페이지 텍스트를 벡터DB에 적재한다. 적재 기록과 벡터는 doc_hash(내용 해시)별이라,
+    다른 사람이 같은 이름의 다른 파일을 올려도 서로 덮어쓰지 않는다.
+    같은 doc_hash를 다시 넣으면(누가 올렸든) 아무것도 하지 않는다.
+    previous_doc_hash(같은 사람이 다시 올린 개정판의 이전 버전)를 주면 그 페이지 해시와 비교해서
+    - 새로 생기거나 바뀐 페이지만 청크 분할 + 임베딩
+    - 그대로인 페이지는 이전 버전의 임베딩을 복사 (재임베딩 없음)
+    적재가 끝난 뒤 이전 버전을 가리키는 업로드가 더 없으면(blob 참조 수 0) 이전 버전의 벡터와 적재 기록을 지운다.
+    (다른 사람이 아직 쓰고 있으면 남겨 두고, 원본이 지워질 때 gc가 정리)
+    chunk_mode="tokens"이면 chunk_size/overlap을 임베딩 모델 토큰 수로 보고 문장 경계에서 자른다.
+    임베딩 / 쓰기는 STREAM_BATCH_CHUNKS개씩 나눠서 한다 (_ingest_pages).
+
+    반환 예:
+    {
+      "deck": "<doc_hash>", "previous_source": "딥러닝 개론_07.pdf", "skipped": False,
+      "pages_total": 30, "pages_reused": 27,
+      "pages_embedded": [4, 5, 31], "pages_removed": 1,
+      "chunks_embedded": 6, "vectors_retired": 3, "batches": 1
+    }
+    """
+    report = _ingest_pages(
+        pages, source_name, doc_hash, chunk_size, overlap, chunk_mode,
+        has_text=any(p.strip() for p in pages), previous_doc_hash=previous_doc_hash,
+    )
+    report["vectors_retired"] += _retire_revision(doc_hash, previous_doc_hash)
+    return report
+
+
+def ingest_pdf(
+    pdf_path: str | Path,
+    source_name: str,
+    doc_hash: str,
+    chunk_size: int = 300,
+    overlap: int = 100,
+    chunk_mode: str = "words",
+    previous_doc_hash: Optional[str] = None,
+) -> Dict[str, Any]:
+    """
+    ingest_document와 같지만 페이지 리스트 대신 PDF 파일에서 바로 흘려 넣는다 (스트리밍 적재).
+    추출(iter_pdf_pages) → 청크 분할 → 임베딩 → upsert가 배치 단위로 이어지므로,
+    문서 전체 텍스트 / 청크 / 임베딩을 한꺼번에 메모리에 올리지 않는다.
+    문서 크기에 비례해서 남는 것은 페이지 해시(페이지당 64글자)뿐이다.
+    (이전 버전 / 남은 벡터의 메타데이터도 배치 단위로 읽어서 페이지 해시와 지울 id만 모은다)
+    같은 doc_hash를 이미 적재했으면 PDF를 열지도 않는다. 반환 형식은 ingest_document와 같다.
+    """
+    report = _ingest_pages(
+        iter_pdf_pages(pdf_path), source_name, doc_hash, chunk_size, overlap, chunk_mode,
+        previous_doc_hash=previous_doc_hash,
+    )
+    report["vectors_retired"] += _retire_revision(doc_hash, previous_doc_hash)
+    return report
+
+
+def _retire_revision(doc_hash: str, previous_doc_hash: Optional[str]) -> int:
+    """
+    개정판으로 바뀐 이전 버전을 더 이상 아무도 가리키지 않으면(blob 참조 수 0)
+    그 벡터와 적재 기록을 지운다. 지운 벡터 수를 반환.
+    (지우지 않으면 gc가 blob을 지울 때까지 옛 본문이 검색에 섞여 나온다)
+    """
+    if not previous_doc_hash or previous_doc_hash == doc_hash:
+        return 0
+    refs = blob_store.refs(previous_doc_hash)
+    if refs is None or refs > 0:
+        return 0
+    return forget_deck(previous_doc_hash)
+
+
+class _BatchSink:
+    """
+    청크를 모았다가 STREAM_BATCH_CHUNKS개가 되면 임베딩해서 writer 큐에 넘긴다.
+    쓰기는 한 배치만 진행 중으로 둔다 — 다음 배치 임베딩은 이전 배치 쓰기와 겹치고,
+    그 다음 배치는 이전 쓰기가 끝나야 넘어간다 (backpressure: 메모리에는 최대 두 배치).
+    """
+
+    def __init__(self, batch_chunks: int):
+        self.batch_chunks = max(1, batch_chunks)
+        self.batches = 0
+        self.chunks = 0
+        self._pending: Optional[Future] = None
+        self._reset()
+
+    def _reset(self) -> None:
+        # writer가 이전 리스트를 아직 참조하므로 비우지 말고 새로 만든다
+        self.ids: List[str] = []
+        self.docs: List[str] = []
+        self.metas: List[Dict[str, Any]] = []
+
+    def add(self, vid: str, chunk: str, meta: Dict[str, Any]) -> None:
+        self.ids.append(vid)
+        self.docs.append(chunk)
+        self.metas.append(meta)
+        if len(self.ids) >= self.batch_chunks:
+            self.flush()
+
+    def flush(self) -> None:
+        if not self.ids:
+            return
+        fut = chroma_db.upsert_chunks_nowait(self.ids, self.docs, self.metas)
+        self.batches += 1
+        self.chunks += len(self.ids)
+        self._reset()
+        self.wait()
+        self._pending = fut
+
+    def wait(self) -> None:
+        """진행 중인 쓰기가 끝날 때까지 기다린다 (실패했으면 그 예외를 다시 던진다)."""
+        pending, self._pending = self._pending, None
+        if pending is not None:
+            pending.result()
+
+
+def _same_settings(record: Dict[str, Any], chunk_size: int, overlap: int, chunk_mode: str) -> bool:
+    return (
+        record.get("chunk_size") == chunk_size
+        and record.get("overlap") == overlap
+        and record.get("chunk_mode", "words") == chunk_mode
+    )
+
+
+def _reuse_bases(
+    source_name: str, doc_hash: str, previous_doc_hash: Optional[str], settings: tuple
+) -> List[tuple]:
+    """
+    임베딩을 복사해 올 이전 적재 [(deck, 기록, 예전 방식 여부)].
+    - previous_doc_hash: 같은 사람이 다시 올린 개정판의 이전 버전
+    - 예전 방식(파일 이름 키)으로 같은 이름에 적재된 기록 → 복사한 뒤 지운다
+    """
+    decks = _load_manifest()["decks"]
+    bases = []
+    if previous_doc_hash and previous_doc_hash != doc_hash:
+        record = decks.get(previous_doc_hash)
+        if record and _same_settings(record, *settings):
+            bases.append((previous_doc_hash, record, False))
+    legacy = deck_key(source_name)
+    record = decks.get(legacy)
+    if record and legacy != record.get("doc_hash") and _same_settings(record, *settings):
+        bases.append((legacy, record, True))
+    return bases
+
+
+def _ingest_pages(
+    pages: Iterable[str],
+    source_name: str,
+    doc_hash: str,
+    chunk_size: int,
+    overlap: int,
+    chunk_mode: str,
+    has_text: Optional[bool] = None,
+    previous_doc_hash: Optional[str] = None,
+) -> Dict[str, Any]:
+    """
+    ingest_document / ingest_pdf 공통 본체. pages는 앞에서부터 한 번만 읽는다.
+    has_text=None(스트리밍이라 아직 모름)이면 텍스트가 있다고 보고 벡터가 남아 있는지 검사한다.
+    """
+    key = doc_hash
+
+    report: Dict[str, Any] = {
+        "deck": key,
+        "previous_source": None,
+        "skipped": False,
+        "pages_total": 0,
+        "pages_reused": 0,
+        "pages_embedded": [],
+        "pages_removed": 0,
+        "chunks_embedded": 0,
+        "vectors_retired": 0,
+        "batches": 0,
+    }
+
+    with _deck_lock(key):
+        prev = get_ingest_record(doc_hash)
+
+        # 같은 문서를 같은 설정으로 이미 적재했고 벡터도 남아 있으면 바로 끝낸다.
+        # (화면이 다시 그려질 때마다 불리므로 벡터 메타데이터 전체를 읽지 않는다)
+        if (
+            prev
+            and _same_settings(prev, chunk_size, overlap, chunk_mode)
+            and (has_text is False or chroma_db.has_vectors({"deck": key}))
+        ):
+            report["previous_source"] = prev.get("source")
+            report["skipped"] = True
+            report["pages_reused"] = len(prev.get("page_hashes", []))
+            report["pages_total"] = report["pages_reused"]
+            return report
+
+        # 청크 설정이 바뀌었거나 중간에 멈춘 적재의 벡터는 믿지 않고 새로 만든다.
+        # 페이지 정보 없이 통째로 저장된 예전 벡터(deck 메타데이터 없음)도 정리한다.
+        # (메타데이터는 배치 단위로 읽고, 지울 id만 모은다 — 보통은 둘 다 비어 있다)
+        stale = [vid for got in chroma_db.iter_records({"deck": key}, include=[]) for vid in got["ids"]]
+        stale += [
+            vid
+            for got in chroma_db.iter_records({"source": source_name}, include=["metadatas"])
+            for vid, m in zip(got["ids"], got["metadatas"])
+            if not (m or {}).get("deck")
+        ]
+        chroma_db.delete_ids(stale)
+        report["vectors_retired"] += len(stale)
+
+        bases = _reuse_bases(source_name, doc_hash, previous_doc_hash, (chunk_size, overlap, chunk_mode))
+        if bases:
+            report["previous_source"] = bases[0][1].get("source")
+        # 이전 버전에 벡터가 남아 있는 페이지 해시 → 그 페이지는 임베딩을 복사하고 다시 임베딩하지 않는다
+        stored_hashes = set()
+        for base_key, _, _ in bases:
+            for got in chroma_db.iter_records({"deck": base_key}, include=["metadatas"]):
+                stored_hashes.update((m or {}).get("page_hash") for m in got["metadatas"])
+
+        # 새로 생기거나 바뀐 페이지만 청크 분할 + 임베딩 (페이지를 읽는 대로 배치로 흘려보낸다)
+        hashes: List[str] = []
+        first_page: Dict[str, int] = {}  # 새 버전의 page_hash → 첫 등장 페이지 번호(1-based)
+        sink = _BatchSink(STREAM_BATCH_CHUNKS)
+        try:
+            for page_no, page in enumerate(pages, start=1):
+                h = page_hash(page)
+                hashes.append(h)
+                if h in first_page:
+                    continue
+                first_page[h] = page_no
+                text = page.strip()
+                if h in stored_hashes or not text:
+                    continue
+                for i, chunk in enumerate(chunk_page(text, chunk_size, overlap, chunk_mode)):
+                    sink.add(f"{key}:{h[:16]}:{i}", chunk, {
+                        "source": source_name,
+                        "doc_hash": doc_hash,
+                        "deck": key,
+                        "page": page_no,
+                        "page_hash": h,
+                        "index": i,
+                    })
+                report["pages_embedded"].append(page_no)
+            sink.flush()
+        finally:
+            sink.wait()
+
+        # 그대로인 페이지는 이전 버전의 임베딩을 새 문서 id로 복사한다.
+        # (배치 단위로 읽고 쓰므로 이전 버전 임베딩 전체를 한꺼번에 올리지 않는다)
+        copied = set()
+        for base_key, _, _ in bases:
+            done = set()
+            for got in chroma_db.iter_records(
+                {"deck": base_key}, include=["embeddings", "documents", "metadatas"]
+            ):
+                ids, embs, docs, metas = [], [], [], []
+                for emb, doc, meta in zip(got["embeddings"], got["documents"], got["metadatas"]):
+                    meta = dict(meta or {})
+                    h = meta.get("page_hash")
+                    if h not in first_page or h in copied:
+                        continue
+                    meta.update(source=source_name, doc_hash=doc_hash, deck=key, page=first_page[h])
+                    ids.append(f"{key}:{h[:16]}:{meta.get('index', 0)}")
+                    embs.append(emb)
+                    docs.append(doc)
+                    metas.append(meta)
+                    done.add(h)
+                if ids:
+                    chroma_db.load_records(ids, embs, docs, metas)
+            copied |= done
+
+        # 예전 방식(이름 키)으로 적재된 벡터는 새 기록으로 옮겼으니 지운다.
+        for base_key, _, is_legacy in bases:
+            if is_legacy:
+                report["vectors_retired"] += forget_deck(base_key)
+
+        prev_hashes = set()
+        for _, record, _ in bases:
+            prev_hashes.update(record.get("page_hashes", []))
+        report["pages_total"] = len(hashes)
+        report["pages_removed"] = len(prev_hashes - set(hashes))
+        report["pages_reused"] = len(hashes) - len(report["pages_embedded"])
+        report["chunks_embedded"] = sink.chunks
+        report["batches"] = sink.batches
+
+        with _lock:
+            manifest = _load_manifest()
+            manifest["decks"][key] = {
+                "source": source_name,
+                "doc_hash": doc_hash,
+                "page_hashes": hashes,
+                "chunk_size": chunk_size,
+                "overlap": overlap,
+                "chunk_mode": chunk_mode,
+                "updated_at": time.time(),
+            }
+            _save_json(MANIFEST_PATH, manifest)
+
+    return report
+
+
+# ────────────────────────────────────────────
+# 페이지 요약 캐시
+# ────────────────────────────────────────────
+_SUMMARY_SCHEMA = """
+CREATE TABLE IF NOT EXISTS page_summaries (
+    page_hash   TEXT    PRIMARY KEY,
+    page_number INTEGER NOT NULL,   -- 요약할 때의 페이지 번호 (제목의 번호를 맞출 때 사용)
+    summary     TEXT    NOT NULL,
+    created_at  REAL    NOT NULL
+);
+"""
+
+_summary_write_lock = threading.Lock()
+_summary_initialized = False
+
+
+def _summary_connect() -> sqlite3.Connection:
+    global _summary_initialized
+    PAGE_SUMMARY_DB.parent.mkdir(parents=True, exist_ok=True)
+    conn = sqlite3.connect(str(PAGE_SUMMARY_DB), timeout=10)
+    conn.row_factory = sqlite3.Row
+    if not _summary_initialized:
+        conn.execute("PRAGMA journal_mode=WAL")  # 읽기와 쓰기가 서로 막지 않도록
+        conn.executescript(_SUMMARY_SCHEMA)
+        _import_legacy_summaries(conn)
+        _summary_initialized = True
+    return conn
+
+
+def _import_legacy_summaries(conn: sqlite3.Connection) -> None:
+    """예전 data/page_summaries.json이 남아 있으면 한 번만 옮기고 .migrated로 이름을 바꾼다."""
+    if not _LEGACY_PAGE_SUMMARY_PATH.exists():
+        return
+    store = _load_json(_LEGACY_PAGE_SUMMARY_PATH, {})
+    now = time.time()
+    conn.executemany(
+        "INSERT OR IGNORE INTO page_summaries (page_hash, page_number, summary, created_at) "
+        "VALUES (?, ?, ?, ?)",
+        [
+            (h, int(e.get("page_number") or 0), e["summary"], now)
+            for h, e in store.items()
+            if isinstance(e, dict) and e.get("summary")
+        ],
+    )
+    conn.commit()
+    try:
+        os.replace(
+            _LEGACY_PAGE_SUMMARY_PATH,
+            _LEGACY_PAGE_SUMMARY_PATH.with_suffix(_LEGACY_PAGE_SUMMARY_PATH.suffix + ".migrated"),
+        )
+    except FileNotFoundError:  # 다른 스레드가 먼저 옮겼다
+        pass
+
+
+def get_cached_page_summaries(pages: Dict[int, str]) -> Dict[int, str]:
+    """
+    {페이지 번호: 페이지 텍스트} 중 이전에 요약한 적이 있는 페이지들의 요약을 한 번에 돌려준다.
+    (화면에 보이는 페이지 묶음의 page_hash만 조회한다)
+    개정판에서 페이지 번호만 바뀐 경우 제목의 페이지 번호를 맞춰서 반환.
+    """
+    if not pages:
+        return {}
+    by_hash: Dict[str, List[int]] = {}
+    for page_number, page_text in pages.items():
+        by_hash.setdefault(page_hash(page_text), []).append(page_number)
+
+    hashes = list(by_hash)
+    conn = _summary_connect()
+    try:
+        rows = conn.execute(
+            "SELECT page_hash, page_number, summary FROM page_summaries "
+            f"WHERE page_hash IN ({','.join('?' * len(hashes))})",
+            hashes,
+        ).fetchall()
+    finally:
+        conn.close()
+
+    out: Dict[int, str] = {}
+    for row in rows:
+        old_no = row["page_number"]
+        for page_number in by_hash[row["page_hash"]]:
+            summary = row["summary"]
+            if old_no and old_no != page_number:
+                summary = summary.replace(f"페이지 {old_no} 요약", f"페이지 {page_number} 요약", 1)
+            out[page_number] = summary
+    return out
+
+
+def get_cached_page_summary(page_text: str, page_number: int) -> Optional[str]:
+    """같은 내용의 페이지를 이전에 요약한 적이 있으면 그 요약을 돌려준다."""
+    return get_cached_page_summaries({page_number: page_text}).get(page_number)
+
+
+def store_page_summary(page_text: str, page_number: int, summary: str) -> None:
+    """페이지 요약을 page_hash 기준으로 저장."""
+    with _summary_write_lock:
+        conn = _summary_connect()
+        try:
+            conn.execute(
+                "INSERT OR REPLACE INTO page_summaries (page_hash, page_number, summary, created_at) "
+                "VALUES (?, ?, ?, ?)",
+                (page_hash(page_text), page_number, summary, time.time()),
+            )
+            conn.commit()
+        finally:
+            conn.close()
@@ -0,0 +1,106 @@
+# utils/json_salvage.py
+
+from typing import Any, Iterable, List, Tuple
+import json
+import re
+
+_decoder = json.JSONDecoder()
+
+# 원소 경계: '}' 뒤에 ',' 가 오고 다시 '{' 로 시작하는 곳 (깨진 원소를 건너뛸 때 사용)
+_NEXT_ELEMENT = re.compile(r"\}\s*,\s*\{")
+
+# 배열 시작: '[' 바로 뒤(공백 제외)에 '{' 또는 ']'가 오는 곳.
+# 프롬프트의 "[대상 페이지]", "[페이지 N]" 같은 대괄호 문구를 모델이 따라 쓰는 경우가 많아서
+# 그냥 첫 '['를 잡으면 배열을 놓친다.
+_ARRAY_START = re.compile(r"\[\s*[\{\]]")
+
+
+class IncrementalArrayParser:
+    """
+    JSON 배열을 조각(chunk) 단위로 받아, 완성된 원소부터 하나씩 꺼내는 파서.
+
+    - 앞뒤의 ```json 펜스나 설명 문장은 무시하고 첫 '[{' (또는 빈 배열 '[]') 부터 읽는다.
+      ({"questions": [...]} 처럼 객체로 감싼 응답도 첫 번째 배열을 찾아 읽는다.)
+    - 응답이 중간에 끊겨도(토큰 한도, 스트리밍 중단) 그때까지 완성된 원소는 살린다.
+    - 깨진 원소를 만나면 다음 원소 경계('}, {')로 건너뛰어 뒤쪽 원소를 계속 살린다 (finish 시점).
+    """
+
+    def __init__(self):
+        self._buf = ""
+        self._pos = 0          # 다음 원소를 읽을 위치
+        self._started = False
+        self._done = False
+        self.skipped = 0       # 건너뛴 깨진 원소 수
+
+    def _skip_separators(self) -> None:
+        while self._pos < len(self._buf) and self._buf[self._pos] in " \t\r\n,":
+            self._pos += 1
+
+    def _drain(self) -> List[Any]:
+        items: List[Any] = []
+        if not self._started:
+            m = _ARRAY_START.search(self._buf)
+            if m is None:
+                return items
+            self._started = True
+            self._pos = m.start() + 1
+
+        while not self._done:
+            self._skip_separators()
+            if self._pos >= len(self._buf):
+                break
+            if self._buf[self._pos] == "]":
+                self._done = True
+                break
+            try:
+                obj, end = _decoder.raw_decode(self._buf, self._pos)
+            except json.JSONDecodeError:
+                break  # 아직 덜 들어왔거나 깨진 원소 → 다음 feed/finish에서 처리
+            items.append(obj)
+            self._pos = end
+        return items
+
+    def feed(self, chunk: str) -> List[Any]:
+        """조각을 추가하고, 이번에 새로 완성된 원소들을 반환."""
+        if self._done:
+            return []
+        self._buf += chunk
+        return self._drain()
+
+    def finish(self) -> List[Any]:
+        """
+        입력이 끝났을 때 호출. 남은 부분에서 깨진 원소를 건너뛰며 살릴 수 있는 원소를 더 꺼낸다.
+        """
+        items = self._drain()
+        while self._started and not self._done and self._pos < len(self._buf):
+            m = _NEXT_ELEMENT.search(self._buf, self._pos)
+            if m is None:
+                break
+            self.skipped += 1
+            self._pos = m.end() - 1
+            items.extend(self._drain())
+        return items
+
+    @property
+    def complete(self) -> bool:
+        """닫는 ']' 까지 정상적으로 읽었는지."""
+        return self._done and self.skipped == 0
+
+
+def parse_json_array(text: str) -> Tuple[List[Any], bool]:
+    """
+    응답 문자열에서 JSON 배열 원소들을 최대한 살려서 꺼낸다.
+    반환: (원소 리스트, 배열 전체가 온전했는지)
+    """
+    parser = IncrementalArrayParser()
+    items = parser.feed(text or "")
+    items.extend(parser.finish())
+    return items, parser.complete
+
+
+def iter_json_array(chunks: Iterable[str]):
+    """스트리밍 응답 조각들을 받아 완성된 원소를 도착하는 대로 내보내는 generator."""
+    parser = IncrementalArrayParser()
+    for chunk in chunks:
+        yield from parser.feed(chunk)
+    yield from parser.finish()
@@ -1,11 +1,23 @@
 import os
-import json
-from typing import List, Dict, Any
+from typing import List, Dict, Any, Optional
 
 from dotenv import load_dotenv
 from google import genai
 from google.genai import types
 
+from utils import llm_gpt  # noqa: F401  (GPT provider 등록 → Gemini 장애 시 failover 대상)
+from utils import metrics
+from utils.context_cache import (
+    context_key,
+    get_context_cache,
+    inline_deck_context,
+    inline_prompt,
+    record_usage,
+)
+from utils.json_salvage import parse_json_array
+from utils.llm_resilience import ATTEMPT_TIMEOUT_S, generate_text, register_provider
+from utils.llm_scheduler import estimate_tokens
+
 # ────────────────────────────────────────────
 # 0. 환경 변수에서 GEMINI_API_KEY 불러오기
 # ────────────────────────────────────────────
@@ -15,25 +27,21 @@ GEMINI_API_KEY = os.getenv("GEMINI_API_KEY")
 if not GEMINI_API_KEY:
     raise RuntimeError("환경변수 GEMINI_API_KEY가 설정되어 있지 않습니다. (.env.study 확인)")
 
-client = genai.Client(api_key=GEMINI_API_KEY)
+MODEL_NAME = "gemini-2.0-flash"
 
+# 문제 생성 시 provider의 JSON schema 강제 출력(structured output) 사용 여부 ("0"이면 예전 프롬프트 방식)
+STRUCTURED_OUTPUT = os.getenv("STUDY_MATE_STRUCTURED_OUTPUT", "1") == "1"
 
-# ────────────────────────────────────────────
-# 공통: 페이지 텍스트 정리
-# ────────────────────────────────────────────
-def _compress_pages(pages: List[str], limit: int = 8) -> List[str]:
-    """
-    앞쪽 limit개의 페이지만 사용하고, 각 페이지 텍스트 길이를 적당히 자른다.
-    """
-    out: List[str] = []
-    for p in pages[:limit]:
-        t = p.strip()
-        if len(t) > 800:
-            t = t[:800] + "\n...(생략)"
-        out.append(t)
-    return out
+# HTTP 단에서도 타임아웃을 걸어서, 응답 없는 연결이 스레드를 계속 잡고 있지 않게 한다. (ms)
+client = genai.Client(
+    api_key=GEMINI_API_KEY,
+    http_options=types.HttpOptions(timeout=int(ATTEMPT_TIMEOUT_S * 1000)),
+)
 
 
+# ────────────────────────────────────────────
+# 공통: 응답 텍스트 정리
+# ────────────────────────────────────────────
 def _join_response_text(response) -> str:
     """
     Gemini response에서 텍스트 부분만 모아 하나의 문자열로 합친다.
@@ -47,18 +55,130 @@ def _join_response_text(response) -> str:
     return "\n".join(parts).strip()
 
 
+def _gemini_schema(node):
+    """Gemini response_schema는 additionalProperties를 받지 않으므로 빼고 넘긴다."""
+    if isinstance(node, dict):
+        return {k: _gemini_schema(v) for k, v in node.items() if k != "additionalProperties"}
+    return node
+
+
+# 명시적 context cache는 최소 토큰 수가 있어서, 이보다 짧은 문맥은 그냥 프롬프트에 붙인다.
+_GEMINI_CACHE_MIN_TOKENS = 4096
+
+
+def _create_gemini_cache(model: str):
+    def create(context: str, ttl_s: int) -> str:
+        cache = client.caches.create(
+            model=model,
+            config=types.CreateCachedContentConfig(
+                contents=[context],
+                display_name=f"study-mate-{context_key(context)[:12]}",
+                ttl=f"{ttl_s}s",
+            ),
+        )
+        return cache.name
+    return create
+
+
+def _delete_gemini_cache(name: str) -> None:
+    client.caches.delete(name=name)
+
+
+def _refresh_gemini_cache(name: str, ttl_s: int) -> None:
+    client.caches.update(name=name, config=types.UpdateCachedContentConfig(ttl=f"{ttl_s}s"))
+
+
+def _is_cache_missing(e: Exception) -> bool:
+    """provider 쪽에서 cached content가 만료·삭제되어 참조할 수 없다는 오류인지 (404 / NOT_FOUND)."""
+    code = getattr(e, "code", None) or getattr(e, "status_code", None)
+    if code == 404 or str(getattr(e, "status", "")).upper() == "NOT_FOUND":
+        return True
+    msg = str(e).lower()
+    return "cached" in msg and ("expired" in msg or "not found" in msg)
+
+
+def _gemini_provider(
+    prompt: str, temperature, timeout_s: float, model, schema=None, context=None
+) -> str:
+    """llm_resilience에 등록하는 Gemini 호출 함수 (실패하면 예외)."""
+    model = model or MODEL_NAME
+    config = types.GenerateContentConfig(
+        temperature=temperature,
+        http_options=types.HttpOptions(timeout=int(timeout_s * 1000)),
+    )
+    if schema is not None:
+        config.response_mime_type = "application/json"
+        config.response_schema = _gemini_schema(schema)
+
+    # 같은 문맥으로 손익분기 넘게 호출되면 cached content로 한 번만 올리고, 이후 호출은 이름으로 참조한다.
+    # (올리는 문맥은 인라인으로 보낼 문맥과 같은 문자열이다)
+    cache_name = None
+    if context and estimate_tokens(context, expected_output=0) >= _GEMINI_CACHE_MIN_TOKENS:
+        cache_name = get_context_cache().get_or_create(
+            f"gemini/{model}", context,
+            create=_create_gemini_cache(model),
+            delete=_delete_gemini_cache,
+            refresh=_refresh_gemini_cache,
+        )
+
+    try:
+        if cache_name:
+            config.cached_content = cache_name
+            response = client.models.generate_content(model=model, contents=prompt, config=config)
+        else:
+            response = client.models.generate_content(
+                model=model,
+                contents=inline_prompt(context, prompt),
+                config=config,
+            )
+    except Exception as e:
+        if cache_name and _is_cache_missing(e):
+            # provider 쪽에서 캐시가 먼저 지워졌다 → 이 모델의 기록만 버리고 다음 시도에서 다시 만든다.
+            # (시간 초과·429 같은 다른 오류는 캐시와 무관하므로 공유 캐시를 건드리지 않는다)
+            get_context_cache().invalidate(f"gemini/{model}", context)
+        raise
+
+    usage = getattr(response, "usage_metadata", None)
+    if usage is not None:
+        record_usage(
+            "gemini",
+            getattr(usage, "prompt_token_count", 0) or 0,
+            getattr(usage, "cached_content_token_count", 0) or 0,
+        )
+    return _join_response_text(response)
+
+
+register_provider("gemini", _gemini_provider)
+
+
+def _generate(
+    prompt: str,
+    temperature: float,
+    label: str,
+    schema: Optional[dict] = None,
+    context: Optional[str] = None,
+) -> str:
+    """
+    Gemini 우선, 장애 시 GPT로 넘어가는 공통 호출.
+    (타임아웃 / 재시도 / circuit breaker는 llm_resilience에서 처리)
+    context(덱 문맥)는 프롬프트 앞에 두고, 자주 쓰이면 provider 캐시로 공유한다.
+    """
+    try:
+        return generate_text(
+            prompt, providers=("gemini", "gpt"), temperature=temperature,
+            schema=schema, context=context,
+        )
+    except Exception as e:
+        raise RuntimeError(f"Gemini 호출 오류({label}): {repr(e)}")
+
+
 # ────────────────────────────────────────────
 # 1) 전체 강의 요약
 # ────────────────────────────────────────────
 def generate_whole_summary(pages: List[str]) -> str:
-    pages_short = _compress_pages(pages, 8)
-    context = "\n\n".join(f"[페이지 {i+1}]\n{t}" for i, t in enumerate(pages_short))
-
-    prompt = f"""
+    prompt = """
 너는 대학 강의 PPT를 분석하는 'Study-Mate' 학습 도우미다.
-
-[입력 문맥]
-{context}
+위 [강의 자료]가 입력 문맥이다.
 
 [지시사항]
 - 이 강의가 전반적으로 무엇을 다루는지 2~3문단, 총 6~10문장으로 작성해라.
@@ -66,17 +186,13 @@ def generate_whole_summary(pages: List[str]) -> str:
 - Markdown으로 작성.
 """
 
-    try:
-        response = client.models.generate_content(
-            model="gemini-2.0-flash",
-            contents=prompt,
-            config=types.GenerateContentConfig(temperature=0.2),
-        )
-    except Exception as e:
-        raise RuntimeError(f"Gemini 호출 오류(전체 요약): {repr(e)}")
-
-    text = _join_response_text(response)
-    return text or "전체 요약을 생성하지 못했습니다."
+    text = _generate(
+        prompt, temperature=0.2, label="전체 요약", context=inline_deck_context(pages)
+    )
+    if not text:
+        # 빈 응답을 안내 문구로 바꿔 돌려주면 공용 캐시에 실패 결과가 남으므로 오류로 알린다.
+        raise RuntimeError("전체 요약을 생성하지 못했습니다. (빈 응답)")
+    return text
 
 
 # ────────────────────────────────────────────
@@ -84,44 +200,103 @@ def generate_whole_summary(pages: List[str]) -> str:
 #    - 지금 app.py에서 안 써도 되지만 import 되어 있으니 유지
 # ────────────────────────────────────────────
 def generate_page_summaries(pages: List[str]) -> str:
-    pages_short = _compress_pages(pages, 8)
-    context = "\n\n".join(f"[페이지 {i+1}]\n{t}" for i, t in enumerate(pages_short))
-
-    prompt = f"""
-너는 'Study-Mate'다. 아래 텍스트는 PPT 페이지 모음이다.
-
-[입력 페이지들]
-{context}
+    prompt = """
+너는 'Study-Mate'다. 위 [강의 자료]는 PPT 페이지 모음이다.
 
 [지시사항]
-- 각 페이지마다 '### 페이지 N 요약' 형식으로 요약해라.
+- 앞쪽 최대 8페이지(페이지 1~8)에 대해, 각 페이지마다 '### 페이지 N 요약' 형식으로 요약해라.
 - 개념 / 설명 / 절차 / 시험 포인트를 포함해라.
 - Markdown으로 출력.
 """
 
-    try:
-        response = client.models.generate_content(
-            model="gemini-2.0-flash",
-            contents=prompt,
-            config=types.GenerateContentConfig(temperature=0.25),
-        )
-    except Exception as e:
-        raise RuntimeError(f"Gemini 호출 오류(페이지 요약): {repr(e)}")
-
-    text = _join_response_text(response)
+    text = _generate(
+        prompt, temperature=0.25, label="페이지 요약", context=inline_deck_context(pages)
+    )
     return text or "페이지 요약을 생성하지 못했습니다."
 
 
 # ────────────────────────────────────────────
 # 3) 페이지별 문제 생성 (난이도 선택 + JSON 반환)
 # ────────────────────────────────────────────
+# structured output에 넘기는 문제 배열 schema (generate_page_questions 반환 형식과 같다)
+QUESTION_SCHEMA: Dict[str, Any] = {
+    "type": "array",
+    "items": {
+        "type": "object",
+        "properties": {
+            "id": {"type": "string"},
+            "page": {"type": "integer"},
+            "question": {"type": "string"},
+            "choices": {
+                "type": "object",
+                "properties": {k: {"type": "string"} for k in ("1", "2", "3", "4")},
+                "required": ["1", "2", "3", "4"],
+                "additionalProperties": False,
+            },
+            "answer": {"type": "integer"},
+            "explain": {"type": "string"},
+        },
+        "required": ["id", "page", "question", "choices", "answer", "explain"],
+        "additionalProperties": False,
+    },
+}
+
+
+def _valid_question(q: Any) -> bool:
+    """문제 한 개가 화면/문제 은행에서 쓸 수 있는 모양인지 확인."""
+    if not isinstance(q, dict) or not str(q.get("question", "")).strip():
+        return False
+    choices = q.get("choices")
+    if not isinstance(choices, dict) or len(choices) < 2:
+        return False
+    try:
+        return str(int(q.get("answer"))) in {str(k) for k in choices}
+    except (TypeError, ValueError):
+        return False
+
+
+def _record_question_parse(prompt: str, raw: str, requested: int, valid: int, complete: bool) -> None:
+    """
+    문제 생성 응답 파싱 결과를 metrics에 남긴다.
+    - parse_failures: 배열이 온전하지 않았던 응답 수 (일부만 살렸거나 하나도 못 살림)
+    - tokens_wasted: 쓸 수 없었던 문제 비율만큼의 입력+출력 토큰 (추정치)
+    """
+    tokens = estimate_tokens(prompt, expected_output=0) + len(raw or "") // 2
+    lost = max(0, requested - valid) / requested if requested else 0.0
+    metrics.incr("llm.questions.calls")
+    metrics.incr("llm.questions.requested", requested)
+    metrics.incr("llm.questions.salvaged", valid)
+    metrics.incr("llm.questions.tokens", tokens)
+    metrics.incr("llm.questions.tokens_wasted", tokens * lost)
+    if not complete:
+        metrics.incr("llm.questions.parse_failures")
+        if valid == 0:
+            metrics.incr("llm.questions.empty")
+
+
+def question_parse_stats() -> Dict[str, float]:
+    """문제 생성 호출 수, 파싱 실패율, 버려진 토큰 비율 (사이드바 표시용)."""
+    calls = metrics.counter("llm.questions.calls")
+    tokens = metrics.counter("llm.questions.tokens")
+    return {
+        "calls": int(calls),
+        "parse_failure_rate": metrics.counter("llm.questions.parse_failures") / calls if calls else 0.0,
+        "empty_rate": metrics.counter("llm.questions.empty") / calls if calls else 0.0,
+        "wasted_token_rate": metrics.counter("llm.questions.tokens_wasted") / tokens if tokens else 0.0,
+    }
+
+
 def generate_page_questions(
     pages: List[str],
     selected_pages: List[int],        # 1-based 페이지 번호 리스트
     num_questions: int = 2,
     difficulty: str = "medium",
+    structured: Optional[bool] = None,
 ) -> List[Dict[str, Any]]:
     """
+    structured=True(기본값: STUDY_MATE_STRUCTURED_OUTPUT)이면 provider의 JSON schema 강제 출력을 쓴다.
+    응답이 중간에 끊기거나 일부가 깨져도 온전한 문제들은 살려서 반환한다.
+
     반환: 각 문제를 나타내는 dict의 리스트
 
     [
@@ -140,36 +315,25 @@ def generate_page_questions(
     if not selected_pages:
         return []
 
-    # ✅ 선택된 페이지 텍스트만 추출 (1-based → 0-based 인덱스 변환)
-    selected_texts = []
-    for p in selected_pages:
-        idx = p - 1
-        if 0 <= idx < len(pages):
-            selected_texts.append(pages[idx])
+    # ✅ 존재하는 페이지만, 한 번에 최대 8페이지 (1-based)
+    target_pages = [p for p in selected_pages if 1 <= p <= len(pages)][:8]
 
     # 혹시라도 잘못된 페이지만 들어온 경우 방어
-    if not selected_texts:
+    if not target_pages:
         return []
 
-    # ✅ 선택된 페이지들만 압축
-    pages_short = _compress_pages(selected_texts, 8)
-
-    # ✅ 원본 페이지 번호와 함께 context 구성
-    #    (pages_short 길이와 selected_pages 길이가 동일하다고 가정)
-    context_chunks = []
-    for page_no, text in zip(selected_pages, pages_short):
-        context_chunks.append(f"[페이지 {page_no}]\n{text}")
-
-    context = "\n\n".join(context_chunks)
+    # ✅ 대상 페이지만 문맥으로 붙인다. 같은 묶음을 난이도별 / 다시 생성으로 여러 번 부르면
+    #    이 문맥이 그대로 재사용되므로, 손익분기를 넘으면 provider 캐시로 공유된다.
+    context = inline_deck_context(pages, target_pages)
 
     # ✅ Gemini 프롬프트에 선택된 페이지 & 문제 개수 반영
     prompt = (
         "너는 대학 강의 PPT 기반 문제를 생성하는 'Study-Mate'다.\n\n"
-        "[입력 페이지]\n"
-        f"{context}\n\n"
+        f"[대상 페이지] {', '.join(str(p) for p in target_pages)}\n"
+        "- 위 강의 자료 중 대상 페이지의 내용만 사용해라.\n\n"
         f"[난이도] {difficulty}\n\n"
         "[문제 생성 규칙]\n"
-        f"- 선택된 각 페이지마다 {num_questions}문제씩 생성.\n"
+        f"- 대상 페이지마다 {num_questions}문제씩 생성.\n"
         "- 각 문제는 4지선다 객관식.\n"
         "- 난이도 기준:\n"
         "  * easy: 기본 정의 중심, 직관적인 오답\n"
@@ -195,38 +359,22 @@ def generate_page_questions(
         f"- 반드시 각 페이지마다 정확히 {num_questions}문제씩 생성해라."
     )
 
-    try:
-        response = client.models.generate_content(
-            model="gemini-2.0-flash",
-            contents=prompt,
-            config=types.GenerateContentConfig(temperature=0.3),
-        )
-    except Exception as e:
-        raise RuntimeError(f"Gemini 호출 오류(문제 생성): {repr(e)}")
-
-    raw = _join_response_text(response)
+    structured = STRUCTURED_OUTPUT if structured is None else structured
+    raw = _generate(
+        prompt, temperature=0.3, label="문제 생성",
+        schema=QUESTION_SCHEMA if structured else None, context=context,
+    )
 
-    # 모델이 ```json ... ``` 형태로 감싸서 보낼 수도 있으니 껍데기 제거
-    txt = raw.strip()
-    if txt.startswith("```"):
-        # ```json 또는 ``` 제거
-        if txt.startswith("```json"):
-            txt = txt[len("```json"):].strip()
-        else:
-            txt = txt[len("```"):].strip()
-        # 끝에 ``` 있으면 제거
-        if "```" in txt:
-            txt = txt.split("```")[0].strip()
+    # ```json 펜스, 앞뒤 설명 문장, 잘린 배열, 깨진 원소가 있어도 온전한 문제는 살린다.
+    items, complete = parse_json_array(raw)
+    questions = [q for q in items if _valid_question(q)]
+    complete = complete and len(questions) == len(items)
 
-    try:
-        questions = json.loads(txt)
-    except Exception:
-        print("JSON 파싱 실패, raw 응답:", raw)
-        questions = []
-
-    # 리스트가 아닐 경우 대비
-    if not isinstance(questions, list):
-        questions = []
+    _record_question_parse(
+        prompt, raw, len(target_pages) * num_questions, len(questions), complete
+    )
+    if not complete:
+        print(f"문제 JSON 일부 파싱 실패: {len(questions)}개 복구, raw 응답 앞부분: {raw[:200]!r}")
 
     return questions
 
@@ -260,14 +408,8 @@ def generate_single_page_summary(page_text: str, page_number: int) -> str:
 - **[시험 포인트]** 시험에서 반드시 기억해야 할 포인트 1~2줄
 """
 
-    try:
-        response = client.models.generate_content(
-            model="gemini-2.0-flash",
-            contents=prompt,
-            config=types.GenerateContentConfig(temperature=0.25),
-        )
-    except Exception as e:
-        raise RuntimeError(f"Gemini 호출 오류(단일 페이지 요약): {repr(e)}")
-
-    text = _join_response_text(response)
-    return text or f"페이지 {page_number} 요약을 생성하지 못했습니다."
+    text = _generate(prompt, temperature=0.25, label="단일 페이지 요약")
+    if not text:
+        # 안내 문구를 요약처럼 돌려주면 페이지 요약 캐시 / 학습 팩에 그대로 저장되므로 오류로 알린다.
+        raise RuntimeError(f"페이지 {page_number} 요약을 생성하지 못했습니다. (빈 응답)")
+    return text
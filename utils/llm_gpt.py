@@ -1,8 +1,16 @@
 # utils/llm_gpt.py
 
-from typing import List
+from typing import Dict, List, Optional
+from concurrent.futures import ThreadPoolExecutor
+import contextvars
 import os
 
+from utils.embedder import embed_texts
+from utils.chroma_db import query_similar
+from utils.semantic_cache import SemanticCache
+from utils.context_cache import context_key, inline_deck_context, inline_prompt, record_usage
+from utils.llm_resilience import ProviderUnavailable, generate_text, register_provider
+
 # ---------------------------------------------------
 # 0) .env.study 로부터 OPENAI_API_KEY 로드
 # ---------------------------------------------------
@@ -49,28 +57,100 @@ def get_gpt_client():
     return OpenAI(api_key=api_key)
 
 
-def _call_gpt(prompt: str, model: str = MODEL_NAME) -> str:
+def _strict_json_schema(schema: dict) -> dict:
     """
-    공통 GPT 호출 유틸.
-    - 응답 텍스트를 그대로 반환
-    - 호출 중 에러가 나면 RuntimeError를 던지지 않고 에러 내용을 문자열로 반환
-      (Streamlit 앱이 죽지 않도록 하기 위함)
+    OpenAI structured output(strict) 형식으로 변환.
+    - 최상위는 object여야 하므로 배열이면 {"items": [...]} 로 감싼다.
+    - 모든 object에 additionalProperties=false, 모든 필드를 required로 둔다.
     """
+    def strict(node):
+        if not isinstance(node, dict):
+            return node
+        node = {k: strict(v) if isinstance(v, dict) else v for k, v in node.items()}
+        if node.get("type") == "object":
+            node["properties"] = {k: strict(v) for k, v in node.get("properties", {}).items()}
+            node["required"] = list(node["properties"])
+            node["additionalProperties"] = False
+        return node
+
+    schema = strict(schema)
+    if schema.get("type") != "object":
+        schema = {
+            "type": "object",
+            "properties": {"items": schema},
+            "required": ["items"],
+            "additionalProperties": False,
+        }
+    return schema
+
+
+def _gpt_provider(
+    prompt: str, temperature, timeout_s: float, model, schema=None, context=None
+) -> str:
+    """llm_resilience에 등록하는 GPT 호출 함수 (실패하면 예외)."""
     try:
         client = get_gpt_client()
     except RuntimeError as e:
-        # 클라이언트 생성 단계에서부터 문제가 있으면, 여기서 문자열로 반환
-        return f"❌ GPT 클라이언트 생성 중 오류가 발생했습니다.\n\n에러 내용: `{e}`"
-
+        # 키/패키지가 없으면 재시도하지 않고 바로 다른 provider로 넘긴다.
+        raise ProviderUnavailable(str(e))
+
+    kwargs = {}
+    if temperature is not None:
+        kwargs["temperature"] = temperature
+    if context:
+        # OpenAI는 앞부분이 같은 프롬프트를 자동으로 캐시한다(prefix caching).
+        # 문맥을 항상 맨 앞에 두고, 같은 문서끼리 같은 캐시 서버로 가도록 키를 붙인다.
+        kwargs["extra_body"] = {"prompt_cache_key": f"study-mate-{context_key(context)[:24]}"}
+    if schema is not None:
+        # 배열을 감싼 경우 응답은 {"items": [...]} → json_salvage가 첫 배열을 찾아 읽는다.
+        kwargs["text"] = {
+            "format": {
+                "type": "json_schema",
+                "name": "study_mate_output",
+                "schema": _strict_json_schema(schema),
+                "strict": True,
+            }
+        }
+
+    # 재시도/타임아웃은 llm_resilience에서 관리하므로 SDK 자체 재시도는 끈다.
+    response = client.with_options(timeout=timeout_s, max_retries=0).responses.create(
+        model=model or MODEL_NAME,
+        input=inline_prompt(context, prompt),
+        **kwargs,
+    )
+    usage = getattr(response, "usage", None)
+    if usage is not None:
+        details = getattr(usage, "input_tokens_details", None)
+        record_usage("gpt", usage.input_tokens or 0, getattr(details, "cached_tokens", 0) or 0)
+    if not response.output_text:
+        raise RuntimeError("GPT 응답이 비어 있습니다.")
+    return response.output_text
+
+
+register_provider("gpt", _gpt_provider)
+
+
+# _call_gpt가 실패했을 때 돌려주는 문자열의 첫 줄
+_ERROR_PREFIX = "❌ GPT 호출 중 오류가 발생했습니다."
+
+
+def _call_gpt(prompt: str, model: str = MODEL_NAME, context: Optional[str] = None) -> str:
+    """
+    공통 GPT 호출 유틸.
+    - 응답 텍스트를 그대로 반환
+    - 타임아웃 / 재시도(backoff) / circuit breaker를 거치고, GPT 장애 시 Gemini로 failover
+    - context(덱 문맥)는 프롬프트 맨 앞에 두어 provider의 prompt/context 캐시를 탄다
+    - 그래도 실패하면 RuntimeError를 던지지 않고 에러 내용을 문자열로 반환
+      (Streamlit 앱이 죽지 않도록 하기 위함)
+    """
     try:
-        response = client.responses.create(
-            model=model,
-            input=prompt,
+        return generate_text(
+            prompt, providers=("gpt", "gemini"), models={"gpt": model},
+            context=context,
         )
-        return response.output_text or "❌ GPT 응답이 비어 있습니다."
-    except Exception as e:
+    except RuntimeError as e:
         # 여기서는 예외를 던지지 않고, 에러 내용을 문자열로 돌려줌
-        return f"❌ GPT 호출 중 오류가 발생했습니다.\n\n에러 내용: `{e}`"
+        return f"{_ERROR_PREFIX}\n\n에러 내용: `{e}`"
 
 
 # ─────────────────────────────
@@ -80,11 +160,91 @@ def build_context_from_docs(docs: List[str]) -> str:
     return "\n\n---\n\n".join(docs)
 
 
+def _query_block(user_query: Optional[str]) -> str:
+    """학생 질문이 있으면 프롬프트에 넣을 [학생 질문] 블록 (없으면 빈 문자열)."""
+    if not user_query:
+        return ""
+    return f"""
+    [학생 질문]
+    {user_query}
+    - 요약과 문제는 이 질문과 관련된 내용 위주로 작성해라.
+    """
+
+
+# ─────────────────────────────
+# 공통: Q&A 출력 형식 (답변 / 요약 / 문제)
+#   - 개별 호출과 한 번에 묶는 호출이 같은 형식을 쓰도록 한 곳에 둔다.
+# ─────────────────────────────
+_ANSWER_SPEC = """
+[요구사항 - 질문 답변]
+요약보다 먼저 아래 형식으로 [학생 질문]에 답해라. Markdown으로 작성해라.
+
+## 0. 질문에 대한 답
+
+- 문맥에 있는 내용만으로 3~6문장으로 답해라.
+- 문맥에서 답을 찾을 수 없으면 "강의 자료에서 찾을 수 없습니다."라고만 써라.
+"""
+
+_SUMMARY_SPEC = """
+[요구사항 - 상세 요약]
+아래 형식으로, 비교적 자세하게 강의를 정리해라. Markdown으로 작성해라.
+
+## 1. 강의 상세 요약
+
+- 이 강의(또는 해당 범위)의 흐름을 2~3개 단락으로 나누어 서술식으로 정리해라.
+- 전체 분량은 최소 8문장 이상, 15문장 이하로 작성해라.
+- 가능한 경우, 다음 구조를 따르도록 노력해라:
+  1) 도입: 이 강의에서 다루는 주제와 배경
+  2) 전개: 핵심 개념/정의/수식/알고리즘의 설명
+  3) 마무리: 이 내용이 왜 중요한지, 어디에 응용되는지
+"""
+
+_QUESTIONS_SPEC = """
+[요구사항 - 문제 생성]
+아래 형식으로 연습문제를 만들어라. Markdown으로 작성해라.
+
+## 2. 객관식 연습문제 (2문제, 4지선다)
+- 실제 문맥에 등장한 용어나 개념을 기반으로 문제를 만들어라.
+- 개념의 정의, 특징, 비교 등을 묻는 문제로 구성해라.
+- 각 문제 아래에 정답 번호를 명시해라.
+
+### Q1.
+(문제)
+
+1) (보기1)
+2) (보기2)
+3) (보기3)
+4) (보기4)
+
+정답: 2번
+
+### Q2.
+(문제)
+
+1) (보기1)
+2) (보기2)
+3) (보기3)
+4) (보기4)
+
+정답: X번
+
+## 3. 주관식 연습문제 (1~2문제)
+- 핵심 개념의 정의, 차이점, 장단점을 묻는 문제로 만들어라.
+- 각 문제 아래에 "정답 핵심 키워드"를 한 줄로 적어라.
+
+### 서술형 Q1.
+(문제)
+
+정답 핵심 키워드: ...
+"""
+
+
 # ─────────────────────────────
 # 1) 강의 전체 상세 요약 (Q&A용)
 # ─────────────────────────────
-def generate_detailed_summary(docs: List[str]) -> str:
+def generate_detailed_summary(docs: List[str], user_query: Optional[str] = None) -> str:
     context = build_context_from_docs(docs)
+    answer_spec = _ANSWER_SPEC if user_query else ""
 
     prompt = f"""
     너는 대학 강의 PPT를 정리해주는 한국어 학습 도우미 'Study-Mate'다.
@@ -97,18 +257,9 @@ def generate_detailed_summary(docs: List[str]) -> str:
     - 문맥에 없는 내용을 상상으로 만들지 마라.
     - '감사합니다', '경청해주셔서' 같은 인사 슬라이드는 무시해라.
     - 한국어로 대답해라.
-
-    [요구사항 - 상세 요약]
-    아래 형식으로, 비교적 자세하게 강의를 정리해라. Markdown으로 작성해라.
-
-    ## 1. 강의 상세 요약
-
-    - 이 강의(또는 해당 범위)의 흐름을 2~3개 단락으로 나누어 서술식으로 정리해라.
-    - 전체 분량은 최소 8문장 이상, 15문장 이하로 작성해라.
-    - 가능한 경우, 다음 구조를 따르도록 노력해라:
-      1) 도입: 이 강의에서 다루는 주제와 배경
-      2) 전개: 핵심 개념/정의/수식/알고리즘의 설명
-      3) 마무리: 이 내용이 왜 중요한지, 어디에 응용되는지
+    {_query_block(user_query)}
+    {answer_spec}
+    {_SUMMARY_SPEC}
     """
 
     return _call_gpt(prompt)
@@ -117,7 +268,7 @@ def generate_detailed_summary(docs: List[str]) -> str:
 # ─────────────────────────────
 # 2) 연습문제 생성 (Q&A용)
 # ─────────────────────────────
-def generate_questions_from_docs(docs: List[str]) -> str:
+def generate_questions_from_docs(docs: List[str], user_query: Optional[str] = None) -> str:
     context = build_context_from_docs(docs)
 
     prompt = f"""
@@ -131,62 +282,122 @@ def generate_questions_from_docs(docs: List[str]) -> str:
     - 문맥에 없는 내용을 상상으로 만들지 마라.
     - '감사합니다', '경청해주셔서' 같은 인사 슬라이드는 무시해라.
     - 한국어로 대답해라.
+    {_query_block(user_query)}
+    {_QUESTIONS_SPEC}
+    """
 
-    [요구사항 - 문제 생성]
-    아래 형식으로 연습문제를 만들어라. Markdown으로 작성해라.
-
-    ## 2. 객관식 연습문제 (2문제, 4지선다)
-    - 실제 문맥에 등장한 용어나 개념을 기반으로 문제를 만들어라.
-    - 개념의 정의, 특징, 비교 등을 묻는 문제로 구성해라.
-    - 각 문제 아래에 정답 번호를 명시해라.
-
-    ### Q1.
-    (문제)
-
-    1) (보기1)
-    2) (보기2)
-    3) (보기3)
-    4) (보기4)
-
-    정답: 2번
+    return _call_gpt(prompt)
 
-    ### Q2.
-    (문제)
 
-    1) (보기1)
-    2) (보기2)
-    3) (보기3)
-    4) (보기4)
+# ─────────────────────────────
+# 3) Q&A용: 요약 + 문제 한 번에
+# ─────────────────────────────
+def _generate_summary_and_questions_single(docs: List[str], user_query: Optional[str] = None) -> str:
+    """(질문 답변 +) 요약 + 문제를 GPT 한 번 호출로 생성 (문맥 입력 토큰도 한 번만 보낸다)."""
+    context = build_context_from_docs(docs)
+    answer_spec = _ANSWER_SPEC if user_query else ""
 
-    정답: X번
+    prompt = f"""
+    너는 대학 강의 PPT를 정리하고 연습문제를 만들어주는 한국어 학습 도우미 'Study-Mate'다.
 
-    ## 3. 주관식 연습문제 (1~2문제)
-    - 핵심 개념의 정의, 차이점, 장단점을 묻는 문제로 만들어라.
-    - 각 문제 아래에 "정답 핵심 키워드"를 한 줄로 적어라.
+    [강의 문맥]
+    {context}
 
-    ### 서술형 Q1.
-    (문제)
+    [역할]
+    - 아래 문맥에 있는 내용만 사용해서 대답하고 문제를 만들어라.
+    - 문맥에 없는 내용을 상상으로 만들지 마라.
+    - '감사합니다', '경청해주셔서' 같은 인사 슬라이드는 무시해라.
+    - 한국어로 대답해라.
+    {_query_block(user_query)}
+    아래 요구사항을 순서대로 모두 작성하고,
+    "## 1. 강의 상세 요약" 부분과 "## 2. 객관식 연습문제" 부분 사이에 `---` 한 줄을 넣어라.
+    {answer_spec}
+    {_SUMMARY_SPEC}
 
-    정답 핵심 키워드: ...
+    {_QUESTIONS_SPEC}
     """
 
     return _call_gpt(prompt)
 
 
-# ─────────────────────────────
-# 3) Q&A용: 요약 + 문제 한 번에
-# ─────────────────────────────
-def generate_summary_and_questions(docs: List[str], user_query: str) -> str:
+def generate_summary_and_questions(
+    docs: List[str],
+    user_query: str,
+    mode: str = "single",
+) -> str:
     """
     추가 질문 탭에서:
-    - 관련 문단(docs)을 요약 + 문제 세트로 만들어서
+    - 학생 질문(user_query)에 대한 답 + 관련 문단(docs)의 요약 + 문제 세트를 만들어서
       답변처럼 보여줄 때 사용하는 함수
+
+    mode:
+    - "single": 요약 + 문제를 한 번의 GPT 호출로 생성 (기본값, 지연/입력 토큰 절반)
+    - "concurrent": 요약 / 문제 두 호출을 동시에 실행
+    - "sequential": 요약 → 문제 순서로 두 번 호출 (예전 방식)
     """
-    summary_md = generate_detailed_summary(docs)
-    questions_md = generate_questions_from_docs(docs)
+    if mode == "single":
+        return _generate_summary_and_questions_single(docs, user_query)
+
+    if mode == "concurrent":
+        with ThreadPoolExecutor(max_workers=2) as pool:
+            # 호출한 쪽의 LLM 우선순위(contextvar)를 작업 스레드에도 그대로 넘긴다.
+            summary_future = pool.submit(
+                contextvars.copy_context().run, generate_detailed_summary, docs, user_query
+            )
+            questions_future = pool.submit(
+                contextvars.copy_context().run, generate_questions_from_docs, docs, user_query
+            )
+            summary_md = summary_future.result()
+            questions_md = questions_future.result()
+    else:
+        summary_md = generate_detailed_summary(docs, user_query)
+        questions_md = generate_questions_from_docs(docs, user_query)
     return summary_md.rstrip() + "\n\n---\n\n" + questions_md.lstrip()
 
 
+# 표현만 다른 같은 질문(같은 문단이 검색되고, 질문 임베딩도 가까운 경우)은 이전 답변을 재사용
+_answer_cache = SemanticCache(threshold=0.9)
+
+
+def answer_query(
+    user_query: str,
+    top_k: int = 5,
+    mode: str = "single",
+    doc_hash: Optional[str] = None,
+) -> str:
+    """
+    질문 → 벡터DB에서 관련 문단 검색 → 질문 답변 + 요약 + 문제.
+    doc_hash를 주면 그 문서(deck)의 문단에서만 찾는다.
+    답변은 질문과 문단 둘 다에 달려 있으므로, 검색 결과(문단 id 집합)가 같고
+    질문 임베딩도 이전 질문과 충분히 비슷할 때만 GPT를 호출하지 않고 이전 답변을 쓴다.
+    """
+    query_emb = embed_texts([user_query])[0]
+    result = query_similar(
+        user_query, top_k=top_k, query_embedding=query_emb,
+        where={"deck": doc_hash} if doc_hash else None,
+    )
+
+    doc_ids = (result.get("ids") or [[]])[0]
+    docs = (result.get("documents") or [[]])[0]
+    if not docs:
+        return "❌ 관련된 강의 내용을 찾지 못했습니다. 먼저 PDF를 업로드해 주세요."
+
+    cached = _answer_cache.lookup(doc_ids, query_emb)
+    if cached is not None:
+        return cached
+
+    answer = generate_summary_and_questions(docs, user_query, mode=mode)
+    # 에러 문자열은 캐시하지 않는다. 요약 / 문제를 따로 부르는 mode에서는 한쪽만 실패해도
+    # "요약 --- ❌ ..."처럼 뒤쪽에 에러가 붙으므로 답변 전체에서 찾는다.
+    if _ERROR_PREFIX not in answer:
+        _answer_cache.store(doc_ids, query_emb, answer)
+    return answer
+
+
+def answer_cache_stats() -> Dict[str, int]:
+    return _answer_cache.stats()
+
+
 # ─────────────────────────────
 # 4) PPT 전체 → 1) 2줄 요약
 #                 2) 페이지별 상세 요약(최대 8p)
@@ -202,28 +413,15 @@ def generate_study_pack_from_pages(pages: List[str]) -> str:
     를 한 번에 생성해서 Markdown으로 반환하는 함수.
     """
 
-    # 페이지 수 & 길이 제한
-    max_pages = min(len(pages), 8)       # 최대 8페이지 사용
-    max_chars_per_page = 800             # 페이지당 최대 800자 사용
-
-    context_blocks = []
-    for i, page_text in enumerate(pages[:max_pages], start=1):
-        text = page_text.strip()
-        if len(text) > max_chars_per_page:
-            text = text[:max_chars_per_page] + "\n...(이하 생략)"
-        context_blocks.append(f"[페이지 {i}]\n{text}")
-
-    context = "\n\n".join(context_blocks)
+    # 앞쪽 8페이지 문맥(페이지당 최대 800자)은 전체 요약 호출과 같은 문자열이라 provider 캐시를 공유한다.
+    context = inline_deck_context(pages)
 
-    prompt = f"""
+    prompt = """
     너는 대학 강의 PPT를 정리해주는 한국어 학습 도우미 'Study-Mate'다.
 
-    아래는 PDF로 변환된 강의자료의 페이지별 텍스트이다.
+    위 [강의 자료]는 PDF로 변환된 강의자료의 페이지별 텍스트이다.
     각 [페이지 N] 블록은 PPT의 한 슬라이드라고 생각하면 된다.
-    페이지는 최대 8개까지만 주어진다.
-
-    [강의 전체 문맥]
-    {context}
+    페이지별 요약과 연습문제는 앞쪽 최대 8페이지(페이지 1~8)에 대해서만 작성한다.
 
     [역할]
     - 문맥에 있는 내용만 사용해서 대답해라.
@@ -273,4 +471,4 @@ def generate_study_pack_from_pages(pages: List[str]) -> str:
     존재하지 않는 페이지 번호에 대한 연습문제는 만들지 마라.
     """
 
-    return _call_gpt(prompt)
+    return _call_gpt(prompt, context=context)
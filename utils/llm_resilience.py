@@ -0,0 +1,354 @@
+# utils/llm_resilience.py
+
+from typing import Callable, Dict, List, Optional, Sequence
+from concurrent.futures import FIRST_COMPLETED, Future, ThreadPoolExecutor, wait
+import hashlib
+import os
+import random
+import threading
+import time
+
+from utils import metrics
+from utils.llm_scheduler import estimate_tokens, get_scheduler
+
+# ────────────────────────────────────────────
+# 설정 (환경변수로 조정 가능)
+# ────────────────────────────────────────────
+# 한 번의 provider 호출에 허용하는 최대 시간 / 재시도 포함 전체 마감 시간 (초)
+ATTEMPT_TIMEOUT_S = float(os.getenv("STUDY_MATE_LLM_TIMEOUT_S", "60"))
+TOTAL_DEADLINE_S = float(os.getenv("STUDY_MATE_LLM_DEADLINE_S", "120"))
+
+# provider당 최대 시도 횟수와 지수 backoff 설정
+MAX_ATTEMPTS = int(os.getenv("STUDY_MATE_LLM_MAX_ATTEMPTS", "3"))
+BACKOFF_BASE_S = 0.5
+BACKOFF_MAX_S = 8.0
+
+# 첫 요청이 최근 지연 시간의 HEDGE_PERCENTILE 퍼센타일을 넘기면 같은 요청을 하나 더 보낸다.
+HEDGE_ENABLED = os.getenv("STUDY_MATE_LLM_HEDGE", "0") == "1"
+HEDGE_PERCENTILE = 95
+HEDGE_MIN_SAMPLES = 20
+
+# 연속 실패(타임아웃 · 연결 오류 · 429 · 5xx)가 이만큼 쌓이면 provider를 잠시 건너뛰고(open) 다른 provider로 넘긴다.
+BREAKER_FAILURES = 5
+BREAKER_RESET_S = 30.0
+
+# 재시도해도 소용없는 HTTP 상태 코드 (인증/권한/잘못된 요청)
+_NON_RETRYABLE_CODES = {400, 401, 403, 404}
+
+
+class ProviderUnavailable(RuntimeError):
+    """API 키가 없거나 패키지가 없는 등, 재시도할 필요 없이 다음 provider로 넘어가야 하는 경우."""
+
+
+# provider 함수: (prompt, temperature, timeout_s, model, schema, context) → 응답 텍스트. 실패하면 예외를 던진다.
+# schema가 있으면 provider의 JSON schema 강제 출력(structured output)으로 JSON 문자열을 돌려준다.
+# context는 여러 호출이 공유하는 문서 문맥으로, 손익분기를 넘으면 provider 캐시에 올려 두고 참조하고
+# 아니면 prompt 앞에 붙인다. (어느 쪽이든 모델이 보는 문맥은 같다)
+ProviderFn = Callable[[str, Optional[float], float, Optional[str], Optional[dict], Optional[str]], str]
+
+_providers: Dict[str, ProviderFn] = {}
+
+# 응답이 늦게 와도 호출한 스레드는 마감 시간에 맞춰 돌아갈 수 있게 별도 스레드에서 실행
+_executor = ThreadPoolExecutor(max_workers=16, thread_name_prefix="llm-call")
+
+
+def register_provider(name: str, fn: ProviderFn) -> None:
+    _providers[name] = fn
+
+
+# ────────────────────────────────────────────
+# Circuit breaker
+# ────────────────────────────────────────────
+class CircuitBreaker:
+    """
+    closed → (연속 실패 failure_threshold회) → open → (reset_timeout 경과) → half-open
+    half-open에서는 한 번만 시험 호출을 허용하고, 성공하면 closed / 실패하면 다시 open.
+    시험 호출을 허락받은 쪽이 성공/실패를 기록하지 못하고 끝나면(마감 시간 초과, provider 사용 불가 등)
+    release_trial()로 자리를 돌려줘야 한다. 그렇지 않으면 다음 시험 호출이 영영 허용되지 않는다.
+    """
+
+    def __init__(self, failure_threshold: int = BREAKER_FAILURES, reset_timeout: float = BREAKER_RESET_S):
+        self.failure_threshold = failure_threshold
+        self.reset_timeout = reset_timeout
+        self._lock = threading.Lock()
+        self._failures = 0
+        self._opened_at: Optional[float] = None
+        self._trial_in_flight = False
+        self._trial_owner: Optional[int] = None
+
+    @property
+    def state(self) -> str:
+        with self._lock:
+            return self._state_locked()
+
+    def _state_locked(self) -> str:
+        if self._opened_at is None:
+            return "closed"
+        if time.monotonic() - self._opened_at >= self.reset_timeout:
+            return "half-open"
+        return "open"
+
+    def allow(self) -> bool:
+        with self._lock:
+            state = self._state_locked()
+            if state == "closed":
+                return True
+            if state == "half-open" and not self._trial_in_flight:
+                self._trial_in_flight = True
+                self._trial_owner = threading.get_ident()
+                return True
+            return False
+
+    def release_trial(self) -> None:
+        """이 스레드가 받은 시험 호출 자리를 결과 기록 없이 돌려준다 (상태는 그대로 half-open)."""
+        with self._lock:
+            if self._trial_in_flight and self._trial_owner == threading.get_ident():
+                self._trial_in_flight = False
+                self._trial_owner = None
+
+    def record_success(self) -> None:
+        with self._lock:
+            self._failures = 0
+            self._opened_at = None
+            self._trial_in_flight = False
+            self._trial_owner = None
+
+    def record_failure(self) -> None:
+        with self._lock:
+            self._failures += 1
+            if self._trial_in_flight or self._failures >= self.failure_threshold:
+                self._opened_at = time.monotonic()
+            self._trial_in_flight = False
+            self._trial_owner = None
+
+
+_breakers: Dict[str, CircuitBreaker] = {}
+_breakers_lock = threading.Lock()
+
+
+def get_breaker(provider: str) -> CircuitBreaker:
+    with _breakers_lock:
+        return _breakers.setdefault(provider, CircuitBreaker())
+
+
+# ────────────────────────────────────────────
+# 호출 유틸
+# ────────────────────────────────────────────
+def _is_retryable(e: BaseException) -> bool:
+    if isinstance(e, ProviderUnavailable):
+        return False
+    code = getattr(e, "code", None) or getattr(e, "status_code", None)
+    return not (isinstance(code, int) and code in _NON_RETRYABLE_CODES)
+
+
+def _backoff_delay(attempt: int) -> float:
+    """full jitter: 0 ~ min(최대, 기본 × 2^attempt) 사이 임의 대기."""
+    return random.uniform(0, min(BACKOFF_MAX_S, BACKOFF_BASE_S * (2 ** attempt)))
+
+
+def _timed_call(
+    provider: str, fn: ProviderFn, prompt: str, temperature, timeout_s: float, model, schema, context
+) -> str:
+    t0 = time.perf_counter()
+    try:
+        text = fn(prompt, temperature, timeout_s, model, schema, context)
+    except BaseException:
+        metrics.incr(f"llm.{provider}.errors")
+        raise
+    metrics.observe(f"llm.{provider}.latency", time.perf_counter() - t0)
+    return text
+
+
+def _attempt(
+    provider: str,
+    fn: ProviderFn,
+    prompt: str,
+    temperature: Optional[float],
+    timeout_s: float,
+    model: Optional[str],
+    schema: Optional[dict],
+    context: Optional[str],
+    est_tokens: int,
+    hedge: bool,
+) -> str:
+    """
+    provider 한 번 호출. timeout_s 안에 끝나지 않으면 TimeoutError.
+    hedge=True이고 최근 지연 시간 통계가 충분하면, p95를 넘길 때 같은 요청을 하나 더 보내
+    먼저 성공한 응답을 쓴다.
+    """
+    start = time.monotonic()
+    futures: List[Future] = [
+        _executor.submit(
+            _timed_call, provider, fn, prompt, temperature, timeout_s, model, schema, context
+        )
+    ]
+
+    hedge_after = None
+    if hedge:
+        hedge_after = metrics.percentile(
+            f"llm.{provider}.latency", HEDGE_PERCENTILE, min_samples=HEDGE_MIN_SAMPLES
+        )
+
+    last_error: Optional[BaseException] = None
+    while futures:
+        remaining = timeout_s - (time.monotonic() - start)
+        if remaining <= 0:
+            break
+
+        wait_for = remaining
+        if hedge_after is not None and len(futures) == 1:
+            wait_for = min(remaining, max(0.0, hedge_after - (time.monotonic() - start)))
+
+        done, _ = wait(futures, timeout=wait_for, return_when=FIRST_COMPLETED)
+        if not done:
+            if hedge_after is not None and len(futures) == 1:
+                # 꼬리 지연: 같은 요청을 하나 더 보낸다 (한 번만, 속도 제한에 여유가 있을 때만)
+                if get_scheduler().try_acquire(provider, est_tokens):
+                    metrics.incr(f"llm.{provider}.hedges")
+                    futures.append(
+                        _executor.submit(
+                            _timed_call, provider, fn, prompt, temperature, timeout_s, model, schema,
+                            context,
+                        )
+                    )
+                hedge_after = None
+            continue
+
+        for fut in done:
+            futures.remove(fut)
+            try:
+                return fut.result()
+            except BaseException as e:
+                last_error = e
+
+    if last_error is not None and not futures:
+        raise last_error
+    metrics.incr(f"llm.{provider}.timeouts")
+    raise TimeoutError(f"{provider} 응답이 {timeout_s:.0f}초 안에 오지 않았습니다.")
+
+
+def generate_text(
+    prompt: str,
+    providers: Sequence[str],
+    temperature: Optional[float] = None,
+    models: Optional[Dict[str, str]] = None,
+    attempt_timeout_s: float = ATTEMPT_TIMEOUT_S,
+    deadline_s: float = TOTAL_DEADLINE_S,
+    max_attempts: int = MAX_ATTEMPTS,
+    hedge: Optional[bool] = None,
+    schema: Optional[dict] = None,
+    context: Optional[str] = None,
+) -> str:
+    """
+    providers 순서대로 시도하는 LLM 텍스트 생성.
+    - provider마다 최대 max_attempts번, 지수 backoff(jitter)로 재시도
+    - 각 호출은 attempt_timeout_s, 전체는 deadline_s 안에 끝낸다
+    - circuit breaker가 열린 provider는 건너뛰고 다음 provider로 넘어간다(failover)
+    - schema(JSON schema)를 주면 provider의 structured output 기능으로 JSON만 받는다
+    - context(문서 문맥)는 손익분기를 넘으면 provider 캐시에 올려 두고 참조한다 (utils.context_cache)
+    모두 실패하면 마지막 예외를 담은 RuntimeError를 던진다.
+    """
+    hedge = HEDGE_ENABLED if hedge is None else hedge
+    models = models or {}
+
+    # 같은 요청이 이미 진행 중이면(여러 학생이 동시에 같은 버튼) 그 결과를 같이 쓴다.
+    key = hashlib.sha256(
+        repr((
+            tuple(providers), prompt, temperature, sorted(models.items()), schema, context,
+        )).encode("utf-8")
+    ).hexdigest()
+    return get_scheduler().coalesce(
+        key,
+        lambda: _generate_text(
+            prompt, providers, temperature, models,
+            attempt_timeout_s, deadline_s, max_attempts, hedge, schema, context,
+        ),
+    )
+
+
+def _generate_text(
+    prompt: str,
+    providers: Sequence[str],
+    temperature: Optional[float],
+    models: Dict[str, str],
+    attempt_timeout_s: float,
+    deadline_s: float,
+    max_attempts: int,
+    hedge: bool,
+    schema: Optional[dict],
+    context: Optional[str],
+) -> str:
+    scheduler = get_scheduler()
+    # context는 인라인으로 보내는 대상 페이지 문맥뿐이라(덱 전체가 아님) 그대로 센다.
+    est_tokens = estimate_tokens((context or "") + prompt)
+    start = time.monotonic()  # 스케줄러 대기열에서 기다린 시간도 마감 시간에 포함한다
+    errors: List[str] = []
+
+    for idx, provider in enumerate(providers):
+        fn = _providers.get(provider)
+        if fn is None:
+            continue
+        # 마감 시간이 이미 지났으면 half-open 시험 호출 자리를 받지 않는다.
+        if time.monotonic() - start >= deadline_s:
+            errors.append(f"{provider}: deadline exceeded")
+            break
+        breaker = get_breaker(provider)
+        if not breaker.allow():
+            errors.append(f"{provider}: circuit open")
+            continue
+        if idx > 0:
+            metrics.incr("llm.failovers")
+
+        try:
+            for attempt in range(max_attempts):
+                # 속도 제한(RPM/TPM) + 우선순위 대기열에서 차례를 기다린다.
+                # 남은 마감 시간까지만 기다리고, 마감이 지났으면 자리(토큰)를 차지하지 않는다.
+                remaining = deadline_s - (time.monotonic() - start)
+                if remaining <= 0:
+                    break
+                try:
+                    scheduler.acquire(provider, est_tokens, timeout=remaining)
+                except TimeoutError as e:
+                    errors.append(f"{provider}: {e}")
+                    break
+                remaining = deadline_s - (time.monotonic() - start)
+                try:
+                    text = _attempt(
+                        provider, fn, prompt, temperature,
+                        min(attempt_timeout_s, remaining), models.get(provider), schema,
+                        context, est_tokens, hedge,
+                    )
+                except ProviderUnavailable as e:
+                    errors.append(f"{provider}: {e}")
+                    break
+                except Exception as e:
+                    errors.append(f"{provider}: {e!r}")
+                    if not _is_retryable(e):
+                        # 요청 자체가 잘못된 것(400/401/403/404)은 provider 장애가 아니므로 circuit에 세지 않는다
+                        break
+                    breaker.record_failure()
+                    if attempt == max_attempts - 1 or not breaker.allow():
+                        break
+                    metrics.incr(f"llm.{provider}.retries")
+                    delay = _backoff_delay(attempt)
+                    if time.monotonic() - start + delay >= deadline_s:
+                        break
+                    time.sleep(delay)
+                else:
+                    breaker.record_success()
+                    return text
+        finally:
+            # 성공/실패를 기록하지 못하고 빠져나온 경우(마감 초과, provider 사용 불가, 예외) 시험 호출 자리 반환
+            breaker.release_trial()
+
+    raise RuntimeError("모든 LLM 호출이 실패했습니다: " + " | ".join(errors or ["사용 가능한 provider 없음"]))
+
+
+def latency_metrics() -> Dict[str, Dict[str, float]]:
+    """provider별 {"count", "p50", "p95", "p99"} (초) + circuit 상태."""
+    out: Dict[str, Dict[str, float]] = {}
+    for provider in _providers:
+        summary = metrics.latency_summary(f"llm.{provider}.latency")
+        summary["circuit"] = get_breaker(provider).state
+        out[provider] = summary
+    return out
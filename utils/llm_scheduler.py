@@ -0,0 +1,222 @@
+# utils/llm_scheduler.py
+
+from typing import Any, Callable, Dict, List, Optional
+from concurrent.futures import Future
+from contextlib import contextmanager
+import contextvars
+import itertools
+import os
+import threading
+import time
+
+from utils import metrics
+
+# ────────────────────────────────────────────
+# 우선순위 (숫자가 작을수록 먼저)
+# ────────────────────────────────────────────
+INTERACTIVE = 0   # 학생이 버튼을 눌러서 기다리는 요청
+BACKGROUND = 1    # 화면 뒤에서 미리 만들어 두는 요청
+PRECOMPUTE = 2    # 배치 작업 (scripts.precompute_study_packs 등)
+
+_PRIORITY_NAMES = {INTERACTIVE: "interactive", BACKGROUND: "background", PRECOMPUTE: "precompute"}
+
+_current_priority: contextvars.ContextVar[int] = contextvars.ContextVar(
+    "llm_priority", default=INTERACTIVE
+)
+
+
+@contextmanager
+def priority(level: int):
+    """with priority(PRECOMPUTE): ... 안에서 나가는 LLM 호출은 해당 우선순위로 줄을 선다."""
+    token = _current_priority.set(level)
+    try:
+        yield
+    finally:
+        _current_priority.reset(token)
+
+
+# provider별 분당 요청 수 / 분당 토큰 수 한도 (무료 등급 기준으로 넉넉히 잡은 기본값)
+_DEFAULT_RPM = float(os.getenv("STUDY_MATE_LLM_RPM", "60"))
+_DEFAULT_TPM = float(os.getenv("STUDY_MATE_LLM_TPM", "200000"))
+
+
+def estimate_tokens(prompt: str, expected_output: int = 1000) -> int:
+    """
+    토큰 수 대략 추정. 한국어는 글자당 토큰이 많으므로 2글자 ≈ 1토큰으로 잡고,
+    출력 토큰도 분당 한도에 포함되므로 expected_output을 더한다.
+    """
+    return len(prompt) // 2 + expected_output
+
+
+class TokenBucket:
+    """rate_per_s 속도로 채워지고 capacity까지 쌓이는 토큰 버킷."""
+
+    def __init__(self, rate_per_s: float, capacity: float):
+        self.rate = rate_per_s
+        self.capacity = capacity
+        self._tokens = capacity
+        self._updated = time.monotonic()
+
+    def _refill(self) -> None:
+        now = time.monotonic()
+        self._tokens = min(self.capacity, self._tokens + (now - self._updated) * self.rate)
+        self._updated = now
+
+    def wait_time(self, amount: float) -> float:
+        """amount만큼 꺼내려면 몇 초 기다려야 하는지 (0이면 바로 가능)."""
+        self._refill()
+        amount = min(amount, self.capacity)  # 한도보다 큰 요청도 언젠가는 통과시킨다
+        if self._tokens >= amount:
+            return 0.0
+        return (amount - self._tokens) / self.rate
+
+    def take(self, amount: float) -> None:
+        self._refill()
+        self._tokens -= min(amount, self.capacity)
+
+
+class LLMScheduler:
+    """
+    프로세스 전체에서 하나만 쓰는 LLM 요청 스케줄러.
+
+    - provider마다 요청 수(RPM) / 토큰 수(TPM) 토큰 버킷으로 속도 제한
+    - 대기열은 (우선순위, 도착 순서)로 정렬 → 학생 요청이 배치 작업보다 먼저 나간다
+    - 같은 요청(key)이 이미 진행 중이면 새로 보내지 않고 그 결과를 같이 받는다(coalescing)
+    """
+
+    def __init__(self, rpm: float = _DEFAULT_RPM, tpm: float = _DEFAULT_TPM):
+        self.rpm = rpm
+        self.tpm = tpm
+        self._cond = threading.Condition()
+        self._buckets: Dict[str, List[TokenBucket]] = {}
+        self._queue: List[tuple] = []   # 대기 중인 (priority, seq, provider, tokens)
+        self._seq = itertools.count()
+        self._inflight: Dict[str, Future] = {}
+        self._inflight_lock = threading.Lock()
+
+    def _provider_buckets(self, provider: str) -> List[TokenBucket]:
+        if provider not in self._buckets:
+            self._buckets[provider] = [
+                TokenBucket(self.rpm / 60.0, max(1.0, self.rpm / 6)),   # 요청 수 (10초치 burst)
+                TokenBucket(self.tpm / 60.0, max(1.0, self.tpm / 6)),   # 토큰 수
+            ]
+        return self._buckets[provider]
+
+    def _wait_time(self, provider: str, tokens: int) -> float:
+        req_bucket, tok_bucket = self._provider_buckets(provider)
+        return max(req_bucket.wait_time(1), tok_bucket.wait_time(tokens))
+
+    def _take(self, provider: str, tokens: int) -> None:
+        req_bucket, tok_bucket = self._provider_buckets(provider)
+        req_bucket.take(1)
+        tok_bucket.take(tokens)
+
+    # ── 속도 제한 ──────────────────────────────
+    def acquire(
+        self,
+        provider: str,
+        tokens: int,
+        level: Optional[int] = None,
+        timeout: Optional[float] = None,
+    ) -> float:
+        """
+        provider 호출 한 번을 보낼 차례가 될 때까지 기다린다. 기다린 시간(초)을 반환.
+        같은 provider 대기열에서 우선순위가 가장 높은(먼저 온) 요청부터 통과한다.
+        timeout(초) 안에 차례가 오지 않으면 자리(토큰)를 차지하지 않고 TimeoutError.
+        """
+        level = _current_priority.get() if level is None else level
+        entry = (level, next(self._seq), provider, tokens)
+        t0 = time.monotonic()
+        deadline = None if timeout is None else t0 + timeout
+
+        with self._cond:
+            self._queue.append(entry)
+            try:
+                while True:
+                    left = None if deadline is None else deadline - time.monotonic()
+                    head = min((e for e in self._queue if e[2] == provider), default=None)
+                    if head is entry:
+                        delay = self._wait_time(provider, tokens)
+                        if delay <= 0:
+                            break
+                        if left is not None and delay > left:
+                            # 버킷이 차기 전에 마감이 온다 → 기다리지 않고 바로 포기
+                            raise TimeoutError(f"{provider} 호출 차례를 {timeout:.0f}초 안에 받지 못했습니다.")
+                        self._cond.wait(timeout=delay)
+                    else:
+                        if left is not None and left <= 0:
+                            raise TimeoutError(f"{provider} 호출 차례를 {timeout:.0f}초 안에 받지 못했습니다.")
+                        self._cond.wait(timeout=0.5 if left is None else min(0.5, left))
+                self._take(provider, tokens)
+            except TimeoutError:
+                metrics.incr("llm.scheduler.timeouts")
+                raise
+            finally:
+                self._queue.remove(entry)
+                self._cond.notify_all()
+
+        waited = time.monotonic() - t0
+        metrics.observe("llm.scheduler.wait", waited)
+        metrics.observe(f"llm.scheduler.wait.{_PRIORITY_NAMES.get(level, level)}", waited)
+        return waited
+
+    def try_acquire(self, provider: str, tokens: int) -> bool:
+        """기다리지 않고 바로 보낼 수 있을 때만 자리를 차지한다 (hedging용)."""
+        with self._cond:
+            if any(e[2] == provider for e in self._queue):
+                return False
+            if self._wait_time(provider, tokens) > 0:
+                return False
+            self._take(provider, tokens)
+            return True
+
+    # ── 중복 요청 합치기 ───────────────────────
+    def coalesce(self, key: str, fn: Callable[[], Any]) -> Any:
+        """같은 key의 요청이 진행 중이면 그 결과를 기다려서 같이 쓰고, 아니면 fn()을 실행."""
+        with self._inflight_lock:
+            existing = self._inflight.get(key)
+            if existing is None:
+                future: Future = Future()
+                self._inflight[key] = future
+        if existing is not None:
+            metrics.incr("llm.scheduler.coalesced")
+            return existing.result()
+
+        try:
+            result = fn()
+        except BaseException as e:
+            future.set_exception(e)
+            raise
+        else:
+            future.set_result(result)
+            return result
+        finally:
+            with self._inflight_lock:
+                self._inflight.pop(key, None)
+
+    def stats(self) -> Dict[str, Any]:
+        """대기열 깊이 / 진행 중인 요청 수 / 대기 시간 p50·p95 (초)."""
+        with self._cond:
+            depth = len(self._queue)
+            by_level: Dict[str, int] = {}
+            for level, _, _, _ in self._queue:
+                name = _PRIORITY_NAMES.get(level, str(level))
+                by_level[name] = by_level.get(name, 0) + 1
+        with self._inflight_lock:
+            inflight = len(self._inflight)
+        wait = metrics.latency_summary("llm.scheduler.wait")
+        return {
+            "queue_depth": depth,
+            "queue_by_priority": by_level,
+            "inflight": inflight,
+            "wait_p50": wait["p50"],
+            "wait_p95": wait["p95"],
+            "coalesced": int(metrics.counter("llm.scheduler.coalesced")),
+        }
+
+
+_scheduler = LLMScheduler()
+
+
+def get_scheduler() -> LLMScheduler:
+    return _scheduler
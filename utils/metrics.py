@@ -0,0 +1,64 @@
+# utils/metrics.py
+
+from typing import Dict, Optional
+from collections import deque
+import threading
+
+# 최근 샘플만 유지해서 퍼센타일을 계산한다 (프로세스 전체 공용, 메모리 고정)
+_WINDOW = 2048
+
+_lock = threading.Lock()
+_latencies: Dict[str, deque] = {}
+_counters: Dict[str, float] = {}
+
+
+def observe(name: str, seconds: float) -> None:
+    """지연 시간 샘플(초) 기록."""
+    with _lock:
+        _latencies.setdefault(name, deque(maxlen=_WINDOW)).append(seconds)
+
+
+def incr(name: str, amount: float = 1) -> None:
+    """카운터 증가."""
+    with _lock:
+        _counters[name] = _counters.get(name, 0) + amount
+
+
+def counter(name: str) -> float:
+    with _lock:
+        return _counters.get(name, 0)
+
+
+def percentile(name: str, pct: float, min_samples: int = 1) -> Optional[float]:
+    """최근 샘플 기준 pct 퍼센타일(초). 샘플이 min_samples보다 적으면 None."""
+    with _lock:
+        samples = list(_latencies.get(name, ()))
+    if len(samples) < max(1, min_samples):
+        return None
+    samples.sort()
+    idx = min(len(samples) - 1, int(round(pct / 100 * (len(samples) - 1))))
+    return samples[idx]
+
+
+def latency_summary(name: str) -> Dict[str, float]:
+    """{"count", "p50", "p95", "p99"} (단위: 초)"""
+    with _lock:
+        samples = sorted(_latencies.get(name, ()))
+    if not samples:
+        return {"count": 0, "p50": 0.0, "p95": 0.0, "p99": 0.0}
+
+    def pick(pct: float) -> float:
+        return samples[min(len(samples) - 1, int(round(pct / 100 * (len(samples) - 1))))]
+
+    return {"count": len(samples), "p50": pick(50), "p95": pick(95), "p99": pick(99)}
+
+
+def snapshot(prefix: str = "") -> Dict[str, Dict]:
+    """prefix로 시작하는 지연 시간 요약과 카운터를 한 번에 반환."""
+    with _lock:
+        lat_names = [n for n in _latencies if n.startswith(prefix)]
+        counters = {n: v for n, v in _counters.items() if n.startswith(prefix)}
+    return {
+        "latency": {n: latency_summary(n) for n in lat_names},
+        "counters": counters,
+    }
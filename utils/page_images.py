@@ -0,0 +1,109 @@
+# utils/page_images.py
+
+from typing import Iterable, Optional
+from concurrent.futures import ThreadPoolExecutor
+from pathlib import Path
+import io
+import os
+
+import fitz  # PyMuPDF
+
+from utils.artifact_cache import get_artifact_cache
+
+# ────────────────────────────────────────────
+# 설정 (환경변수로 조정 가능)
+# ────────────────────────────────────────────
+# 브라우저로 보내는 페이지 이미지 형식: "webp" / "jpeg" / "png" (WebP는 Pillow 필요, 없으면 JPEG)
+IMAGE_FORMAT = os.getenv("STUDY_MATE_IMAGE_FORMAT", "webp").lower()
+IMAGE_QUALITY = int(os.getenv("STUDY_MATE_IMAGE_QUALITY", "80"))
+
+# 탭2 이미지 열의 화면 너비(CSS px)와 고해상도 화면 배율.
+# 렌더링 해상도 = 열 너비 × 배율 → 화면에 보이는 것보다 크게 그리지 않는다.
+IMAGE_COLUMN_PX = int(os.getenv("STUDY_MATE_IMAGE_COLUMN_PX", "600"))
+IMAGE_DPR = float(os.getenv("STUDY_MATE_IMAGE_DPR", "1.5"))
+
+# 현재 페이지 앞뒤로 미리 렌더링해 둘 페이지 수
+PREFETCH_PAGES = int(os.getenv("STUDY_MATE_IMAGE_PREFETCH", "2"))
+
+# 페이지 넘김을 기다리게 하지 않도록, 미리 렌더링은 별도 스레드에서
+_prefetch_executor = ThreadPoolExecutor(max_workers=2, thread_name_prefix="page-prefetch")
+
+
+def target_width_px(column_px: Optional[int] = None, dpr: Optional[float] = None) -> int:
+    return int((column_px or IMAGE_COLUMN_PX) * (dpr or IMAGE_DPR))
+
+
+def _encode(pix, fmt: str, quality: int) -> bytes:
+    if fmt == "png":
+        return pix.tobytes("png")
+    if fmt == "webp":
+        try:
+            from PIL import Image
+        except ImportError:
+            fmt = "jpeg"  # Pillow가 없으면 JPEG로
+        else:
+            mode = "RGBA" if pix.alpha else "RGB"
+            img = Image.frombytes(mode, (pix.width, pix.height), pix.samples)
+            buf = io.BytesIO()
+            img.save(buf, format="WEBP", quality=quality, method=4)
+            return buf.getvalue()
+    return pix.tobytes("jpeg", jpg_quality=quality)
+
+
+def render_page(
+    pdf_path: str | Path,
+    page_index: int,
+    width_px: Optional[int] = None,
+    fmt: str = IMAGE_FORMAT,
+    quality: int = IMAGE_QUALITY,
+) -> bytes:
+    """
+    PDF 한 페이지(0-based)를 width_px 너비에 맞춰 렌더링하고 fmt로 인코딩한 bytes.
+    슬라이드마다 크기가 달라도 화면 너비 기준으로 배율(zoom)을 정한다.
+    """
+    width_px = width_px or target_width_px()
+    with fitz.open(pdf_path) as doc:
+        page = doc.load_page(page_index)
+        zoom = width_px / max(1.0, page.rect.width)
+        pix = page.get_pixmap(matrix=fitz.Matrix(zoom, zoom), alpha=False)
+        return _encode(pix, fmt, quality)
+
+
+def get_page_image(
+    doc_hash: str,
+    pdf_path: str | Path,
+    page_no: int,
+    width_px: Optional[int] = None,
+) -> bytes:
+    """
+    1-based page_no 페이지 이미지. 세션 공용 캐시(문서 해시 기준)에 있으면 바로 반환하고,
+    없으면 그 페이지만 렌더링한다. (같은 페이지를 여러 세션이 동시에 요청해도 한 번만)
+    """
+    width_px = width_px or target_width_px()
+    return get_artifact_cache().get_or_compute(
+        doc_hash,
+        "page_image",
+        lambda: render_page(pdf_path, page_no - 1, width_px),
+        params=(page_no, width_px, IMAGE_FORMAT, IMAGE_QUALITY),
+    )
+
+
+def prefetch_page_images(
+    doc_hash: str,
+    pdf_path: str | Path,
+    page_nos: Iterable[int],
+    width_px: Optional[int] = None,
+) -> None:
+    """page_nos 페이지들을 백그라운드에서 미리 렌더링해 캐시에 넣어 둔다 (기다리지 않음)."""
+    for page_no in page_nos:
+        _prefetch_executor.submit(get_page_image, doc_hash, pdf_path, page_no, width_px)
+
+
+def neighbor_pages(page_no: int, num_pages: int, radius: int = PREFETCH_PAGES) -> list[int]:
+    """현재 페이지 다음 → 이전 순서로 radius 범위의 이웃 페이지 (다음 장으로 넘길 확률이 더 높다)."""
+    out = []
+    for d in range(1, radius + 1):
+        for p in (page_no + d, page_no - d):
+            if 1 <= p <= num_pages:
+                out.append(p)
+    return out
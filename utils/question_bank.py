@@ -0,0 +1,289 @@
+# utils/question_bank.py
+
+from typing import Any, Callable, Dict, List, Optional, Tuple
+from concurrent.futures import ThreadPoolExecutor
+from pathlib import Path
+import contextvars
+import json
+import re
+import sqlite3
+import threading
+import time
+
+# 문서 해시 / 페이지 / 난이도별로 생성된 문제를 모아 두는 로컬 문제 은행
+DB_PATH = Path("data/question_bank.sqlite3")
+
+# 정규화한 문제 본문의 글자 bigram 유사도가 이 값 이상이면 같은 문제로 본다.
+NEAR_DUP_THRESHOLD = 0.85
+
+# generate_page_questions는 한 번에 최대 8페이지까지만 문맥에 넣는다.
+_GENERATE_PAGE_GROUP = 8
+
+# 모자란 페이지 묶음을 동시에 생성하는 최대 개수 (속도 제한은 llm_scheduler가 맡는다)
+_GENERATE_WORKERS = 4
+
+_SCHEMA = """
+CREATE TABLE IF NOT EXISTS questions (
+    id          INTEGER PRIMARY KEY AUTOINCREMENT,
+    doc_hash    TEXT    NOT NULL,
+    page        INTEGER NOT NULL,
+    difficulty  TEXT    NOT NULL,
+    question    TEXT    NOT NULL,
+    choices     TEXT    NOT NULL,   -- JSON {"1": "...", ..., "4": "..."}
+    answer      INTEGER NOT NULL,
+    explain     TEXT    NOT NULL DEFAULT '',
+    norm        TEXT    NOT NULL,   -- 중복 판정용 정규화 본문
+    created_at  REAL    NOT NULL,
+    UNIQUE (doc_hash, page, difficulty, norm)
+);
+CREATE INDEX IF NOT EXISTS idx_questions_lookup
+    ON questions (doc_hash, page, difficulty);
+CREATE TABLE IF NOT EXISTS seeded (
+    doc_hash    TEXT    NOT NULL,
+    source      TEXT    NOT NULL,   -- 미리 만든 문제의 출처 (예: study_pack)
+    difficulty  TEXT    NOT NULL,
+    page        INTEGER NOT NULL,
+    seeded_at   REAL    NOT NULL,
+    PRIMARY KEY (doc_hash, source, difficulty, page)
+);
+"""
+
+_write_lock = threading.Lock()
+_initialized = False
+
+
+def _connect() -> sqlite3.Connection:
+    global _initialized
+    DB_PATH.parent.mkdir(parents=True, exist_ok=True)
+    conn = sqlite3.connect(str(DB_PATH), timeout=10)
+    conn.row_factory = sqlite3.Row
+    if not _initialized:
+        conn.execute("PRAGMA journal_mode=WAL")  # 읽기와 쓰기가 서로 막지 않도록
+        conn.executescript(_SCHEMA)
+        _initialized = True
+    return conn
+
+
+# ────────────────────────────────────────────
+# 중복 판정
+# ────────────────────────────────────────────
+def _normalize(text: str) -> str:
+    """소문자화 + 문장부호/공백 제거. (한국어는 띄어쓰기 차이가 흔해서 공백도 뺀다)"""
+    return re.sub(r"[\W_]+", "", text.lower())
+
+
+def _bigrams(norm: str) -> set:
+    if len(norm) < 2:
+        return {norm}
+    return {norm[i:i + 2] for i in range(len(norm) - 1)}
+
+
+def _similarity(a: set, b: set) -> float:
+    if not a or not b:
+        return 0.0
+    return len(a & b) / len(a | b)
+
+
+# ────────────────────────────────────────────
+# 저장 / 조회
+# ────────────────────────────────────────────
+def _page_of(q: Dict[str, Any]) -> Optional[int]:
+    try:
+        return int(q.get("page"))
+    except (TypeError, ValueError):
+        return None
+
+
+def _insert_questions(
+    conn: sqlite3.Connection, doc_hash: str, difficulty: str, questions: List[Dict[str, Any]]
+) -> int:
+    """add_questions 본체 (_write_lock 안에서, 커밋은 호출 쪽이 한다)."""
+    added = 0
+    existing: Dict[int, List[set]] = {}
+    for q in questions:
+        page = _page_of(q)
+        try:
+            answer = int(q.get("answer"))
+        except (TypeError, ValueError):
+            continue
+        text = str(q.get("question", "")).strip()
+        choices = q.get("choices") or {}
+        if page is None or not text or not isinstance(choices, dict):
+            continue
+
+        norm = _normalize(text)
+        if page not in existing:
+            rows = conn.execute(
+                "SELECT norm FROM questions WHERE doc_hash=? AND page=? AND difficulty=?",
+                (doc_hash, page, difficulty),
+            ).fetchall()
+            existing[page] = [_bigrams(r["norm"]) for r in rows]
+
+        grams = _bigrams(norm)
+        if any(_similarity(grams, g) >= NEAR_DUP_THRESHOLD for g in existing[page]):
+            continue
+
+        cur = conn.execute(
+            "INSERT OR IGNORE INTO questions "
+            "(doc_hash, page, difficulty, question, choices, answer, explain, norm, created_at) "
+            "VALUES (?, ?, ?, ?, ?, ?, ?, ?, ?)",
+            (
+                doc_hash, page, difficulty, text,
+                json.dumps(choices, ensure_ascii=False), answer,
+                str(q.get("explain", "")), norm, time.time(),
+            ),
+        )
+        if cur.rowcount:
+            added += 1
+            existing[page].append(grams)
+    return added
+
+
+def add_questions(doc_hash: str, difficulty: str, questions: List[Dict[str, Any]]) -> int:
+    """
+    generate_page_questions 형식의 문제들을 문제 은행에 저장하고, 새로 들어간 개수를 반환.
+    같은 (문서, 페이지, 난이도)에 거의 같은 문제가 이미 있으면 건너뛴다.
+    """
+    with _write_lock:
+        conn = _connect()
+        try:
+            added = _insert_questions(conn, doc_hash, difficulty, questions)
+            conn.commit()
+        finally:
+            conn.close()
+    return added
+
+
+def seed_questions(
+    doc_hash: str,
+    questions_by_level: Dict[str, List[Dict[str, Any]]],
+    source: str = "study_pack",
+) -> int:
+    """
+    미리 만든 문제({난이도: [문제, ...]})를 (문서, 난이도, 페이지)마다 한 번만 넣고, 새로 들어간 개수를 반환.
+    넣었다는 기록(seeded)도 문제 은행에 남기므로 프로세스를 다시 띄워도 다시 넣지 않고,
+    학습 팩에 나중에 추가된 페이지만 새로 넣는다.
+    """
+    added = 0
+    with _write_lock:
+        conn = _connect()
+        try:
+            done = {
+                (r["difficulty"], r["page"])
+                for r in conn.execute(
+                    "SELECT difficulty, page FROM seeded WHERE doc_hash=? AND source=?",
+                    (doc_hash, source),
+                )
+            }
+            now = time.time()
+            for difficulty, questions in questions_by_level.items():
+                fresh = [q for q in questions if (difficulty, _page_of(q)) not in done]
+                added += _insert_questions(conn, doc_hash, difficulty, fresh)
+                pages = {_page_of(q) for q in fresh} - {None}
+                conn.executemany(
+                    "INSERT OR IGNORE INTO seeded (doc_hash, source, difficulty, page, seeded_at) "
+                    "VALUES (?, ?, ?, ?, ?)",
+                    [(doc_hash, source, difficulty, page, now) for page in sorted(pages)],
+                )
+            conn.commit()
+        finally:
+            conn.close()
+    return added
+
+
+def count_questions(doc_hash: str, difficulty: str) -> Dict[int, int]:
+    """페이지별 저장된 문제 수."""
+    conn = _connect()
+    try:
+        rows = conn.execute(
+            "SELECT page, COUNT(*) AS n FROM questions "
+            "WHERE doc_hash=? AND difficulty=? GROUP BY page",
+            (doc_hash, difficulty),
+        ).fetchall()
+    finally:
+        conn.close()
+    return {r["page"]: r["n"] for r in rows}
+
+
+def draw_questions(
+    doc_hash: str,
+    selected_pages: List[int],
+    num_questions: int,
+    difficulty: str,
+) -> Tuple[List[Dict[str, Any]], Dict[int, int]]:
+    """
+    문제 은행에서 페이지마다 최대 num_questions개를 무작위로 뽑는다.
+    반환: (문제 리스트, {페이지: 모자란 개수})
+    문제 id는 화면 위젯 key로 쓰이므로 "P<페이지>Q<번호>"로 새로 매긴다.
+    """
+    questions: List[Dict[str, Any]] = []
+    missing: Dict[int, int] = {}
+
+    conn = _connect()
+    try:
+        for page in selected_pages:
+            rows = conn.execute(
+                "SELECT * FROM questions WHERE doc_hash=? AND page=? AND difficulty=? "
+                "ORDER BY RANDOM() LIMIT ?",
+                (doc_hash, page, difficulty, num_questions),
+            ).fetchall()
+            for k, r in enumerate(rows, start=1):
+                questions.append({
+                    "id": f"P{page}Q{k}",
+                    "page": page,
+                    "question": r["question"],
+                    "choices": json.loads(r["choices"]),
+                    "answer": r["answer"],
+                    "explain": r["explain"],
+                    "bank_id": r["id"],
+                })
+            if len(rows) < num_questions:
+                missing[page] = num_questions - len(rows)
+    finally:
+        conn.close()
+    return questions, missing
+
+
+def draw_or_generate(
+    doc_hash: str,
+    selected_pages: List[int],
+    num_questions: int,
+    difficulty: str,
+    generate: Callable[[List[int], int], List[Dict[str, Any]]],
+) -> List[Dict[str, Any]]:
+    """
+    문제 은행에서 먼저 뽑고, 모자란 페이지만 generate(pages, n)로 채운 뒤 다시 뽑는다.
+    모자란 개수가 같은 페이지끼리 묶어서(최대 8페이지씩) 생성하고, 묶음들은 동시에 요청한다.
+    일부 묶음만 실패하면 나머지로 만든 문제를 돌려주고, 하나도 못 만들면 첫 예외를 다시 던진다.
+    """
+    questions, missing = draw_questions(doc_hash, selected_pages, num_questions, difficulty)
+    if not missing:
+        return questions
+
+    by_count: Dict[int, List[int]] = {}
+    for page, n in missing.items():
+        by_count.setdefault(n, []).append(page)
+
+    groups = [
+        (pages[start:start + _GENERATE_PAGE_GROUP], n)
+        for n, pages in by_count.items()
+        for start in range(0, len(pages), _GENERATE_PAGE_GROUP)
+    ]
+    errors: List[BaseException] = []
+    with ThreadPoolExecutor(max_workers=min(_GENERATE_WORKERS, len(groups))) as pool:
+        # 호출한 쪽의 LLM 우선순위(contextvar)를 작업 스레드에서도 그대로 쓴다
+        futures = [
+            pool.submit(contextvars.copy_context().run, generate, group, n) for group, n in groups
+        ]
+        for fut in futures:
+            try:
+                add_questions(doc_hash, difficulty, fut.result())
+            except Exception as e:
+                errors.append(e)
+
+    questions, _ = draw_questions(doc_hash, selected_pages, num_questions, difficulty)
+    if errors and not questions:
+        raise errors[0]
+    if errors:
+        print(f"문제 생성 일부 실패 ({len(errors)}/{len(groups)}묶음): {errors[0]!r}")
+    return questions
@@ -0,0 +1,89 @@
+# utils/rerank.py
+
+from typing import Dict, List, Optional, Sequence
+import os
+
+import numpy as np
+
+from utils import metrics
+
+# ────────────────────────────────────────────
+# 설정 (환경변수로 조정 가능)
+# ────────────────────────────────────────────
+# "0"이면 벡터DB 상위 top_k를 그대로 쓴다.
+MMR_ENABLED = os.getenv("STUDY_MATE_MMR", "1") == "1"
+# 관련도(1.0) ↔ 다양성(0.0) 가중치
+MMR_LAMBDA = float(os.getenv("STUDY_MATE_MMR_LAMBDA", "0.5"))
+# 후보를 top_k의 몇 배까지 더 가져와서 고를지
+MMR_FETCH_MULT = int(os.getenv("STUDY_MATE_MMR_FETCH_MULT", "4"))
+# 검색 문맥 전체 토큰 상한 (0이면 상한 없음)
+RAG_TOKEN_BUDGET = int(os.getenv("STUDY_MATE_RAG_TOKEN_BUDGET", "1500"))
+
+
+def _unit_rows(m: np.ndarray) -> np.ndarray:
+    norms = np.linalg.norm(m, axis=-1, keepdims=True)
+    norms[norms == 0] = 1.0
+    return m / norms
+
+
+def mmr_select(
+    query_embedding,
+    doc_embeddings,
+    k: int,
+    lambda_mult: float = MMR_LAMBDA,
+    costs: Optional[Sequence[int]] = None,
+    budget: int = 0,
+) -> List[int]:
+    """
+    Maximal Marginal Relevance로 후보 중 k개 이하를 고른 인덱스 (고른 순서).
+
+    매 단계 λ·sim(질의, d) − (1−λ)·max sim(d, 이미 고른 것)이 가장 큰 후보를 고른다.
+    → 서로 거의 같은 청크(겹치는 이웃 청크 등)는 하나만 들어가고, 그 자리에 다른 내용이 들어간다.
+    costs/budget이 주어지면 토큰 합이 budget을 넘는 후보는 건너뛴다 (첫 번째 후보는 항상 포함).
+    """
+    docs = np.asarray(doc_embeddings, dtype=np.float32)
+    n = len(docs)
+    if n == 0 or k <= 0:
+        return []
+    docs = _unit_rows(docs)
+    q = _unit_rows(np.asarray(query_embedding, dtype=np.float32)[None, :])[0]
+
+    relevance = docs @ q                 # (n,)
+    pairwise = docs @ docs.T             # (n, n) — 후보가 수십 개라 한 번에 계산해도 싸다
+    max_sim = np.full(n, -np.inf, dtype=np.float32)
+    available = np.ones(n, dtype=bool)
+
+    selected: List[int] = []
+    spent = 0
+    while len(selected) < k and available.any():
+        redundancy = np.where(np.isfinite(max_sim), max_sim, 0.0)
+        score = lambda_mult * relevance - (1 - lambda_mult) * redundancy
+        score[~available] = -np.inf
+        best = int(np.argmax(score))
+        available[best] = False
+        cost = costs[best] if costs is not None else 0
+        if budget and selected and spent + cost > budget:
+            continue  # 이 후보는 예산을 넘는다 → 더 짧은 다음 후보를 본다
+        selected.append(best)
+        spent += cost
+        max_sim = np.maximum(max_sim, pairwise[best])
+    return selected
+
+
+def record_saving(raw_tokens: int, sent_tokens: int) -> None:
+    """재정렬 전(상위 top_k 그대로) / 후 검색 문맥 토큰 수를 누적한다."""
+    metrics.incr("rag.rerank.queries")
+    metrics.incr("rag.rerank.tokens_raw", raw_tokens)
+    metrics.incr("rag.rerank.tokens_sent", sent_tokens)
+
+
+def rerank_stats() -> Dict[str, float]:
+    """{"queries", "tokens_raw", "tokens_sent", "saved_rate"}"""
+    raw = metrics.counter("rag.rerank.tokens_raw")
+    sent = metrics.counter("rag.rerank.tokens_sent")
+    return {
+        "queries": int(metrics.counter("rag.rerank.queries")),
+        "tokens_raw": int(raw),
+        "tokens_sent": int(sent),
+        "saved_rate": 1 - sent / raw if raw else 0.0,
+    }
@@ -0,0 +1,64 @@
+# utils/semantic_cache.py
+
+from typing import Dict, Iterable, Optional
+from collections import OrderedDict
+import threading
+
+import numpy as np
+
+
+class SemanticCache:
+    """
+    Q&A 답변 캐시.
+
+    키 = (query_similar로 찾은 문단 id 집합, 질문 임베딩)
+    - 검색된 문단 집합이 같고(순서 무관)
+    - 질문 임베딩의 코사인 유사도가 threshold 이상이면
+    표현만 다른 같은 질문으로 보고 이전 답변을 돌려준다.
+
+    프로세스 전체에서 공유되며, max_entries를 넘으면 오래 안 쓴 항목부터 버린다.
+    """
+
+    def __init__(self, threshold: float = 0.9, max_entries: int = 512):
+        self.threshold = threshold
+        self.max_entries = max_entries
+        self._lock = threading.Lock()
+        # frozenset(doc ids) → [(정규화된 질문 임베딩, 답변), ...]
+        self._entries: "OrderedDict[frozenset, list]" = OrderedDict()
+        self._size = 0
+        self._stats = {"hits": 0, "misses": 0}
+
+    @staticmethod
+    def _unit(embedding) -> np.ndarray:
+        v = np.asarray(embedding, dtype=np.float32)
+        norm = float(np.linalg.norm(v))
+        return v / norm if norm else v
+
+    def lookup(self, doc_ids: Iterable[str], query_embedding) -> Optional[str]:
+        key = frozenset(doc_ids)
+        q = self._unit(query_embedding)
+        with self._lock:
+            bucket = self._entries.get(key)
+            if bucket:
+                sims = np.stack([e for e, _ in bucket]) @ q
+                best = int(np.argmax(sims))
+                if sims[best] >= self.threshold:
+                    self._entries.move_to_end(key)
+                    self._stats["hits"] += 1
+                    return bucket[best][1]
+            self._stats["misses"] += 1
+        return None
+
+    def store(self, doc_ids: Iterable[str], query_embedding, answer: str) -> None:
+        key = frozenset(doc_ids)
+        with self._lock:
+            self._entries.setdefault(key, []).append((self._unit(query_embedding), answer))
+            self._entries.move_to_end(key)
+            self._size += 1
+            while self._size > self.max_entries and self._entries:
+                _, bucket = self._entries.popitem(last=False)
+                self._size -= len(bucket)
+
+    def stats(self) -> Dict[str, int]:
+        with self._lock:
+            return {"entries": self._size, **self._stats}
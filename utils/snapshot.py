@@ -0,0 +1,269 @@
+# utils/snapshot.py
+
+from typing import Any, Dict, Optional
+from pathlib import Path
+import hashlib
+import json
+import os
+import struct
+import threading
+import time
+
+import numpy as np
+
+from utils import blob_store, chroma_db, ingest
+from utils.artifact_cache import get_artifact_cache
+from utils.embedder import MODEL_NAME
+from utils.extract_pdf import PAGES_CACHE_PARAMS, extract_text_from_pdf
+from utils.study_pack import file_sha256
+
+# ────────────────────────────────────────────
+# 스냅샷 파일 형식
+# ────────────────────────────────────────────
+# [MAGIC][섹션들...][헤더 JSON][헤더 길이(8바이트, little-endian)][MAGIC]
+#
+# 섹션마다 헤더에 offset/length/sha256이 있다. 섹션은 64바이트 경계에 맞춰 써서
+# embeddings(float32, n×dim)는 np.memmap으로 바로 열 수 있다. 나머지 섹션은 UTF-8 JSON.
+#   embeddings / ids / documents / metadatas : 벡터DB 레코드 (같은 순서)
+#   manifest                                 : 적재 기록 (doc_hash → 기록)
+#   pages                                    : 추출 텍스트 캐시 (doc_hash → 페이지 텍스트 리스트)
+SNAPSHOT_VERSION = 1
+_MAGIC = b"STUDYMATE-SNAPSHOT\n"
+_ALIGN = 64
+_READ_CHUNK = 1 << 20
+
+# 새 노드가 뜰 때 벡터DB가 비어 있으면 이 스냅샷을 가져온다 (비어 있으면 사용 안 함)
+SNAPSHOT_PATH = os.getenv("STUDY_MATE_SNAPSHOT", "")
+
+_bootstrap_lock = threading.Lock()
+_bootstrapped = False
+
+
+class _SectionWriter:
+    """섹션을 순서대로 쓰면서 offset / length / sha256을 기록한다."""
+
+    def __init__(self, f):
+        self.f = f
+        self.sections: Dict[str, Dict[str, Any]] = {}
+        self._name: Optional[str] = None
+
+    def begin(self, name: str) -> None:
+        pad = -self.f.tell() % _ALIGN
+        self.f.write(b"\0" * pad)
+        self._name = name
+        self._sha = hashlib.sha256()
+        self.sections[name] = {"offset": self.f.tell(), "length": 0}
+
+    def write(self, data: bytes) -> None:
+        self.f.write(data)
+        self._sha.update(data)
+        self.sections[self._name]["length"] += len(data)
+
+    def end(self) -> None:
+        self.sections[self._name]["sha256"] = self._sha.hexdigest()
+        self._name = None
+
+    def json_section(self, name: str, obj: Any) -> None:
+        self.begin(name)
+        self.write(json.dumps(obj, ensure_ascii=False).encode("utf-8"))
+        self.end()
+
+
+def _collect_pages(decks: Dict[str, Any], upload_dir: Path) -> Dict[str, list]:
+    """문서별 추출 텍스트. 공용 캐시(디스크 spill 포함)에 없으면 원본 PDF(blob / 업로드 폴더)에서 다시 추출한다."""
+    artifacts = get_artifact_cache()
+    out: Dict[str, list] = {}
+    for record in decks.values():
+        doc_hash = record.get("doc_hash")
+        if not doc_hash or doc_hash in out:
+            continue
+        pages = artifacts.get(doc_hash, "pages", PAGES_CACHE_PARAMS)
+        if pages is None:
+            pdf = blob_store.blob_path(doc_hash)
+            if not pdf.is_file():
+                pdf = upload_dir / record.get("source", "")
+                if not pdf.is_file() or file_sha256(pdf) != doc_hash:
+                    continue
+            pages = extract_text_from_pdf(pdf)
+        out[doc_hash] = list(pages)
+    return out
+
+
+def export_snapshot(path: str | Path, upload_dir: str | Path = "data/uploaded") -> Dict[str, Any]:
+    """
+    벡터DB 전체 + 적재 기록 + 추출 텍스트 캐시를 파일 하나로 내보낸다.
+    임시 파일에 다 쓴 뒤 교체하므로, 중간에 실패해도 이전 스냅샷은 그대로 남는다.
+
+    반환: {"path", "vectors", "dim", "decks", "documents", "bytes", "seconds"}
+    """
+    t0 = time.perf_counter()
+    path = Path(path)
+    path.parent.mkdir(parents=True, exist_ok=True)
+    tmp = path.with_suffix(path.suffix + ".tmp")
+
+    # 적재 기록을 벡터보다 먼저 읽는다. 내보내는 도중 적재가 끝나도 기록이 벡터보다 앞서지 않으므로,
+    # 가져온 쪽에서는 바뀐 페이지만 다시 임베딩하게 된다 (기록에 있는 벡터가 빠지는 일은 없다).
+    decks = ingest.load_manifest_decks()
+    pages = _collect_pages(decks, Path(upload_dir))
+
+    ids: list = []
+    documents: list = []
+    metadatas: list = []
+    dim = 0
+    with open(tmp, "wb") as f:
+        f.write(_MAGIC)
+        w = _SectionWriter(f)
+
+        w.begin("embeddings")
+        for got in chroma_db.dump_records():
+            emb = np.asarray(got["embeddings"], dtype=np.float32)
+            dim = emb.shape[1]
+            w.write(emb.tobytes())
+            ids.extend(got["ids"])
+            documents.extend(got["documents"])
+            metadatas.extend(got["metadatas"])
+        w.end()
+
+        w.json_section("ids", ids)
+        w.json_section("documents", documents)
+        w.json_section("metadatas", metadatas)
+        w.json_section("manifest", decks)
+        w.json_section("pages", pages)
+
+        header = {
+            "version": SNAPSHOT_VERSION,
+            "created_at": time.time(),
+            "embedding_model": MODEL_NAME,
+            "count": len(ids),
+            "dim": dim,
+            "sections": w.sections,
+        }
+        header_bytes = json.dumps(header).encode("utf-8")
+        f.write(header_bytes)
+        f.write(struct.pack("<Q", len(header_bytes)))
+        f.write(_MAGIC)
+        f.flush()
+        os.fsync(f.fileno())
+    os.replace(tmp, path)
+
+    return {
+        "path": str(path),
+        "vectors": len(ids),
+        "dim": dim,
+        "decks": len(decks),
+        "documents": len(pages),
+        "bytes": path.stat().st_size,
+        "seconds": round(time.perf_counter() - t0, 2),
+    }
+
+
+def read_snapshot_header(path: str | Path) -> Dict[str, Any]:
+    """스냅샷 헤더(버전 / 모델 / 레코드 수 / 섹션 위치). 형식이 맞지 않으면 ValueError."""
+    trailer = len(_MAGIC) + 8
+    with open(path, "rb") as f:
+        if f.read(len(_MAGIC)) != _MAGIC:
+            raise ValueError(f"스냅샷 파일이 아닙니다: {path}")
+        f.seek(-trailer, os.SEEK_END)
+        (header_len,) = struct.unpack("<Q", f.read(8))
+        if f.read(len(_MAGIC)) != _MAGIC:
+            raise ValueError(f"스냅샷 파일이 잘렸습니다: {path}")
+        f.seek(-(trailer + header_len), os.SEEK_END)
+        header = json.loads(f.read(header_len).decode("utf-8"))
+    if header.get("version") != SNAPSHOT_VERSION:
+        raise ValueError(f"지원하지 않는 스냅샷 버전: {header.get('version')} (지원: {SNAPSHOT_VERSION})")
+    return header
+
+
+def _verify(path: Path, header: Dict[str, Any]) -> None:
+    with open(path, "rb") as f:
+        for name, sec in header["sections"].items():
+            f.seek(sec["offset"])
+            sha = hashlib.sha256()
+            remaining = sec["length"]
+            while remaining:
+                data = f.read(min(_READ_CHUNK, remaining))
+                if not data:
+                    break
+                sha.update(data)
+                remaining -= len(data)
+            if remaining or sha.hexdigest() != sec["sha256"]:
+                raise ValueError(f"스냅샷 체크섬 불일치: {name} 섹션")
+
+
+def _read_json(path: Path, sec: Dict[str, Any]) -> Any:
+    with open(path, "rb") as f:
+        f.seek(sec["offset"])
+        return json.loads(f.read(sec["length"]).decode("utf-8"))
+
+
+def import_snapshot(path: str | Path, verify: bool = True) -> Dict[str, Any]:
+    """
+    스냅샷을 현재 노드에 가져온다. 임베딩 모델은 돌리지 않는다.
+    - 벡터: memmap으로 연 임베딩을 그대로 bulk upsert (같은 id는 덮어씀)
+    - 적재 기록: 합침 (같은 deck은 스냅샷 쪽) → 같은 PDF를 올리면 적재를 건너뛴다
+    - 추출 텍스트: 공용 캐시 디스크에 써 둔다 → 앱 프로세스가 PDF를 다시 추출하지 않는다
+
+    체크섬 / 버전 / 임베딩 모델이 맞지 않으면 아무것도 쓰지 않고 ValueError.
+    반환: {"vectors", "decks", "documents", "seconds"}
+    """
+    t0 = time.perf_counter()
+    path = Path(path)
+    header = read_snapshot_header(path)
+    if header["embedding_model"] != MODEL_NAME:
+        raise ValueError(
+            f"임베딩 모델이 다릅니다: 스냅샷 {header['embedding_model']} / 현재 {MODEL_NAME}"
+        )
+    if verify:
+        _verify(path, header)
+
+    sections = header["sections"]
+    count, dim = header["count"], header["dim"]
+    if count:
+        embeddings = np.memmap(
+            path, dtype=np.float32, mode="r",
+            offset=sections["embeddings"]["offset"], shape=(count, dim),
+        )
+        chroma_db.load_records(
+            _read_json(path, sections["ids"]),
+            embeddings,
+            _read_json(path, sections["documents"]),
+            _read_json(path, sections["metadatas"]),
+        )
+        del embeddings
+
+    decks = _read_json(path, sections["manifest"])
+    ingest.merge_manifest_decks(decks)
+
+    pages = _read_json(path, sections["pages"])
+    artifacts = get_artifact_cache()
+    for doc_hash, doc_pages in pages.items():
+        artifacts.put(doc_hash, "pages", doc_pages, PAGES_CACHE_PARAMS, persist=True)
+
+    return {
+        "vectors": count,
+        "decks": len(decks),
+        "documents": len(pages),
+        "seconds": round(time.perf_counter() - t0, 2),
+    }
+
+
+def bootstrap_from_env() -> Optional[Dict[str, Any]]:
+    """
+    STUDY_MATE_SNAPSHOT이 있고 벡터DB가 비어 있으면 한 번만 가져오고, import_snapshot 결과를 반환한다 (새 노드 첫 실행).
+    이미 데이터가 있거나 스냅샷이 없으면 None. (결과를 보여줄지는 호출 쪽이 정한다)
+    """
+    global _bootstrapped
+    if _bootstrapped or not SNAPSHOT_PATH:
+        return None
+    with _bootstrap_lock:
+        if _bootstrapped:
+            return None
+        _bootstrapped = True
+        if not Path(SNAPSHOT_PATH).is_file() or chroma_db.count_vectors() > 0:
+            return None
+        try:
+            report = import_snapshot(SNAPSHOT_PATH)
+        except (OSError, ValueError) as e:
+            print(f"스냅샷 가져오기 실패, 빈 DB로 시작: {e!r}")
+            return None
+        return report
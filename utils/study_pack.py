@@ -0,0 +1,211 @@
+# utils/study_pack.py
+
+from typing import Any, Callable, Dict, List, Optional
+from pathlib import Path
+import hashlib
+import json
+import os
+import threading
+import time
+
+# 미리 만들어 둔 학습 팩 저장 위치: data/packs/<doc_hash>/v<PACK_VERSION>.json
+PACK_DIR = Path("data/packs")
+
+# 프롬프트나 팩 구조가 바뀌면 올린다. (이전 버전 팩은 그대로 두고 새로 생성)
+PACK_VERSION = 1
+
+DIFFICULTIES = ["easy", "medium", "hard"]
+
+# generate_page_questions는 한 번에 최대 8페이지까지만 문맥에 넣는다.
+_QUESTION_PAGE_GROUP = 8
+
+# 문제 묶음이 요청한 개수보다 적게 오면(파싱 실패 등) 다시 요청하는 횟수
+_QUESTION_ATTEMPTS = 2
+
+_lock = threading.Lock()
+
+
+def file_sha256(path: str | Path) -> str:
+    """PDF 파일 내용의 SHA-256 (app.py의 doc_hash와 같은 값)."""
+    h = hashlib.sha256()
+    with open(path, "rb") as f:
+        for block in iter(lambda: f.read(1 << 20), b""):
+            h.update(block)
+    return h.hexdigest()
+
+
+def pack_path(doc_hash: str, version: int = PACK_VERSION, partial: bool = False) -> Path:
+    suffix = ".partial.json" if partial else ".json"
+    return PACK_DIR / doc_hash / f"v{version}{suffix}"
+
+
+def _save_json(path: Path, data: Dict[str, Any]) -> None:
+    path.parent.mkdir(parents=True, exist_ok=True)
+    tmp = path.with_suffix(f".{threading.get_ident()}.tmp")
+    with open(tmp, "w", encoding="utf-8") as f:
+        json.dump(data, f, ensure_ascii=False, indent=2)
+    os.replace(tmp, path)
+
+
+def _load_json(path: Path) -> Optional[Dict[str, Any]]:
+    if not path.exists():
+        return None
+    try:
+        with open(path, "r", encoding="utf-8") as f:
+            return json.load(f)
+    except (OSError, json.JSONDecodeError):
+        return None
+
+
+def load_study_pack(doc_hash: str, version: int = PACK_VERSION) -> Optional[Dict[str, Any]]:
+    """
+    완성된 학습 팩을 읽어 온다. 없으면 None.
+
+    {
+      "version": 1, "doc_hash": "...", "source": "강의.pdf", "num_pages": 30,
+      "created_at": 1700000000.0,
+      "study_pack_md": "...",                 # llm_gpt.generate_study_pack_from_pages
+      "whole_summary": "...",                 # llm_gemini.generate_whole_summary
+      "page_summaries": {"1": "...", ...},    # llm_gemini.generate_single_page_summary
+      "questions": {"easy": [...], "medium": [...], "hard": [...]}
+    }
+    """
+    return _load_json(pack_path(doc_hash, version))
+
+
+# ────────────────────────────────────────────
+# 학습 팩 생성 (단계별 체크포인트)
+# ────────────────────────────────────────────
+def _is_error_text(text: str) -> bool:
+    # llm_gpt._call_gpt는 예외 대신 "❌ ..." 문자열을 돌려준다.
+    return not text or text.lstrip().startswith("❌")
+
+
+def _is_failed_summary(text: Any) -> bool:
+    # 예전 버전의 llm_gemini는 빈 응답을 "... 요약을 생성하지 못했습니다." 문구로 돌려줬다.
+    return not isinstance(text, str) or _is_error_text(text) or text.strip().endswith("생성하지 못했습니다.")
+
+
+def _drop_failed_steps(pack: Dict[str, Any]) -> None:
+    """이전 체크포인트 중 실패 결과가 완료로 기록된 단계를 지워서 이어 할 때 다시 만들게 한다."""
+    failed = set()
+    if "whole_summary" in pack and _is_failed_summary(pack["whole_summary"]):
+        failed.add("whole_summary")
+    for page_no, summary in list(pack["page_summaries"].items()):
+        if _is_failed_summary(summary):
+            failed.add(f"page_summary_{page_no}")
+            del pack["page_summaries"][page_no]
+    pack["steps_done"] = [s for s in pack["steps_done"] if s not in failed]
+
+
+def build_study_pack(
+    pages: List[str],
+    doc_hash: str,
+    source_name: str,
+    difficulties: Optional[List[str]] = None,
+    questions_per_page: int = 2,
+    page_summaries: bool = True,
+    log: Callable[[str], None] = print,
+) -> Dict[str, Any]:
+    """
+    한 문서의 학습 팩을 만든다. 각 단계가 끝날 때마다 v<N>.partial.json에 저장하므로
+    중간에 끊겨도 다시 실행하면 끝난 단계는 건너뛴다. 모든 단계가 끝나면 v<N>.json으로 확정.
+    """
+    # LLM 모듈은 API 키가 필요하므로 실제로 생성할 때만 import
+    from utils.llm_gemini import (
+        generate_whole_summary,
+        generate_page_questions,
+        generate_single_page_summary,
+    )
+    from utils.llm_gpt import generate_study_pack_from_pages
+    from utils.ingest import store_page_summary
+    from utils.question_bank import seed_questions
+    from utils.context_cache import get_context_cache, inline_deck_context
+
+    done = load_study_pack(doc_hash)
+    if done is not None:
+        return done
+
+    difficulties = difficulties or DIFFICULTIES
+    partial_path = pack_path(doc_hash, partial=True)
+    pack = _load_json(partial_path) or {
+        "version": PACK_VERSION,
+        "doc_hash": doc_hash,
+        "source": source_name,
+        "num_pages": len(pages),
+        "page_summaries": {},
+        "questions": {},
+        "steps_done": [],
+    }
+
+    def checkpoint(step: str) -> None:
+        pack["steps_done"].append(step)
+        _save_json(partial_path, pack)
+        log(f"  [{source_name}] {step} 완료")
+
+    _drop_failed_steps(pack)
+    steps_done = set(pack["steps_done"])
+
+    if "study_pack_md" not in steps_done:
+        text = generate_study_pack_from_pages(pages)
+        if _is_error_text(text):
+            raise RuntimeError(f"GPT 학습 팩 생성 실패: {text}")
+        pack["study_pack_md"] = text
+        checkpoint("study_pack_md")
+
+    # 생성 함수는 빈 응답이면 RuntimeError를 던진다 → 체크포인트 없이 중단되고, 다시 실행하면 이 단계부터 한다.
+    if "whole_summary" not in steps_done:
+        pack["whole_summary"] = generate_whole_summary(pages)
+        checkpoint("whole_summary")
+
+    if page_summaries:
+        for page_no, text in enumerate(pages, start=1):
+            step = f"page_summary_{page_no}"
+            if step in steps_done or not text.strip():
+                continue
+            summary = generate_single_page_summary(text, page_number=page_no)
+            pack["page_summaries"][str(page_no)] = summary
+            # 탭2의 페이지 요약 캐시에도 넣어 두면 앱에서 바로 꺼내 쓴다.
+            store_page_summary(text, page_no, summary)
+            checkpoint(step)
+
+    page_numbers = [i for i, t in enumerate(pages, start=1) if t.strip()]
+    groups = [
+        page_numbers[start:start + _QUESTION_PAGE_GROUP]
+        for start in range(0, len(page_numbers), _QUESTION_PAGE_GROUP)
+    ]
+    for difficulty in difficulties:
+        for group in groups:
+            step = f"questions_{difficulty}_{group[0]}-{group[-1]}"
+            if step in steps_done:
+                continue
+            # 파싱 실패로 빈 / 모자란 묶음을 완료로 기록하면 이어 하기에서 다시 만들지 않으므로,
+            # 요청한 개수가 다 올 때까지 몇 번 다시 요청하고 그래도 모자라면 실패로 중단한다.
+            want = len(group) * questions_per_page
+            for _ in range(_QUESTION_ATTEMPTS):
+                questions = generate_page_questions(
+                    pages=pages,
+                    selected_pages=group,
+                    num_questions=questions_per_page,
+                    difficulty=difficulty,
+                )
+                if len(questions) >= want:
+                    break
+                log(f"  [{source_name}] {step}: 문제 {len(questions)}/{want}개만 생성됨, 다시 요청")
+            else:
+                raise RuntimeError(f"문제 생성 실패({step}): {len(questions)}/{want}개")
+            pack["questions"].setdefault(difficulty, []).extend(questions)
+            seed_questions(doc_hash, {difficulty: questions})  # 앱이 다시 넣지 않도록 기록도 남긴다
+            checkpoint(step)
+
+    pack.pop("steps_done", None)
+    pack["created_at"] = time.time()
+    with _lock:
+        _save_json(pack_path(doc_hash), pack)
+        partial_path.unlink(missing_ok=True)
+
+    # 이 문서로 더 만들 것이 없으므로 provider 쪽 문맥 캐시는 TTL을 기다리지 않고 바로 정리한다.
+    cache = get_context_cache()
+    for context in [inline_deck_context(pages)] + [inline_deck_context(pages, g) for g in groups]:
+        cache.release(context)
+    return pack